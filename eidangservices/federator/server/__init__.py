@@ -11,8 +11,12 @@ from flask_redis import FlaskRedis
 
 from eidangservices import settings
 from eidangservices.federator import __version__
+from eidangservices.federator.server.routing import EmbeddedRouting
+from eidangservices.federator.server.sharding import StorageProvider
 from eidangservices.federator.server.stats import ResponseCodeStats
-from eidangservices.federator.server.cache import Cache
+from eidangservices.federator.server.cache import (
+    Cache, CacheMetrics, MiniSEEDTileCache, NegativeCache, PopularQueries,
+    RoutingCache, WFCatalogCache)
 from eidangservices.utils import httperrors
 from eidangservices.utils.error import Error
 from eidangservices.utils.fdsnws import (register_parser_errorhandler,
@@ -23,7 +27,21 @@ redis_client = FlaskRedis()
 
 response_code_stats = ResponseCodeStats(redis=redis_client)
 
-cache = Cache()
+negative_cache = NegativeCache(redis=redis_client)
+
+routing_cache = RoutingCache()
+
+embedded_routing = EmbeddedRouting()
+
+cache_metrics = CacheMetrics(redis=redis_client)
+
+cache = Cache(metrics=cache_metrics)
+
+popular_queries = PopularQueries(redis=redis_client)
+
+tile_cache = MiniSEEDTileCache(metrics=cache_metrics)
+
+wfcatalog_cache = WFCatalogCache(metrics=cache_metrics)
 
 
 def create_app(config_dict={}, service_version=__version__):
@@ -42,14 +60,43 @@ def create_app(config_dict={}, service_version=__version__):
     # allows CORS for all domains for all routes
     CORS(app)
 
+    # the storage URL selects either Redis, a sharded or the Redis-free local
+    # storage
+    redis_client.provider_class = StorageProvider
     redis_client.init_app(app, socket_timeout=5)
     # configure response code time series
     response_code_stats.kwargs_series = {
         'window_size': config_dict['FED_CRETRY_BUDGET_WINDOW_SIZE'],
         'ttl': config_dict['FED_CRETRY_BUDGET_TTL'],
     }
+    # configure negative cache
+    negative_cache.ttl = config_dict.get('FED_NEGATIVE_CACHE_TTL', 0)
+    # configure routing cache
+    routing_cache.ttl = config_dict.get('FED_ROUTING_CACHE_TTL', 0)
+    # configure embedded (in-process) routing
+    embedded_routing.configure(config_dict.get('FED_ROUTING_DB_URL'))
+    # configure cache instrumentation
+    cache_metrics.enabled = config_dict.get('FED_CACHE_METRICS', False)
     # configure cache
     cache.init_cache(config=config_dict)
+    # configure tracking of popular queries for cache warming
+    popular_queries.max_queries = config_dict.get(
+        'FED_CACHE_WARMER_TRACKED_QUERIES', 0)
+    # configure dataselect tile cache
+    tile_cache.init_cache(
+        config_dict.get('FED_TILE_CACHE_DIR'),
+        quota=config_dict.get(
+            'FED_TILE_CACHE_QUOTA',
+            settings.EIDA_FEDERATOR_DEFAULT_TILE_CACHE_QUOTA),
+        min_age=config_dict.get(
+            'FED_TILE_CACHE_MIN_AGE',
+            settings.EIDA_FEDERATOR_DEFAULT_TILE_CACHE_MIN_AGE))
+    # configure WFCatalog document cache
+    wfcatalog_cache_config = dict(
+        config_dict.get('FED_WFCATALOG_CACHE_CONFIG') or {})
+    wfcatalog_cache_config['CACHE_CURRENT_DAY_TIMEOUT'] = config_dict.get(
+        'FED_WFCATALOG_CACHE_CURRENT_DAY_TIMEOUT', 0)
+    wfcatalog_cache.init_cache(config=wfcatalog_cache_config)
 
     # app.config['PROFILE'] = True
     # app.wsgi_app = ProfilerMiddleware(app.wsgi_app, restrictions=[10])
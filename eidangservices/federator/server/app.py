@@ -27,7 +27,7 @@ from eidangservices.federator.server.misc import KeepTempfiles
 from eidangservices.federator.server.routes.misc import (
     DataselectVersionResource, StationVersionResource,
     WFCatalogVersionResource, DataselectWadlResource,
-    StationWadlResource, WFCatalogWadlResource)
+    StationWadlResource, WFCatalogWadlResource, CacheMetricsResource)
 from eidangservices.federator.server.routes.dataselect import \
     DataselectResource
 from eidangservices.federator.server.routes.station import StationResource
@@ -132,7 +132,8 @@ def cache_config(arg):
     difference = set(config_dict) - allowed_keys
 
     if difference:
-        return argparse.ArgumentTypeError('Invalid key: {!r}'.format())
+        raise argparse.ArgumentTypeError(
+            'Invalid key: {!r}'.format(difference))
 
     try:
         cache_type = config_dict['CACHE_TYPE']
@@ -154,6 +155,14 @@ def cache_config(arg):
             'Valid args for CACHE_TYPE={!r}: {!r}'.format(
                 difference, cache_type, allowed_args))
 
+    for k in ('CACHE_LEASE_TIMEOUT', 'CACHE_KEY_ENDTIME_GRANULARITY',
+              'CACHE_MAX_ENTRY_SIZE', 'CACHE_ADMISSION_MIN_FREQUENCY'):
+        v = config_dict.setdefault(k, settings.EIDA_FEDERATOR_CACHE_CONFIG[k])
+        if (isinstance(v, bool) or not isinstance(v, (int, float)) or
+                v < 0):
+            raise argparse.ArgumentTypeError(
+                'Invalid {!r} value: {!r}'.format(k, v))
+
     return config_dict
 
 
@@ -184,6 +193,18 @@ def pos_float(arg):
     return _pos_number(arg, float)
 
 
+def non_neg_int(arg):
+    try:
+        arg = int(arg)
+    except ValueError as err:
+        raise argparse.ArgumentTypeError(err)
+
+    if arg < 0:
+        raise argparse.ArgumentTypeError(
+            'Only non-negative numbers allowed.')
+    return arg
+
+
 def percent(arg):
     try:
         arg = float(arg)
@@ -226,11 +247,45 @@ class FederatorWebserviceBase(App):
                             help=("stationlite routing service url "
                                   "(including identifier) "
                                   "(default: %(default)s)"))
+        parser.add_argument('--routing-format', type=str,
+                            choices=sorted(
+                                settings.EIDA_FEDERATOR_ROUTING_FORMATS),
+                            default='post', dest='routing_format',
+                            help=('Format routing information is requested '
+                                  'from the routing service with. The '
+                                  '"binary" format is a compact binary '
+                                  'encoding requiring a StationLite '
+                                  'supporting it. (default: %(default)s)'))
+        parser.add_argument('--routing-shard-size', type=non_neg_int,
+                            dest='routing_shard_size', metavar='NUM',
+                            default=0,
+                            help=('Maximum number of stream epochs routed '
+                                  'by means of a single routing request. '
+                                  'Requests with more stream epochs are '
+                                  'split into shards which are routed '
+                                  'concurrently. By default, sharding is '
+                                  'disabled. (default: %(default)s)'))
+        parser.add_argument('--routing-db-url', type=str, metavar='URL',
+                            dest='routing_db_url',
+                            help=('StationLite DB URL. If configured, '
+                                  'routing is performed in-process by means '
+                                  'of the StationLite engine operating on '
+                                  'the database (read-only) instead of '
+                                  'requesting the routing service. Requires '
+                                  'the federator and StationLite to share '
+                                  'the database host.'))
         parser.add_argument('-S', '--storage-url', type=str,
                             dest='storage', metavar='URL',
                             default=settings.
                             EIDA_FEDERATOR_DEFAULT_STORAGE_URL,
-                            help="Storage URL (Redis) (default: %(default)s)")
+                            help=("Storage URL (Redis). For single-node "
+                                  "deployments a Redis-free local storage "
+                                  "is selected by means of a URL with the "
+                                  "scheme 'local' (e.g. "
+                                  "local:///dev/shm/eida-federator.db). A "
+                                  "comma-separated list of URLs shards the "
+                                  "storage across several Redis instances. "
+                                  "(default: %(default)s)"))
         parser.add_argument('-w', '--cretry-budget-window-size', type=pos_int,
                             dest='cretry_budget_window_size', metavar='SIZE',
                             default=settings.
@@ -281,6 +336,78 @@ class FederatorWebserviceBase(App):
                             default=settings.EIDA_FEDERATOR_CACHE_CONFIG,
                             help=('Cache configuration dictionary '
                                   '(JSON syntax) (default: %(default)s'))
+        parser.add_argument('--negative-cache-ttl', type=non_neg_int,
+                            dest='negative_cache_ttl', metavar='SECONDS',
+                            default=0,
+                            help=('TTL in seconds for caching stream epochs '
+                                  'endpoints have no data available for. '
+                                  'By default, the negative cache is '
+                                  'disabled. (default: %(default)s)'))
+        parser.add_argument('--routing-cache-ttl', type=non_neg_int,
+                            dest='routing_cache_ttl', metavar='SECONDS',
+                            default=0,
+                            help=('TTL in seconds for caching routing tables '
+                                  'within the federator. Cached routing '
+                                  'tables are invalidated as soon as the '
+                                  'routing service\'s data changes. By '
+                                  'default, the routing cache is disabled. '
+                                  '(default: %(default)s)'))
+        parser.add_argument('--cache-warmer-tracked-queries',
+                            type=non_neg_int,
+                            dest='cache_warmer_tracked_queries',
+                            metavar='NUM', default=0,
+                            help=('Number of distinct fdsnws-station '
+                                  'queries tracked for cache warming (see '
+                                  'also: eida-federator-cache-warmer). Up '
+                                  'to twice as many candidate queries are '
+                                  'tracked temporarily. By default, '
+                                  'tracking is disabled. '
+                                  '(default: %(default)s)'))
+        parser.add_argument('--wfcatalog-cache-config', type=cache_config,
+                            dest='wfcatalog_cache_config', metavar='DICT',
+                            default={},
+                            help=('WFCatalog document cache configuration '
+                                  'dictionary (JSON syntax). If not set, '
+                                  'the WFCatalog document cache is '
+                                  'disabled. (default: %(default)s)'))
+        parser.add_argument('--wfcatalog-cache-current-day-ttl',
+                            type=non_neg_int,
+                            dest='wfcatalog_cache_current_day_ttl',
+                            metavar='SECONDS', default=0,
+                            help=('TTL in seconds for WFCatalog documents '
+                                  'of days not final, yet. By default, '
+                                  'those documents are not cached. '
+                                  '(default: %(default)s)'))
+        parser.add_argument('--dataselect-cache-dir', type=str,
+                            dest='dataselect_cache_dir', metavar='PATH',
+                            default=None,
+                            help=('Directory of the dataselect miniSEED '
+                                  'tile cache. If not set, the tile cache '
+                                  'is disabled. (default: %(default)s)'))
+        parser.add_argument('--dataselect-cache-quota', type=pos_int,
+                            dest='dataselect_cache_quota', metavar='BYTES',
+                            default=settings.
+                            EIDA_FEDERATOR_DEFAULT_TILE_CACHE_QUOTA,
+                            help=('Disk quota in bytes of the dataselect '
+                                  'miniSEED tile cache. Least recently '
+                                  'used tiles are evicted if exceeded. '
+                                  '(default: %(default)s)'))
+        parser.add_argument('--dataselect-cache-min-age', type=pos_int,
+                            dest='dataselect_cache_min_age',
+                            metavar='SECONDS',
+                            default=settings.
+                            EIDA_FEDERATOR_DEFAULT_TILE_CACHE_MIN_AGE,
+                            help=('Minimum age in seconds after the end of '
+                                  'a UTC day until the corresponding tile '
+                                  'is considered as final and thus '
+                                  'cacheable. (default: %(default)s)'))
+        parser.add_argument('--cache-metrics', action='store_true',
+                            dest='cache_metrics', default=False,
+                            help=('Enable cache instrumentation. Metrics are '
+                                  'exposed at {!r} (Prometheus text '
+                                  'exposition format).'.format(
+                                      settings.
+                                      EIDA_FEDERATOR_CACHE_METRICS_PATH)))
         parser.add_argument('--keep-tempfiles', dest='keep_tempfiles',
                             choices=sorted(
                                 [str(c).replace('KeepTempfiles.', '').lower().
@@ -386,16 +513,34 @@ class FederatorWebserviceBase(App):
                              (settings.EIDA_WFCATALOG_PATH,
                               settings.FDSN_WADL_METHOD_TOKEN))
 
+        if self.args.cache_metrics:
+            api.add_resource(CacheMetricsResource,
+                             settings.EIDA_FEDERATOR_CACHE_METRICS_PATH)
+
         app_config = dict(
             # TODO(damb): Pass log_level to app.config!
             PROPAGATE_EXCEPTIONS=True,
             ROUTING_SERVICE=self.args.routing,
+            FED_ROUTING_DB_URL=self.args.routing_db_url,
+            FED_ROUTING_FORMAT=self.args.routing_format,
+            FED_ROUTING_SHARD_SIZE=self.args.routing_shard_size,
             REDIS_URL=self.args.storage,
             FED_RESOURCE_CONFIG=self.args.resource_config,
             FED_KEEP_TEMPFILES=keeptempfile_config(self.args.keep_tempfiles),
             FED_CRETRY_BUDGET_WINDOW_SIZE=self.args.cretry_budget_window_size,
             FED_CRETRY_BUDGET_TTL=self.args.cretry_budget_ttl,
             FED_CRETRY_BUDGET_ERATIO=self.args.cretry_budget_eratio,
+            FED_NEGATIVE_CACHE_TTL=self.args.negative_cache_ttl,
+            FED_ROUTING_CACHE_TTL=self.args.routing_cache_ttl,
+            FED_CACHE_WARMER_TRACKED_QUERIES=(
+                self.args.cache_warmer_tracked_queries),
+            FED_CACHE_METRICS=self.args.cache_metrics,
+            FED_TILE_CACHE_DIR=self.args.dataselect_cache_dir,
+            FED_TILE_CACHE_QUOTA=self.args.dataselect_cache_quota,
+            FED_TILE_CACHE_MIN_AGE=self.args.dataselect_cache_min_age,
+            FED_WFCATALOG_CACHE_CONFIG=self.args.wfcatalog_cache_config,
+            FED_WFCATALOG_CACHE_CURRENT_DAY_TIMEOUT=(
+                self.args.wfcatalog_cache_current_day_ttl),
             TMPDIR=tempfile.gettempdir())
 
         if self.args.cache_config:
@@ -7,22 +7,31 @@ The module provides a similar functionality as implemented by `pallets/cachelib
 <https://github.com/sh4nks/flask-caching>`_.
 """
 
+import collections
+import contextlib
+import datetime
 import errno
 import gzip
 import hashlib
+import json
 import os
-import redis
-import string
+import struct
 import tempfile
+import threading
+import uuid
 
+from collections import OrderedDict
 from time import time
 
-from eidangservices.utils.error import ErrorWithTraceback
+import requests
+
+from redis.exceptions import RedisError
 
-# Used to remove control characters and whitespace from cache keys.
-valid_chars = set(string.ascii_letters + string.digits + "_.")
-delchars = "".join(c for c in map(chr, range(256)) if c not in valid_chars)
-null_control = (dict((k, None) for k in delchars),)
+from eidangservices import settings
+from eidangservices.federator.server.request import FdsnRequestHandler
+from eidangservices.federator.server.sharding import create_client, hash_tag
+from eidangservices.utils.error import ErrorWithTraceback
+from eidangservices.utils.schema import StreamEpochSchema
 
 
 # -----------------------------------------------------------------------------
@@ -43,6 +52,8 @@ class CachingBackend:
         that the cache never expires.
         """
         self._default_timeout = default_timeout
+        # NOTE(damb): Configured by the Cache object using the backend.
+        self.metrics = CacheMetrics()
 
     def _normalize_timeout(self, timeout):
         if timeout is None:
@@ -88,6 +99,22 @@ class CachingBackend:
 
         return True
 
+    @property
+    def default_timeout(self):
+        return self._default_timeout
+
+    def ttl(self, key):
+        """
+        Return the remaining time to live of ``key``.
+
+        :param key: The key to be looked up
+        :returns: The remaining time to live in seconds. ``0`` indicates that
+            the key never expires. If the key does not exist or the backend is
+            not able to determine the TTL ``None`` is returned.
+        """
+
+        return None
+
     def __contains__(self, key):
         """
         Validate if a key exists in the cache without returning it. The data is
@@ -110,13 +137,19 @@ class NullCache(CachingBackend):
 
 class RedisCache(CachingBackend):
     """
-    Implementation of a `Redis <https://redis.io/>`_ caching backend.
+    Implementation of a `Redis <https://redis.io/>`_ caching backend. For
+    single-node deployments a ``local://`` URL selects the Redis-free local
+    storage (see
+    :py:class:`~eidangservices.federator.server.local.LocalRedis`). A
+    comma-separated list of URLs shards cache entries across several Redis
+    instances (see
+    :py:class:`~eidangservices.federator.server.sharding.ShardedRedis`).
     """
 
     def __init__(self, url, default_timeout=300, key_prefix=None, **kwargs):
         super().__init__(default_timeout)
 
-        self.redis = redis.Redis.from_url(url)
+        self.redis = create_client(url)
         self.key_prefix = key_prefix or ""
 
     def _create_key_prefix(self):
@@ -143,11 +176,18 @@ class RedisCache(CachingBackend):
             return self.redis.setex(
                 name=key, value=value, time=timeout)
 
+    def ttl(self, key):
+        ttl = self.redis.ttl(self._create_key_prefix() + key)
+        if ttl is None or ttl == -2:
+            return None
+        return max(ttl, 0)
+
     def __contains__(self, key):
         return self.redis.exists(self._create_key_prefix() + key)
 
     def _serialize(self, value):
-        return gzip.compress(value.encode('utf-8'))
+        with self.metrics.timer('compress_seconds'):
+            return gzip.compress(value.encode('utf-8'))
 
     def _deserialize(self, value):
         """
@@ -158,7 +198,8 @@ class RedisCache(CachingBackend):
         if value is None:
             return None
 
-        return gzip.decompress(value)
+        with self.metrics.timer('decompress_seconds'):
+            return gzip.decompress(value)
 
 
 class FileSystemCache(CachingBackend):
@@ -176,12 +217,20 @@ class FileSystemCache(CachingBackend):
     _fs_count_file = '__fed_cache_count'
 
     def __init__(self, cache_dir, threshold=10000, default_timeout=300,
-                 mode=0o600):
+                 mode=0o600, max_size=0):
+        """
+        :param int threshold: Maximum number of entries. A value of 0
+            indicates no threshold.
+        :param int max_size: Maximum overall size of entries in bytes. A
+            value of 0 indicates no limit.
+        """
         super().__init__(default_timeout)
 
         self._path = cache_dir
         self._threshold = threshold
         self._mode = mode
+        self._max_size = max_size
+        self._size = 0
 
         try:
             os.makedirs(self._path)
@@ -193,6 +242,9 @@ class FileSystemCache(CachingBackend):
         # the list_dir can slow initialisation massively
         if self._threshold != 0:
             self._update_count(value=len(self._list_dir()))
+        if self._max_size:
+            self._size = sum(os.path.getsize(fname)
+                             for fname in self._list_dir())
 
     @property
     def _file_count(self):
@@ -235,24 +287,56 @@ class FileSystemCache(CachingBackend):
         return os.path.join(self._path, hash)
 
     def _prune(self):
-        if self._threshold == 0 or not self._file_count > self._threshold:
+        """
+        Remove expired entries. If still required, evict entries weighted by
+        both their size and the time since they were used, last (i.e. large
+        and rarely used entries are evicted first) until both the threshold
+        and the size limit are met.
+        """
+        exceeds_threshold = (self._threshold != 0 and
+                             self._file_count > self._threshold)
+        exceeds_size = bool(self._max_size) and self._size > self._max_size
+        if not (exceeds_threshold or exceeds_size):
             return
 
-        entries = self._list_dir()
         now = time()
-        for idx, fname in enumerate(entries):
+        entries = []
+        for fname in self._list_dir():
             try:
-                remove = False
                 with open(fname, 'rb') as ifd:
                     expires = int(ifd.readline().rstrip())
-                remove = (expires != 0 and expires <= now) or idx % 3 == 0
 
-                if remove:
+                if expires != 0 and expires <= now:
                     os.remove(fname)
+                    continue
+
+                st = os.stat(fname)
             except (IOError, OSError, ValueError):
-                pass
+                continue
+
+            entries.append(
+                (st.st_size * max(now - st.st_mtime, 1.), st.st_size, fname))
+
+        count = len(entries)
+        size = sum(entry[1] for entry in entries)
+        # retain a safety margin in order to avoid pruning on every update
+        # i.e. evict a third of the entries or the size limit, respectively
+        max_count = count - (count + 2) // 3
+        max_size = int(self._max_size * 2 / 3)
+        for _, _size, fname in sorted(entries, reverse=True):
+            if ((not exceeds_threshold or count <= max_count) and
+                    (not exceeds_size or size <= max_size)):
+                break
+            try:
+                os.remove(fname)
+            except OSError:
+                continue
+            count -= 1
+            size -= _size
+            self.metrics.inc('evictions_total')
 
-        self._update_count(value=len(self._list_dir()))
+        self._size = size
+        self._update_count(value=count)
 
     def get(self, key):
         filename = self._get_filename(key)
@@ -260,22 +344,35 @@ class FileSystemCache(CachingBackend):
             with open(filename, 'rb') as ifd:
                 t = int(ifd.readline().rstrip())
                 if t == 0 or t >= time():
-                    return self._deserialize(ifd.read())
+                    retval = self._deserialize(ifd.read())
                 else:
                     os.remove(filename)
                     return None
         except (IOError, OSError):
             return None
 
+        if self._max_size or self._threshold:
+            try:
+                # mark as recently used
+                os.utime(filename)
+            except OSError:
+                pass
+
+        return retval
+
     def delete(self, key, mgmt_element=False):
+        filename = self._get_filename(key)
         try:
-            os.remove(self._get_filename(key))
+            size = os.path.getsize(filename)
+            os.remove(filename)
         except (IOError, OSError):
             return False
         else:
             # Management elements should not count towards threshold
             if not mgmt_element:
                 self._update_count(delta=-1)
+                if self._max_size:
+                    self._size -= size
             return True
 
     def set(self, key, value, timeout=None, mgmt_element=False):
@@ -296,6 +393,12 @@ class FileSystemCache(CachingBackend):
                 ofd.write("{}\n".format(timeout).encode('utf-8'))
                 ofd.write(self._serialize(value))
 
+            # account for the entry replaced
+            try:
+                replaced = os.path.getsize(filename)
+            except OSError:
+                replaced = 0
+
             os.rename(tmp, filename)
             os.chmod(filename, self._mode)
         except (IOError, OSError):
@@ -304,8 +407,25 @@ class FileSystemCache(CachingBackend):
             # Management elements should not count towards threshold
             if not mgmt_element:
                 self._update_count(delta=1)
+                if self._max_size:
+                    self._size += os.path.getsize(filename) - replaced
             return True
 
+    def ttl(self, key):
+        try:
+            with open(self._get_filename(key), 'rb') as ifd:
+                t = int(ifd.readline().rstrip())
+        except (IOError, OSError, ValueError):
+            return None
+
+        if t == 0:
+            return 0
+
+        now = time()
+        if t < now:
+            return None
+        return int(t - now)
+
     def __contains__(self, key):
         filename = self._get_filename(key)
         try:
@@ -320,14 +440,812 @@ class FileSystemCache(CachingBackend):
             return False
 
     def _serialize(self, value):
-        return gzip.compress(value.encode('utf-8'))
+        with self.metrics.timer('compress_seconds'):
+            return gzip.compress(value.encode('utf-8'))
 
     def _deserialize(self, value):
         """
         The complementary method of :py:meth:`_serialize`.
         """
 
-        return gzip.decompress(value)
+        with self.metrics.timer('decompress_seconds'):
+            return gzip.decompress(value)
+
+
+# -----------------------------------------------------------------------------
+class CacheLease:
+    """
+    Implementation of a `Redis <https://redis.io/>`_ based lease used for
+    single-flight cache population.
+
+    The lease is acquired by the first request (*leader*) missing a cache key.
+    Concurrent requests missing the same cache key are expected to wait until
+    either the cache is populated or the lease is gone. The lease expires
+    after ``timeout`` seconds such that a crashed leader cannot block
+    *followers* forever.
+
+    :param str key: Cache key the lease is created for
+    :param redis: Redis client
+    :param float timeout: Lease timeout in seconds
+    """
+
+    KEY_PREFIX = 'cache-lease:'
+
+    def __init__(self, key, redis,
+                 timeout=settings.EIDA_FEDERATOR_DEFAULT_CACHE_LEASE_TIMEOUT):
+        self.redis = redis
+        self.key = self.KEY_PREFIX + key
+        self.timeout = timeout
+
+        self._token = None
+
+    @property
+    def acquired(self):
+        return self._token is not None
+
+    @property
+    def locked(self):
+        """
+        Validate if the lease is held by any request.
+        """
+        try:
+            return bool(self.redis.exists(self.key))
+        except RedisError:
+            return False
+
+    def acquire(self):
+        """
+        Try to acquire the lease.
+
+        :returns: ``True`` if the lease was acquired, else ``False``. In case
+            of backend errors ``True`` is returned i.e. the caller is expected
+            to populate the cache by its own.
+        :rtype: bool
+        """
+        token = uuid.uuid4().hex
+        try:
+            resp = self.redis.set(self.key, token, nx=True,
+                                  px=int(self.timeout * 1000))
+        except RedisError:
+            return True
+
+        if resp:
+            self._token = token
+            return True
+
+        return False
+
+    def release(self):
+        """
+        Release the lease. A lease is exclusively released if it is still
+        owned i.e. a lease (re-)acquired by another request after expiration
+        is kept.
+        """
+        if not self.acquired:
+            return
+
+        token = self._token
+
+        def _release(pipe):
+            current = pipe.get(self.key)
+            if current is not None and current.decode('utf-8') == token:
+                pipe.multi()
+                pipe.delete(self.key)
+
+        try:
+            self.redis.transaction(_release, self.key)
+        except RedisError:
+            pass
+        finally:
+            self._token = None
+
+
+class NegativeCache:
+    """
+    Short-TTL cache for stream epochs an endpoint has no data available for
+    (i.e. the endpoint responded with HTTP status code 204 or 404). Entries
+    are keyed by the endpoint URL, the query parameters and the stream epoch.
+    Keys of the same endpoint share a hash tag i.e. a lookup is served by a
+    single shard.
+
+    Open stream epochs and stream epochs with an endtime within the current
+    TTL bucket are treated equally in order to guarantee stable keys.
+
+    :param redis: Redis client instance
+    :param int ttl: Time to live of entries in seconds. A TTL of 0 disables
+        the cache.
+    """
+
+    KEY_PREFIX = 'nocontent:'
+
+    # query parameters not passed to endpoints
+    EXCLUDE_PARAMS = FdsnRequestHandler.QUERY_PARAMS
+
+    def __init__(self, redis, ttl=0):
+        self.redis = redis
+        self.ttl = ttl
+
+    @property
+    def enabled(self):
+        return bool(self.ttl)
+
+    def make_key(self, url, stream_epoch, query_params, now=None):
+        """
+        Create the key for ``stream_epoch`` requested from ``url``.
+
+        :param url: Endpoint URL
+        :type url: str or bytes
+        :param stream_epoch: Stream epoch
+        :type stream_epoch: :py:class:`~eidangservices.utils.sncl.StreamEpoch`
+        :param dict query_params: Query parameters
+        :param now: Reference time used for bucketing; if ``None`` the current
+            time is used
+        :type now: :py:class:`datetime.datetime` or None
+        """
+        if isinstance(url, bytes):
+            url = url.decode('utf-8')
+
+        now = now or datetime.datetime.utcnow()
+        delta = now - datetime.datetime.min
+        bucket = now - datetime.timedelta(
+            seconds=delta.total_seconds() % self.ttl)
+
+        if (stream_epoch.endtime is not None and
+                stream_epoch.endtime >= bucket):
+            stream_epoch = stream_epoch._replace(endtime=None)
+
+        query_params = sorted((k, str(v)) for k, v in query_params.items()
+                              if k not in self.EXCLUDE_PARAMS)
+
+        key = hashlib.md5('{}{}{}'.format(
+            url, query_params, stream_epoch).encode('utf-8'))
+        tag = hashlib.md5(url.encode('utf-8')).hexdigest()
+        return self.KEY_PREFIX + hash_tag(tag) + ':' + key.hexdigest()
+
+    def add(self, url, stream_epochs, query_params):
+        """
+        Add ``stream_epochs`` to the cache.
+        """
+        if not self.enabled:
+            return
+
+        now = datetime.datetime.utcnow()
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for stream_epoch in stream_epochs:
+                pipe.setex(
+                    self.make_key(url, stream_epoch, query_params, now=now),
+                    self.ttl, 1)
+            pipe.execute()
+        except RedisError:
+            pass
+
+    def lookup(self, url, stream_epochs, query_params):
+        """
+        Look up ``stream_epochs``.
+
+        :returns: List of flags indicating if the corresponding stream epoch
+            is known to have no data. In case of backend errors no stream
+            epoch is reported.
+        :rtype: list of bool
+        """
+        if not self.enabled or not stream_epochs:
+            return [False] * len(stream_epochs)
+
+        now = datetime.datetime.utcnow()
+        keys = [self.make_key(url, stream_epoch, query_params, now=now)
+                for stream_epoch in stream_epochs]
+        try:
+            return [v is not None for v in self.redis.mget(keys)]
+        except RedisError:
+            return [False] * len(stream_epochs)
+
+
+class RoutingCache:
+    """
+    Process-local cache of parsed routing tables. Entries are keyed by the
+    normalized routing request (i.e. the routing service URL, the query
+    parameters and the stream epochs).
+
+    Routing information changes only when StationLite's harvester runs.
+    Hence, entries are invalidated by means of the *generation token* exposed
+    by StationLite. The token is checked at most every
+    ``generation_interval`` seconds. Entries expire after ``ttl`` seconds
+    regardless of the token (e.g. in case the token is not available).
+
+    Routing tables are cached with open endtimes i.e. default endtimes must
+    be substituted by the caller.
+
+    :param int ttl: Time to live of entries in seconds. A TTL of 0 disables
+        the cache.
+    :param int max_entries: Maximum number of entries cached
+    :param float generation_interval: Interval in seconds the generation token
+        is checked
+    """
+
+    # aliases of routing query parameters
+    QUERY_PARAM_ALIASES = {
+        'minlat': 'minlatitude',
+        'maxlat': 'maxlatitude',
+        'minlon': 'minlongitude',
+        'maxlon': 'maxlongitude', }
+
+    def __init__(
+            self, ttl=0,
+            max_entries=settings.EIDA_FEDERATOR_ROUTING_CACHE_MAX_ENTRIES,
+            generation_interval=(
+                settings.EIDA_FEDERATOR_ROUTING_CACHE_GENERATION_INTERVAL)):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation_interval = generation_interval
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = None
+        self._last_validated = 0
+
+    @property
+    def enabled(self):
+        return bool(self.ttl)
+
+    @property
+    def generation(self):
+        return self._generation
+
+    @classmethod
+    def make_key(cls, url, query_params, stream_epochs):
+        """
+        Create the key of a routing request.
+
+        :param str url: Routing service URL
+        :param dict query_params: Routing query parameters
+        :param list stream_epochs: Stream epochs to be routed
+        """
+        query_params = sorted(
+            (cls.QUERY_PARAM_ALIASES.get(k, k), str(v))
+            for k, v in query_params.items())
+        stream_epochs = sorted(str(se) for se in stream_epochs)
+
+        return hashlib.sha256('{}{}{}'.format(
+            url, query_params, stream_epochs).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Look up the routing table cached for ``key``.
+
+        :returns: Routing table or ``None`` if not cached
+        :rtype: dict or None
+        """
+        with self._lock:
+            try:
+                expires, routing_table = self._entries[key]
+            except KeyError:
+                return None
+
+            if expires <= time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return routing_table
+
+    def set(self, key, routing_table):
+        """
+        Cache ``routing_table`` for ``key``.
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[key] = (time() + self.ttl, routing_table)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def validate(self, url, timeout=5):
+        """
+        Validate the cache by means of the generation token exposed at
+        ``url``. If the token changed, the cache is cleared. Validation is
+        performed at most every ``generation_interval`` seconds. Errors are
+        ignored i.e. entries expire by means of their TTL.
+
+        :param str url: URL of the generation resource
+        """
+        def fetch_generation():
+            resp = requests.get(url, timeout=timeout)
+            resp.raise_for_status()
+            return resp.text
+
+        self.validate_with(fetch_generation,
+                           errors=requests.exceptions.RequestException)
+
+    def validate_with(self, fetch_generation, errors=Exception):
+        """
+        Validate the cache by means of the generation token returned by
+        ``fetch_generation``.
+
+        :param fetch_generation: Callable returning the generation token
+        :param errors: Exceptions to be ignored when fetching the token
+        """
+        now = time()
+        with self._lock:
+            if now - self._last_validated < self.generation_interval:
+                return
+            self._last_validated = now
+
+        try:
+            generation = fetch_generation().strip()
+        except errors:
+            return
+
+        with self._lock:
+            if self._generation is not None and generation != self._generation:
+                self._entries.clear()
+            self._generation = generation
+
+
+class PopularQueries:
+    """
+    `Redis <https://redis.io/>`_ based registry of popular station queries
+    used for cache warming. Queries are tracked by cache key together with
+    their original request parameters. Popularity scores are decayed by means
+    of :py:meth:`age` such that queries not requested anymore eventually drop
+    out.
+
+    In order to allow newly popular queries to enter, up to
+    ``WINDOW_FACTOR * max_queries`` queries are tracked. Once exceeded, the
+    registry is trimmed to the ``max_queries`` most popular queries i.e. a new
+    query competes at least until the next trim.
+
+    :param redis: Redis client instance
+    :param int max_queries: Number of distinct queries kept when trimming the
+        registry. A value of 0 disables tracking.
+    :param int query_ttl: Time to live in seconds of the request parameters
+        of a query
+    """
+
+    # NOTE(damb): Keys share a hash tag in order to be stored on the same
+    # shard (multi-key commands).
+    KEY_PREFIX = 'cache-warmer:' + hash_tag('popular-queries') + ':'
+
+    WINDOW_FACTOR = 2
+
+    def __init__(self, redis, max_queries=0,
+                 query_ttl=settings.EIDA_FEDERATOR_CACHE_WARMER_QUERY_TTL):
+        self.redis = redis
+        self.max_queries = max_queries
+        self.query_ttl = query_ttl
+
+        self._key_scores = self.KEY_PREFIX + 'scores'
+
+    @property
+    def enabled(self):
+        return bool(self.max_queries)
+
+    def _make_query_key(self, cache_key):
+        return self.KEY_PREFIX + 'query:' + cache_key
+
+    def record(self, cache_key, query_params, stream_epochs, post=True):
+        """
+        Record a lookup of the query identified by ``cache_key``.
+
+        :param str cache_key: Cache key of the query
+        :param dict query_params: Request query parameters
+        :param stream_epochs: Stream epochs requested
+        :type stream_epochs: list of
+            :py:class:`~eidangservices.utils.sncl.StreamEpoch`
+        :param bool post: Flag indicating if the query was issued by means of
+            HTTP POST
+        """
+        if not self.enabled:
+            return
+
+        query = json.dumps({
+            'query_params': query_params,
+            'stream_epochs': StreamEpochSchema(many=True).dump(stream_epochs),
+            'post': post}, default=str)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zincrby(self._key_scores, 1, cache_key)
+            pipe.setex(self._make_query_key(cache_key), self.query_ttl, query)
+            pipe.zcard(self._key_scores)
+            num = pipe.execute()[-1]
+
+            if num > self.WINDOW_FACTOR * self.max_queries:
+                self.redis.zremrangebyrank(
+                    self._key_scores, 0, -(self.max_queries + 1))
+        except RedisError:
+            pass
+
+    def most_popular(self, num):
+        """
+        Return the ``num`` most popular queries.
+
+        :returns: List of tuples of cache key and query. A query is a
+            dictionary with the keys :code:`query_params`,
+            :code:`stream_epochs` and :code:`post`.
+        :rtype: list
+        """
+        cache_keys = [k.decode('utf-8') for k in
+                      self.redis.zrevrange(self._key_scores, 0, num - 1)]
+        if not cache_keys:
+            return []
+
+        queries = self.redis.mget(
+            [self._make_query_key(k) for k in cache_keys])
+
+        retval = []
+        expired = []
+        for cache_key, query in zip(cache_keys, queries):
+            if query is None:
+                expired.append(cache_key)
+                continue
+
+            query = json.loads(query)
+            query['stream_epochs'] = StreamEpochSchema(many=True).load(
+                query['stream_epochs'])
+            retval.append((cache_key, query))
+
+        if expired:
+            self.redis.zrem(self._key_scores, *expired)
+
+        return retval
+
+    def age(self, factor=0.5):
+        """
+        Decay popularity scores by ``factor``.
+        """
+        self.redis.zunionstore(self._key_scores, {self._key_scores: factor})
+
+
+class CacheKeyStats:
+    """
+    Per process cache key statistics.
+
+    Besides of counting cache hits and misses the statistics keep track of
+    lookups which were made identical to an earlier distinct request by means
+    of cache key canonicalization (:code:`canonicalized`). The number of
+    canonical keys tracked is bounded by ``max_keys``.
+
+    In order to aggregate the statistics of all processes, they are exported
+    by means of :py:class:`CacheMetrics`.
+
+    :param int max_keys: Maximum number of canonical keys tracked
+    :param metrics: Instrumentation the statistics are exported to
+    :type metrics: :py:class:`CacheMetrics` or None
+    """
+
+    def __init__(self, max_keys=10000, metrics=None):
+        self._max_keys = max_keys
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._keys = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.canonicalized = 0
+
+    def record_key(self, key, raw_key):
+        """
+        Record the canonical cache key ``key`` generated from a request which
+        would have been mapped to ``raw_key`` without canonicalization.
+        """
+        with self._lock:
+            raw_keys = self._keys.pop(key, set())
+            if raw_keys and raw_key not in raw_keys:
+                self.canonicalized += 1
+                if self.metrics is not None:
+                    self.metrics.inc('key_canonicalized_total')
+            raw_keys.add(raw_key)
+            self._keys[key] = raw_keys
+
+            while len(self._keys) > self._max_keys:
+                self._keys.popitem(last=False)
+
+    def record_lookup(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if self.metrics is not None:
+            self.metrics.inc('key_lookups_total',
+                             labels={'result': 'hit' if hit else 'miss'})
+
+    @property
+    def lookups(self):
+        return self.hits + self.misses
+
+    @property
+    def hit_ratio(self):
+        try:
+            return self.hits / self.lookups
+        except ZeroDivisionError:
+            return 0.
+
+    def as_dict(self):
+        return {'lookups': self.lookups,
+                'hits': self.hits,
+                'misses': self.misses,
+                'canonicalized': self.canonicalized,
+                'hit_ratio': self.hit_ratio}
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+            self.hits = self.misses = self.canonicalized = 0
+
+
+class CacheMetrics:
+    """
+    Cache instrumentation providing counters and histograms. Samples are
+    identified by metric name and labels (e.g. :code:`resource`,
+    :code:`level` and :code:`key_class`).
+
+    Samples are accumulated per process. By means of :py:meth:`flush`
+    accumulated samples are added to a `Redis <https://redis.io/>`_ hash
+    such that samples of all processes (including the ones of worker
+    processes) are aggregated. If disabled, recording samples is a no-op.
+
+    :param redis: Redis client instance. If ``None`` samples are kept
+        locally, only.
+    :param bool enabled: Enable instrumentation
+    """
+
+    KEY = 'cache-metrics'
+    PREFIX = 'federator_cache_'
+
+    BUCKETS = (.0005, .001, .005, .01, .05, .1, .5, 1., 5.)
+
+    METRICS = {
+        'hits_total': ('counter', 'Number of cache hits.'),
+        'misses_total': ('counter', 'Number of cache misses.'),
+        'sets_total': ('counter', 'Number of entries cached.'),
+        'rejected_total': (
+            'counter', 'Number of entries rejected by the admission policy.'),
+        'evictions_total': ('counter', 'Number of entries evicted.'),
+        'bytes_in_total': ('counter', 'Number of bytes cached.'),
+        'bytes_out_total': ('counter', 'Number of bytes served.'),
+        'get_seconds': ('histogram', 'Cache lookup latency in seconds.'),
+        'set_seconds': ('histogram', 'Cache update latency in seconds.'),
+        'key_lookups_total': (
+            'counter', 'Number of cache key lookups (by result).'),
+        'key_canonicalized_total': (
+            'counter', 'Number of lookups made identical to an earlier '
+                       'distinct request by cache key canonicalization.'),
+        'compress_seconds': (
+            'histogram', 'Serialization latency in seconds.'),
+        'decompress_seconds': (
+            'histogram', 'Deserialization latency in seconds.'), }
+
+    def __init__(self, redis=None, enabled=False):
+        self.redis = redis
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._samples = collections.Counter()
+
+    @staticmethod
+    def _make_sample_name(name, labels=None, **kwargs):
+        labels = dict(labels or {}, **kwargs)
+        if not labels:
+            return name
+
+        return '{}{{{}}}'.format(name, ','.join(
+            '{}="{}"'.format(k, v) for k, v in sorted(labels.items())))
+
+    def inc(self, name, value=1, labels=None):
+        """
+        Increment the counter ``name`` by ``value``.
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._samples[self._make_sample_name(
+                self.PREFIX + name, labels)] += value
+
+    def observe(self, name, value, labels=None):
+        """
+        Add the observation ``value`` to the histogram ``name``.
+        """
+        if not self.enabled:
+            return
+
+        name = self.PREFIX + name
+        with self._lock:
+            for le in self.BUCKETS:
+                if value <= le:
+                    self._samples[self._make_sample_name(
+                        name + '_bucket', labels, le=repr(le))] += 1
+            self._samples[self._make_sample_name(
+                name + '_bucket', labels, le='+Inf')] += 1
+            self._samples[self._make_sample_name(
+                name + '_sum', labels)] += value
+            self._samples[self._make_sample_name(
+                name + '_count', labels)] += 1
+
+    @contextlib.contextmanager
+    def timer(self, name, labels=None):
+        """
+        Context manager adding the time elapsed to the histogram ``name``.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start = time()
+        try:
+            yield
+        finally:
+            self.observe(name, time() - start, labels=labels)
+
+    def flush(self):
+        """
+        Add locally accumulated samples to the Redis hash. In case of backend
+        errors samples are retained.
+        """
+        if not self.enabled or self.redis is None:
+            return
+
+        with self._lock:
+            samples, self._samples = self._samples, collections.Counter()
+
+        if not samples:
+            return
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for sample, value in samples.items():
+                pipe.hincrbyfloat(self.KEY, sample, value)
+            pipe.execute()
+        except RedisError:
+            with self._lock:
+                self._samples.update(samples)
+
+    def as_dict(self):
+        """
+        Return the samples as a dictionary. If a Redis client is configured
+        the samples aggregated by means of Redis are returned.
+
+        :rtype: dict
+        """
+        if self.redis is None:
+            with self._lock:
+                return dict(self._samples)
+
+        self.flush()
+        return {k.decode('utf-8'): float(v)
+                for k, v in self.redis.hgetall(self.KEY).items()}
+
+    def dump(self):
+        """
+        Dump the samples using the `Prometheus text exposition format
+        <https://prometheus.io/docs/instrumenting/exposition_formats/>`_.
+
+        :rtype: str
+        """
+        samples = self.as_dict()
+
+        lines = []
+        for name, (metric_type, help_text) in sorted(self.METRICS.items()):
+            name = self.PREFIX + name
+            lines.append('# HELP {} {}'.format(name, help_text))
+            lines.append('# TYPE {} {}'.format(name, metric_type))
+            for sample in sorted(samples):
+                if sample.split('{')[0] in (
+                        name, name + '_bucket', name + '_sum',
+                        name + '_count'):
+                    lines.append('{} {!r}'.format(sample, samples[sample]))
+
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+        if self.redis is not None:
+            self.redis.delete(self.KEY)
+
+
+class FrequencySketch:
+    """
+    Count-min sketch estimating the access frequency of keys. In order to
+    keep track of recent popularity, counters are halved (*aged*) after
+    ``sample_size`` increments (see also `TinyLFU
+    <https://arxiv.org/abs/1512.00727>`_).
+
+    :param int width: Number of counters per row
+    :param int depth: Number of rows (i.e. hash functions); at most 8
+    :param int sample_size: Number of increments before counters are halved.
+        If ``None``, ten times ``width`` is used.
+    """
+
+    MAX_COUNT = 255
+
+    def __init__(self, width=2**16, depth=4, sample_size=None):
+        self._width = width
+        self._depth = depth
+        self._sample_size = sample_size or 10 * width
+
+        self._lock = threading.Lock()
+        self._rows = [bytearray(width) for _ in range(depth)]
+        self._additions = 0
+
+    def _indices(self, key):
+        if isinstance(key, str):
+            key = key.encode('utf-8')
+        digest = hashlib.blake2b(key, digest_size=4 * self._depth).digest()
+        return [int.from_bytes(digest[i * 4:(i + 1) * 4], 'little') %
+                self._width for i in range(self._depth)]
+
+    def increment(self, key):
+        with self._lock:
+            for row, idx in zip(self._rows, self._indices(key)):
+                if row[idx] < self.MAX_COUNT:
+                    row[idx] += 1
+
+            self._additions += 1
+            if self._additions >= self._sample_size:
+                self._reset()
+
+    def frequency(self, key):
+        with self._lock:
+            return min(row[idx]
+                       for row, idx in zip(self._rows, self._indices(key)))
+
+    def _reset(self):
+        self._rows = [bytearray(c >> 1 for c in row) for row in self._rows]
+        self._additions //= 2
+
+
+class AdmissionPolicy:
+    """
+    Cache admission policy. An entry is exclusively admitted if its size does
+    not exceed ``max_entry_size`` and if the entry's key was looked up at
+    least ``min_frequency`` times (within the sketch's sample period).
+
+    Key frequencies are tracked per process.
+
+    :param int max_entry_size: Maximum size of an entry in bytes. A value of
+        0 indicates no limit.
+    :param int min_frequency: Minimum number of lookups before an entry is
+        admitted. A value of 0 disables frequency based admission.
+    """
+
+    def __init__(self, max_entry_size=0, min_frequency=0):
+        self.max_entry_size = max_entry_size
+        self.min_frequency = min_frequency
+        self.sketch = FrequencySketch()
+
+        self.rejected = 0
+
+    def record(self, key):
+        """
+        Record a lookup of ``key``.
+        """
+        if self.min_frequency:
+            self.sketch.increment(key)
+
+    def admit(self, key, size):
+        """
+        Validate if an entry for ``key`` of ``size`` bytes is admitted.
+
+        :rtype: bool
+        """
+        retval = ((not self.max_entry_size or size <= self.max_entry_size) and
+                  (not self.min_frequency or
+                   self.sketch.frequency(key) >= self.min_frequency))
+        if not retval:
+            self.rejected += 1
+
+        return retval
 
 
 # -----------------------------------------------------------------------------
@@ -341,7 +1259,21 @@ class Cache:
         'fs': FileSystemCache,
     }
 
-    def __init__(self, config=None):
+    # suffix of the sibling keys entity tags are stored with
+    ETAG_KEY_SUFFIX = ':etag'
+
+    def __init__(self, config=None, metrics=None):
+        """
+        :param dict config: Cache configuration
+        :param metrics: Instrumentation
+        :type metrics: :py:class:`CacheMetrics` or None
+        """
+
+        self.lease_timeout = 0
+        self.key_endtime_granularity = 0
+        self.metrics = metrics or CacheMetrics()
+        self.key_stats = CacheKeyStats(metrics=self.metrics)
+        self.admission = AdmissionPolicy()
 
         if not isinstance(config, (dict, type(None))):
             raise TypeError("Invalid type for 'config'.")
@@ -355,21 +1287,498 @@ class Cache:
 
         config.setdefault('CACHE_TYPE', 'null')
         config.setdefault('CACHE_KWARGS', {})
+        config.setdefault(
+            'CACHE_LEASE_TIMEOUT',
+            settings.EIDA_FEDERATOR_DEFAULT_CACHE_LEASE_TIMEOUT)
+        config.setdefault(
+            'CACHE_KEY_ENDTIME_GRANULARITY',
+            settings.EIDA_FEDERATOR_DEFAULT_CACHE_KEY_ENDTIME_GRANULARITY)
+        config.setdefault(
+            'CACHE_MAX_ENTRY_SIZE',
+            settings.EIDA_FEDERATOR_DEFAULT_CACHE_MAX_ENTRY_SIZE)
+        config.setdefault(
+            'CACHE_ADMISSION_MIN_FREQUENCY',
+            settings.EIDA_FEDERATOR_DEFAULT_CACHE_ADMISSION_MIN_FREQUENCY)
 
         self._set_cache(config)
+        self.lease_timeout = config['CACHE_LEASE_TIMEOUT']
+        self.key_endtime_granularity = config['CACHE_KEY_ENDTIME_GRANULARITY']
+        self.admission = AdmissionPolicy(
+            max_entry_size=config['CACHE_MAX_ENTRY_SIZE'],
+            min_frequency=config['CACHE_ADMISSION_MIN_FREQUENCY'])
+
+    @property
+    def enabled(self):
+        return (hasattr(self, '_cache') and
+                not isinstance(self._cache, NullCache))
+
+    @property
+    def single_flight(self):
+        """
+        Validate if single-flight cache population is enabled. Single-flight
+        requires both a caching backend actually caching and a lease timeout
+        greater than zero.
+        """
+        return self.enabled and bool(self.lease_timeout)
 
     def _set_cache(self, config):
         cache_obj = self.CACHE_MAP[config['CACHE_TYPE']]
         self._cache = cache_obj(**config['CACHE_KWARGS'])
+        self._cache.metrics = self.metrics
+
+    def get(self, key, record=True, labels=None):
+        """
+        Look up ``key``.
+
+        :param bool record: Record the lookup with the admission policy
+        :param dict labels: Labels used for instrumentation. If ``None`` the
+            lookup is not instrumented.
+        """
+        if record:
+            self.admission.record(key)
+
+        if labels is None:
+            return self._cache.get(key)
+
+        with self.metrics.timer('get_seconds', labels=labels):
+            retval = self._cache.get(key)
+
+        if retval is None:
+            self.metrics.inc('misses_total', labels=labels)
+        else:
+            self.metrics.inc('hits_total', labels=labels)
+            self.metrics.inc('bytes_out_total', len(retval), labels=labels)
+
+        return retval
+
+    def set(self, key, value, *args, force=False, labels=None, size=None,
+            etag=False, **kwargs):
+        """
+        Add ``key: value`` to the cache if admitted by the admission policy.
+
+        :param bool force: Bypass the admission policy
+        :param dict labels: Labels used for instrumentation. If ``None`` the
+            update is not instrumented.
+        :param int size: Size of ``value`` in bytes (UTF-8 encoded). If
+            ``None`` the size is computed.
+        :param bool etag: Store a strong entity tag (i.e. the SHA-256 hex
+            digest of ``value``) along with the entry (see
+            :py:meth:`get_etag`)
+
+        :returns: ``True`` if the key has been updated and ``False`` for
+            either backend errors or if the entry was not admitted.
+        """
+        data = None
+        if size is None:
+            data = (value.encode('utf-8') if isinstance(value, str)
+                    else value)
+            size = len(data)
+
+        if not (force or self.admission.admit(key, size)):
+            if labels is not None:
+                self.metrics.inc('rejected_total', labels=labels)
+            return False
+
+        if etag:
+            # NOTE: Invalidate the entity tag of a previous entry first. While
+            # the entry is updated the entity tag is not available (and
+            # computed from the value, again).
+            self._cache.delete(key + self.ETAG_KEY_SUFFIX)
+
+        if labels is None:
+            retval = self._cache.set(key, value, *args, **kwargs)
+        else:
+            with self.metrics.timer('set_seconds', labels=labels):
+                retval = self._cache.set(key, value, *args, **kwargs)
+
+            if retval:
+                self.metrics.inc('sets_total', labels=labels)
+                self.metrics.inc('bytes_in_total', size, labels=labels)
 
-    def get(self, *args, **kwargs):
-        return self._cache.get(*args, **kwargs)
+        if retval and etag:
+            if data is None:
+                data = (value.encode('utf-8') if isinstance(value, str)
+                        else value)
+            self._cache.set(key + self.ETAG_KEY_SUFFIX,
+                            hashlib.sha256(data).hexdigest(), *args, **kwargs)
 
-    def set(self, *args, **kwargs):
-        return self._cache.set(*args, **kwargs)
+        return retval
+
+    def get_etag(self, key):
+        """
+        Look up the entity tag stored along with ``key`` without fetching the
+        cached value.
+
+        :returns: Entity tag or ``None`` if not available
+        :rtype: str or None
+        """
+        etag = self._cache.get(key + self.ETAG_KEY_SUFFIX)
+        if etag is None:
+            return None
+        return etag.decode('utf-8')
 
     def delete(self, *args, **kwargs):
         return self._cache.delete(*args, **kwargs)
 
+    @property
+    def default_timeout(self):
+        return self._cache.default_timeout
+
+    def ttl(self, *args, **kwargs):
+        return self._cache.ttl(*args, **kwargs)
+
     def __contains__(self, *args, **kwargs):
         return self._cache.__contains__(*args, **kwargs)
+
+
+class WFCatalogCache(Cache):
+    """
+    Cache for `WFCatalog <https://www.orfeus-eu.org/data/eida/webservices/
+    wfcatalog/>`_ documents. Documents are cached per stream and UTC day.
+
+    Documents of days which are not final, yet, (i.e. days which might still
+    be processed by the WFCatalog) are cached for ``current_day_timeout``
+    seconds, only. A timeout of 0 disables caching those documents.
+    """
+
+    DAY = datetime.timedelta(days=1)
+
+    def __init__(self, config=None, metrics=None):
+        self.current_day_timeout = 0
+        self.min_age = datetime.timedelta(
+            seconds=settings.EIDA_FEDERATOR_WFCATALOG_CACHE_MIN_AGE)
+
+        super().__init__(config=config, metrics=metrics)
+
+    def init_cache(self, config={}):
+        super().init_cache(config=config)
+        self.current_day_timeout = config.get(
+            'CACHE_CURRENT_DAY_TIMEOUT', 0)
+
+    def is_final(self, day, now=None):
+        """
+        Validate if the documents of ``day`` are final.
+        """
+        now = now or datetime.datetime.utcnow()
+        return day + self.DAY + self.min_age <= now
+
+    def get_timeout(self, day, now=None):
+        """
+        Return the timeout documents of ``day`` are cached with.
+
+        :returns: Timeout in seconds. ``None`` refers to the backend's default
+            timeout while ``0`` indicates that the documents must not be
+            cached.
+        """
+        if self.is_final(day, now=now):
+            return None
+        return self.current_day_timeout
+
+
+# -----------------------------------------------------------------------------
+def utc_days(starttime, endtime):
+    """
+    Return the UTC days covering the epoch ``[starttime, endtime)``.
+
+    :param starttime: Epoch starttime
+    :type starttime: :py:class:`datetime.datetime`
+    :param endtime: Epoch endtime
+    :type endtime: :py:class:`datetime.datetime`
+    :rtype: list of :py:class:`datetime.datetime`
+    """
+    day = datetime.datetime.combine(starttime.date(), datetime.time())
+    retval = []
+    while day < endtime:
+        retval.append(day)
+        day += datetime.timedelta(days=1)
+
+    return retval
+
+
+def _mseed_sample_rate(factor, multiplier):
+    if factor > 0 and multiplier > 0:
+        return float(factor * multiplier)
+    elif factor > 0 and multiplier < 0:
+        return -factor / multiplier
+    elif factor < 0 and multiplier > 0:
+        return -multiplier / factor
+    elif factor < 0 and multiplier < 0:
+        return 1. / (factor * multiplier)
+    return 0.
+
+
+def iter_mseed_records(ifd, default_record_length=512):
+    """
+    Generator function iterating over the `miniSEED
+    <https://www.fdsn.org/seed_manual/SEEDManual_V2.4.pdf>`_ records read from
+    the file-like object ``ifd``.
+
+    Record lengths are determined by means of blockette 1000. The generator
+    emerges tuples of ``(starttime, endtime, record)`` where ``starttime``
+    and ``endtime`` correspond to the time window covered by the record's
+    samples.
+
+    :param ifd: File-like object opened in binary mode
+    :param int default_record_length: Record length used if a record does not
+        contain a blockette 1000
+    """
+    HEADER_SIZE = 48
+
+    while True:
+        header = ifd.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            break
+
+        # byte order detection by means of a plausible year
+        byte_order = '>'
+        if not 1900 <= struct.unpack('>H', header[20:22])[0] <= 2100:
+            byte_order = '<'
+
+        (year, doy, hour, minute, second, _, fract, num_samples,
+         factor, multiplier, activity_flags, _, _, _, time_correction,
+         _, offset_blockette) = struct.unpack(
+            byte_order + 'HHBBBBHHhhBBBBlHH', header[20:HEADER_SIZE])
+
+        # read the remaining record by means of blockette 1000
+        record_length = default_record_length
+        data = ifd.read(default_record_length - HEADER_SIZE)
+        record = header + data
+        while offset_blockette and offset_blockette + 7 <= len(record):
+            blockette_type, offset_next = struct.unpack(
+                byte_order + 'HH',
+                record[offset_blockette:offset_blockette + 4])
+            if blockette_type == 1000:
+                record_length = 2 ** record[offset_blockette + 6]
+                break
+            if offset_next <= offset_blockette:
+                break
+            offset_blockette = offset_next
+
+        if record_length > len(record):
+            record += ifd.read(record_length - len(record))
+        elif record_length < len(record):
+            ifd.seek(record_length - len(record), os.SEEK_CUR)
+            record = record[:record_length]
+
+        starttime = datetime.datetime(year, 1, 1) + datetime.timedelta(
+            days=doy - 1, hours=hour, minutes=minute, seconds=second,
+            microseconds=fract * 100)
+        if not activity_flags & 0x02:
+            starttime += datetime.timedelta(
+                microseconds=time_correction * 100)
+
+        endtime = starttime
+        sample_rate = _mseed_sample_rate(factor, multiplier)
+        if sample_rate and num_samples:
+            endtime += datetime.timedelta(seconds=num_samples / sample_rate)
+
+        yield starttime, endtime, record
+
+
+class MiniSEEDTileCache:
+    """
+    File system based `miniSEED
+    <https://www.fdsn.org/seed_manual/SEEDManual_V2.4.pdf>`_ cache. Data is
+    cached by means of *tiles* i.e. per stream and UTC day. The cache is
+    bounded by a disk quota. If the quota is exceeded least recently used tiles
+    are evicted.
+
+    Tiles are exclusively cached if they are *final* i.e. if the tile's day
+    passed at least ``min_age`` seconds ago.
+
+    Make absolutely sure that nobody but this cache stores files there or
+    otherwise the cache will randomly delete files therein.
+    """
+
+    # used for temporary files by the MiniSEEDTileCache
+    _fs_transaction_suffix = '.__fed_tile'
+
+    TILE_DURATION = datetime.timedelta(days=1)
+
+    # labels used for instrumentation
+    METRICS_LABELS = {'resource': 'fdsnws-dataselect', 'level': '',
+                      'key_class': 'tile'}
+
+    def __init__(self, cache_dir=None,
+                 quota=settings.EIDA_FEDERATOR_DEFAULT_TILE_CACHE_QUOTA,
+                 min_age=settings.EIDA_FEDERATOR_DEFAULT_TILE_CACHE_MIN_AGE,
+                 mode=0o600, metrics=None):
+        self._path = None
+        self._quota = quota
+        self._min_age = datetime.timedelta(seconds=min_age)
+        self._mode = mode
+        self._size = 0
+        self.metrics = metrics or CacheMetrics()
+
+        if cache_dir:
+            self.init_cache(cache_dir, quota=quota, min_age=min_age,
+                            mode=mode)
+
+    def init_cache(self, cache_dir,
+                   quota=settings.EIDA_FEDERATOR_DEFAULT_TILE_CACHE_QUOTA,
+                   min_age=settings.EIDA_FEDERATOR_DEFAULT_TILE_CACHE_MIN_AGE,
+                   mode=0o600):
+        """
+        :param str cache_dir: Location of the tile cache. If ``None`` the cache
+            is disabled.
+        :param int quota: Disk quota in bytes. A quota of 0 indicates no
+            quota.
+        :param int min_age: Minimum age in seconds of a tile's end before the
+            tile is cached
+        """
+        self._path = cache_dir
+        self._quota = quota
+        self._min_age = datetime.timedelta(seconds=min_age)
+        self._mode = mode
+
+        if not self._path:
+            return
+
+        try:
+            os.makedirs(self._path)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise CacheError(err)
+
+        self._size = sum(size for _, size, _ in self._list_tiles())
+
+    @property
+    def enabled(self):
+        return bool(self._path)
+
+    @classmethod
+    def tiles(cls, starttime, endtime):
+        """
+        Return the days of the tiles covering the epoch ``[starttime,
+        endtime)``.
+
+        :param starttime: Epoch starttime
+        :type starttime: :py:class:`datetime.datetime`
+        :param endtime: Epoch endtime
+        :type endtime: :py:class:`datetime.datetime`
+        :rtype: list of :py:class:`datetime.datetime`
+        """
+        return utc_days(starttime, endtime)
+
+    def is_final(self, day, now=None):
+        """
+        Validate if the tile for ``day`` is final i.e. may be cached.
+        """
+        now = now or datetime.datetime.utcnow()
+        return day + self.TILE_DURATION + self._min_age <= now
+
+    def get(self, stream, day):
+        """
+        Look up the tile for ``stream`` and ``day``.
+
+        :param stream: Stream
+        :type stream: :py:class:`~eidangservices.utils.sncl.Stream`
+        :param day: Day of the tile
+        :type day: :py:class:`datetime.datetime`
+
+        :returns: The path to the tile if cached, else ``None``.
+        """
+        filename = self._get_filename(stream, day)
+        try:
+            # mark as recently used
+            os.utime(filename)
+            size = os.path.getsize(filename)
+        except OSError:
+            self.metrics.inc('misses_total', labels=self.METRICS_LABELS)
+            return None
+
+        self.metrics.inc('hits_total', labels=self.METRICS_LABELS)
+        self.metrics.inc('bytes_out_total', size, labels=self.METRICS_LABELS)
+        return filename
+
+    def set(self, stream, day, records):
+        """
+        Add a tile to the cache. An already existing tile is overwritten.
+
+        :param stream: Stream
+        :type stream: :py:class:`~eidangservices.utils.sncl.Stream`
+        :param day: Day of the tile
+        :type day: :py:class:`datetime.datetime`
+        :param records: Iterable of miniSEED records. An empty iterable is
+            cached as an empty tile.
+
+        :returns: ``True`` if the tile has been cached and ``False`` for
+            backend errors.
+        :rtype: bool
+        """
+        filename = self._get_filename(stream, day)
+        size = 0
+        tmp = None
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(suffix=self._fs_transaction_suffix,
+                                       dir=os.path.dirname(filename))
+            with os.fdopen(fd, 'wb') as ofd:
+                for record in records:
+                    size += len(record)
+                    ofd.write(record)
+
+            # account for the tile replaced
+            try:
+                replaced = os.path.getsize(filename)
+            except OSError:
+                replaced = 0
+
+            os.rename(tmp, filename)
+            os.chmod(filename, self._mode)
+        except (IOError, OSError):
+            if tmp is not None and os.path.isfile(tmp):
+                os.remove(tmp)
+            return False
+
+        self._size += size - replaced
+        self.metrics.inc('sets_total', labels=self.METRICS_LABELS)
+        self.metrics.inc('bytes_in_total', size, labels=self.METRICS_LABELS)
+        self._prune()
+        return True
+
+    def _get_filename(self, stream, day):
+        return os.path.join(
+            self._path, stream.network, stream.station,
+            '{}.{}'.format(stream.id(), day.strftime('%Y.%j')))
+
+    def _list_tiles(self):
+        """
+        Return a list of ``(filename, size, last_used)`` tuples of the tiles
+        cached.
+        """
+        retval = []
+        for root, _, fnames in os.walk(self._path):
+            for fname in fnames:
+                if fname.endswith(self._fs_transaction_suffix):
+                    continue
+                fname = os.path.join(root, fname)
+                try:
+                    st = os.stat(fname)
+                except OSError:
+                    continue
+                retval.append((fname, st.st_size, st.st_mtime))
+
+        return retval
+
+    def _prune(self):
+        """
+        Evict least recently used tiles until the quota is met.
+        """
+        if not self._quota or self._size <= self._quota:
+            return
+
+        # NOTE(damb): The cache might be shared by multiple processes. Hence,
+        # the size is recomputed.
+        tiles = sorted(self._list_tiles(), key=lambda t: t[2])
+        self._size = sum(size for _, size, _ in tiles)
+
+        for fname, size, _ in tiles:
+            if self._size <= self._quota:
+                break
+            try:
+                os.remove(fname)
+            except OSError:
+                continue
+            self._size -= size
+            self.metrics.inc('evictions_total', labels=self.METRICS_LABELS)
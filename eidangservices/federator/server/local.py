@@ -0,0 +1,817 @@
+# -*- coding: utf-8 -*-
+"""
+Redis-free storage facilities for single-node deployments.
+
+:py:class:`LocalRedis` implements the subset of the `redis-py
+<https://redis-py.readthedocs.io/en/latest/>`_ client API used by the
+federator (context locks, response code statistics, cache leases, the negative
+cache, etc.) on top of a memory-mapped `SQLite <https://sqlite.org/>`_
+database file. Since the database file is shared by all processes of a host,
+the storage is suitable for multi-process WSGI deployments. By default, the
+database file is located on a *tmpfs* i.e. in shared memory.
+
+The storage is selected by means of a storage URL with the scheme ``local``,
+e.g. ``local:///dev/shm/eida-federator.db``.
+
+.. note::
+
+    The database file is created with mode ``0600``. Database files owned by
+    another user are refused. Values are stored as plain, tagged binary data
+    (i.e. loading values never executes code).
+"""
+
+import contextlib
+import math
+import os
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+
+from urllib.parse import urlsplit
+
+from redis.exceptions import RedisError, ResponseError
+
+from eidangservices import settings
+
+
+def default_path():
+    """
+    Return the default path of the local storage database file.
+    """
+    dirname = ('/dev/shm' if os.path.isdir('/dev/shm') else
+               tempfile.gettempdir())
+    return os.path.join(
+        dirname, settings.EIDA_FEDERATOR_LOCAL_STORAGE_FILENAME)
+
+
+class LocalStoreError(RedisError):
+    """Local storage error ({})."""
+
+
+# type tags
+_TAG_BYTES = b's'
+_TAG_HASH = b'h'
+_TAG_ZSET = b'z'
+
+
+def _serialize(value):
+    """
+    Serialize a string value (i.e. :py:class:`bytes`).
+    """
+    return _TAG_BYTES + value
+
+
+def _deserialize(data):
+    """
+    The complementary function of :py:func:`_serialize`.
+
+    :raises LocalStoreError: If ``data`` is invalid
+    """
+    data = bytes(data)
+    if data[:1] != _TAG_BYTES:
+        raise LocalStoreError('Invalid value tag: {!r}'.format(data[:1]))
+    return data[1:]
+
+
+def _open_database_file(path):
+    """
+    Create the database file ``path`` with mode ``0600`` (if not existing).
+    Both database files not owned by the current user and symbolic links are
+    refused (also for SQLite's auxiliary files).
+
+    :raises LocalStoreError: If the database file is refused
+    """
+    try:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+    except OSError as err:
+        raise LocalStoreError(err)
+
+    try:
+        st = os.fstat(fd)
+    finally:
+        os.close(fd)
+
+    if not stat.S_ISREG(st.st_mode) or st.st_uid != os.getuid():
+        raise LocalStoreError(
+            'Refusing to open database file not owned by the current '
+            'user: {!r}'.format(path))
+
+    for suffix in ('-wal', '-shm', '-journal'):
+        try:
+            st = os.lstat(path + suffix)
+        except FileNotFoundError:
+            continue
+        except OSError as err:
+            raise LocalStoreError(err)
+
+        if not stat.S_ISREG(st.st_mode) or st.st_uid != os.getuid():
+            raise LocalStoreError(
+                'Refusing to open database file not owned by the current '
+                'user: {!r}'.format(path + suffix))
+
+
+class LocalPipeline:
+    """
+    Pipeline implementation for :py:class:`LocalRedis`. Buffered commands are
+    executed atomically within a single database transaction.
+
+    :param client: Client commands are executed with
+    :type client: :py:class:`LocalRedis`
+    :param bool immediate: Execute commands immediately until
+        :py:meth:`multi` is called (used for watched transactions)
+    """
+
+    def __init__(self, client, immediate=False):
+        self._client = client
+        self._immediate = immediate
+        self._stack = []
+
+    def multi(self):
+        self._immediate = False
+
+    def watch(self, *names):
+        # NOTE(damb): Transactions are serialized by means of database locks.
+        # Hence, there is nothing to watch.
+        pass
+
+    def unwatch(self):
+        pass
+
+    def execute(self, raise_on_error=True):
+        stack, self._stack = self._stack, []
+        with self._client._txn():
+            return [getattr(self._client, name)(*args, **kwargs)
+                    for name, args, kwargs in stack]
+
+    def reset(self):
+        self._stack = []
+
+    def __len__(self):
+        return len(self._stack)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.reset()
+
+    def __getattr__(self, name):
+        if name.startswith('_') or not callable(
+                getattr(self._client, name, None)):
+            raise AttributeError(name)
+
+        def command(*args, **kwargs):
+            if self._immediate:
+                return getattr(self._client, name)(*args, **kwargs)
+
+            self._stack.append((name, args, kwargs))
+            return self
+
+        return command
+
+
+class LocalRedis:
+    """
+    Redis compatible client storing data within a SQLite database file shared
+    by the processes of a single host.
+
+    Keys are stored together with their type and expiration time. Members of
+    both hashes and sorted sets are stored as individual rows i.e. updating a
+    member does not imply rewriting the entire value. Expired keys are
+    removed lazily when accessed and purged periodically.
+
+    Commands only reading data are executed within deferred transactions
+    (i.e. readers neither take the database's write lock nor wait for
+    writers) while commands modifying data take the write lock immediately.
+
+    :param str path: Path to the database file
+    :param float timeout: Timeout in seconds waiting for database locks
+    """
+
+    SCHEME = 'local'
+
+    ENCODING = 'utf-8'
+    PURGE_INTERVAL = 60  # seconds
+    MMAP_SIZE = 64 * 1024 * 1024
+    SCHEMA_VERSION = 2
+
+    def __init__(self, path=None, timeout=5):
+        self.path = path or default_path()
+        self.timeout = timeout
+
+        self._local = threading.local()
+        self._last_purge = 0
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        """
+        Create a client from a storage URL, e.g.
+        ``local:///dev/shm/eida-federator.db``. If the URL does not specify a
+        path the default path is used.
+        """
+        split_result = urlsplit(url)
+        if split_result.scheme != cls.SCHEME:
+            raise ValueError('Invalid local storage URL: {!r}'.format(url))
+
+        return cls(path=split_result.path or None,
+                   timeout=kwargs.get('socket_timeout') or 5)
+
+    @classmethod
+    def is_local_url(cls, url):
+        return bool(url) and urlsplit(url).scheme == cls.SCHEME
+
+    # -------------------------------------------------------------------------
+    # generic commands
+    def ping(self):
+        self._conn
+        return True
+
+    def dbsize(self):
+        with self._txn(write=False) as conn:
+            row = conn.execute(
+                'SELECT COUNT(*) FROM store WHERE expires IS NULL OR '
+                'expires > ?', (time.time(),)).fetchone()
+        return row[0]
+
+    def flushdb(self):
+        with self._txn() as conn:
+            conn.execute('DELETE FROM members')
+            conn.execute('DELETE FROM store')
+        return True
+
+    def delete(self, *names):
+        with self._txn():
+            return sum(int(self._remove(name)) for name in names)
+
+    def exists(self, *names):
+        with self._txn(write=False):
+            return sum(int(self._type(name) is not None) for name in names)
+
+    def expire(self, name, time):
+        with self._txn() as conn:
+            if self._type(name) is None:
+                return False
+
+            conn.execute('UPDATE store SET expires = ? WHERE key = ?',
+                         (self._expires(time), self._key(name)))
+            return True
+
+    def ttl(self, name):
+        with self._txn(write=False) as conn:
+            row = conn.execute(
+                'SELECT expires FROM store WHERE key = ?',
+                (self._key(name),)).fetchone()
+
+        if row is None:
+            return -2
+        if row[0] is None:
+            return -1
+
+        remaining = row[0] - time.time()
+        return -2 if remaining <= 0 else int(math.ceil(remaining))
+
+    # -------------------------------------------------------------------------
+    # strings
+    def get(self, name):
+        with self._txn(write=False):
+            return self._load(name)
+
+    def mget(self, keys, *args):
+        if isinstance(keys, (str, bytes)):
+            keys = [keys]
+        keys = list(keys) + list(args)
+
+        with self._txn(write=False):
+            return [self._load(key) for key in keys]
+
+    def set(self, name, value, ex=None, px=None, nx=False, xx=False):
+        expires = None
+        if ex is not None:
+            expires = self._expires(ex)
+        elif px is not None:
+            expires = self._expires(px / 1000)
+
+        with self._txn():
+            type_ = self._type(name)
+            if (nx and type_ is not None) or (xx and type_ is None):
+                return None
+
+            if type_ not in (None, _TAG_BYTES):
+                self._remove(name)
+            self._store(name, _serialize(self._encode(value)),
+                        expires=expires)
+            return True
+
+    def setex(self, name, time, value):
+        return self.set(name, value, ex=time)
+
+    # -------------------------------------------------------------------------
+    # hashes
+    def hget(self, name, key):
+        with self._txn(write=False) as conn:
+            if not self._exists(name, _TAG_HASH):
+                return None
+
+            row = conn.execute(
+                'SELECT value FROM members WHERE key = ? AND member = ?',
+                (self._key(name), self._encode(key))).fetchone()
+            return None if row is None else row[0]
+
+    def hgetall(self, name):
+        with self._txn(write=False) as conn:
+            if not self._exists(name, _TAG_HASH):
+                return {}
+
+            return dict(conn.execute(
+                'SELECT member, value FROM members WHERE key = ?',
+                (self._key(name),)))
+
+    def hlen(self, name):
+        with self._txn(write=False):
+            if not self._exists(name, _TAG_HASH):
+                return 0
+            return self._count(name)
+
+    def hset(self, name, key, value):
+        with self._txn():
+            self._create(name, _TAG_HASH)
+            added = self._member(name, key, 'value') is None
+            self._store_member(name, key, value=self._encode(value))
+            return int(added)
+
+    def hdel(self, name, *keys):
+        with self._txn():
+            if not self._exists(name, _TAG_HASH):
+                return 0
+
+            num = sum(int(self._remove_member(name, key)) for key in keys)
+            self._remove_if_empty(name)
+            return num
+
+    def hincrby(self, name, key, amount=1):
+        return int(self._hincr(name, key, int(amount), int))
+
+    def hincrbyfloat(self, name, key, amount=1.0):
+        return self._hincr(name, key, float(amount), float)
+
+    # -------------------------------------------------------------------------
+    # sorted sets
+    def zadd(self, name, mapping, nx=False, xx=False):
+        with self._txn():
+            self._create(name, _TAG_ZSET)
+            added = 0
+            for member, score in mapping.items():
+                exists = self._member(name, member, 'score') is not None
+                if (nx and exists) or (xx and not exists):
+                    continue
+                added += int(not exists)
+                self._store_member(name, member, score=float(score))
+
+            self._remove_if_empty(name)
+            return added
+
+    def zincrby(self, name, amount, value):
+        with self._txn():
+            self._create(name, _TAG_ZSET)
+            score = (self._member(name, value, 'score') or 0.) + float(amount)
+            self._store_member(name, value, score=score)
+            return score
+
+    def zscore(self, name, value):
+        with self._txn(write=False):
+            if not self._exists(name, _TAG_ZSET):
+                return None
+            return self._member(name, value, 'score')
+
+    def zcard(self, name):
+        with self._txn(write=False):
+            if not self._exists(name, _TAG_ZSET):
+                return 0
+            return self._count(name)
+
+    def zcount(self, name, min, max):
+        with self._txn(write=False):
+            if not self._exists(name, _TAG_ZSET):
+                return 0
+            return self._count(name, *self._zscore_range(min, max))
+
+    def zrange(self, name, start, end, desc=False, withscores=False):
+        with self._txn(write=False) as conn:
+            if not self._exists(name, _TAG_ZSET):
+                return []
+
+            offset, limit = self._zslice(name, start, end)
+            items = conn.execute(
+                'SELECT member, score FROM members WHERE key = ? '
+                'ORDER BY score {0}, member {0} LIMIT ? OFFSET ?'.format(
+                    'DESC' if desc else 'ASC'),
+                (self._key(name), limit, offset)).fetchall()
+
+        return self._zresult(items, withscores)
+
+    def zrevrange(self, name, start, end, withscores=False):
+        return self.zrange(name, start, end, desc=True,
+                           withscores=withscores)
+
+    def zrangebyscore(self, name, min, max, withscores=False):
+        with self._txn(write=False):
+            items = self._zrangebyscore(name, min, max)
+
+        return self._zresult(items, withscores)
+
+    def zrevrangebyscore(self, name, max, min, withscores=False):
+        with self._txn(write=False):
+            items = self._zrangebyscore(name, min, max, desc=True)
+
+        return self._zresult(items, withscores)
+
+    def zrem(self, name, *values):
+        with self._txn():
+            if not self._exists(name, _TAG_ZSET):
+                return 0
+
+            num = sum(int(self._remove_member(name, value))
+                      for value in values)
+            self._remove_if_empty(name)
+            return num
+
+    def zremrangebyrank(self, name, min, max):
+        with self._txn() as conn:
+            if not self._exists(name, _TAG_ZSET):
+                return 0
+
+            key = self._key(name)
+            offset, limit = self._zslice(name, min, max)
+            cursor = conn.execute(
+                'DELETE FROM members WHERE key = ? AND member IN '
+                '(SELECT member FROM members WHERE key = ? '
+                'ORDER BY score, member LIMIT ? OFFSET ?)',
+                (key, key, limit, offset))
+            self._remove_if_empty(name)
+            return cursor.rowcount
+
+    def zremrangebyscore(self, name, min, max):
+        with self._txn() as conn:
+            if not self._exists(name, _TAG_ZSET):
+                return 0
+
+            condition, params = self._zscore_range(min, max)
+            cursor = conn.execute(
+                'DELETE FROM members WHERE key = ? AND ' + condition,
+                (self._key(name),) + params)
+            self._remove_if_empty(name)
+            return cursor.rowcount
+
+    def zunionstore(self, dest, keys, aggregate=None):
+        if not isinstance(keys, dict):
+            keys = {key: 1 for key in keys}
+
+        aggregate = (aggregate or 'SUM').upper()
+        fn = {'SUM': lambda a, b: a + b, 'MIN': min, 'MAX': max}[aggregate]
+
+        with self._txn() as conn:
+            union = {}
+            for key, weight in keys.items():
+                if not self._exists(key, _TAG_ZSET):
+                    continue
+
+                for member, score in conn.execute(
+                        'SELECT member, score FROM members WHERE key = ?',
+                        (self._key(key),)):
+                    score *= weight
+                    union[member] = (fn(union[member], score)
+                                     if member in union else score)
+
+            self._remove(dest)
+            if union:
+                self._store(dest, _TAG_ZSET)
+                conn.executemany(
+                    'INSERT INTO members (key, member, score) '
+                    'VALUES (?, ?, ?)',
+                    ((self._key(dest), member, score)
+                     for member, score in union.items()))
+            return len(union)
+
+    # -------------------------------------------------------------------------
+    # pub/sub
+    def publish(self, channel, message):
+        # NOTE(damb): Messages are not delivered. Subscribers are expected to
+        # fall back to polling.
+        return 0
+
+    def pubsub(self, **kwargs):
+        raise LocalStoreError('Pub/sub not supported by the local storage.')
+
+    # -------------------------------------------------------------------------
+    # pipelines and transactions
+    def pipeline(self, transaction=True, shard_hint=None):
+        return LocalPipeline(self)
+
+    def transaction(self, func, *watches, **kwargs):
+        """
+        Execute ``func`` with a pipeline. Contrary to Redis, watching keys
+        isn't required since the transaction is serialized by means of a
+        database lock.
+        """
+        with self._txn():
+            pipe = LocalPipeline(self, immediate=True)
+            func(pipe)
+            return pipe.execute()
+
+    # -------------------------------------------------------------------------
+    @property
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            _open_database_file(self.path)
+            try:
+                conn = sqlite3.connect(self.path, timeout=self.timeout,
+                                       isolation_level=None)
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('PRAGMA synchronous=OFF')
+                conn.execute('PRAGMA mmap_size={}'.format(self.MMAP_SIZE))
+                self._create_schema(conn)
+            except sqlite3.Error as err:
+                raise LocalStoreError(err)
+
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._local.depth = 0
+            self._local.write = False
+
+        return conn
+
+    def _create_schema(self, conn):
+        if (conn.execute('PRAGMA user_version').fetchone()[0] ==
+                self.SCHEMA_VERSION):
+            return
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # NOTE: The storage is volatile. Hence, data stored with a
+            # previous schema is discarded.
+            if (conn.execute('PRAGMA user_version').fetchone()[0] !=
+                    self.SCHEMA_VERSION):
+                conn.execute('DROP TABLE IF EXISTS members')
+                conn.execute('DROP TABLE IF EXISTS store')
+                conn.execute(
+                    'CREATE TABLE store '
+                    '(key BLOB PRIMARY KEY, value BLOB NOT NULL, '
+                    'expires REAL)')
+                conn.execute(
+                    'CREATE TABLE members '
+                    '(key BLOB NOT NULL, member BLOB NOT NULL, value BLOB, '
+                    'score REAL, PRIMARY KEY (key, member)) WITHOUT ROWID')
+                conn.execute(
+                    'CREATE INDEX members_score ON members '
+                    '(key, score, member)')
+                conn.execute(
+                    'PRAGMA user_version = {}'.format(self.SCHEMA_VERSION))
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
+
+    @contextlib.contextmanager
+    def _txn(self, write=True):
+        """
+        Context manager wrapping database access into a (possibly nested)
+        transaction.
+
+        :param bool write: Take the database's write lock immediately. If
+            ``False`` the transaction is deferred i.e. it must not modify
+            data.
+        """
+        conn = self._conn
+        if self._local.depth:
+            if write and not self._local.write:
+                raise LocalStoreError(
+                    'Write access within a read-only transaction.')
+
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        try:
+            conn.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+        except sqlite3.Error as err:
+            raise LocalStoreError(err)
+
+        self._local.depth = 1
+        self._local.write = write
+        try:
+            yield conn
+        except sqlite3.Error as err:
+            conn.execute('ROLLBACK')
+            raise LocalStoreError(err)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            try:
+                if write:
+                    self._purge(conn)
+                conn.execute('COMMIT')
+            except sqlite3.Error as err:
+                raise LocalStoreError(err)
+        finally:
+            self._local.depth = 0
+            self._local.write = False
+
+    def _expired(self, name, expires):
+        if expires is None or expires > time.time():
+            return False
+
+        # NOTE: Read-only transactions leave expired keys to be removed by
+        # the next write access or purge.
+        if self._local.write:
+            self._remove(name)
+        return True
+
+    def _type(self, name):
+        """
+        Return the type tag of ``name`` or ``None`` if the key does not
+        exist.
+        """
+        row = self._conn.execute(
+            'SELECT substr(value, 1, 1), expires FROM store WHERE key = ?',
+            (self._key(name),)).fetchone()
+
+        if row is None or self._expired(name, row[1]):
+            return None
+
+        return bytes(row[0])
+
+    def _exists(self, name, tag):
+        """
+        Validate if ``name`` exists.
+
+        :raises ResponseError: If the key holds a value of another type than
+            ``tag``
+        """
+        type_ = self._type(name)
+        if type_ is None:
+            return False
+        if type_ != tag:
+            raise ResponseError(
+                'WRONGTYPE Operation against a key holding the wrong kind of '
+                'value')
+        return True
+
+    def _load(self, name):
+        row = self._conn.execute(
+            'SELECT value, expires FROM store WHERE key = ?',
+            (self._key(name),)).fetchone()
+
+        if row is None or self._expired(name, row[1]):
+            return None
+
+        if row[0][:1] in (_TAG_HASH, _TAG_ZSET):
+            raise ResponseError(
+                'WRONGTYPE Operation against a key holding the wrong kind of '
+                'value')
+        return _deserialize(row[0])
+
+    def _store(self, name, value, expires=None):
+        self._conn.execute(
+            'INSERT OR REPLACE INTO store (key, value, expires) '
+            'VALUES (?, ?, ?)', (self._key(name), value, expires))
+
+    def _create(self, name, tag):
+        """
+        Create the hash or sorted set ``name`` if not existing.
+        """
+        if not self._exists(name, tag):
+            self._store(name, tag)
+
+    def _remove(self, name):
+        key = self._key(name)
+        self._conn.execute('DELETE FROM members WHERE key = ?', (key,))
+        cursor = self._conn.execute('DELETE FROM store WHERE key = ?', (key,))
+        return bool(cursor.rowcount)
+
+    def _remove_if_empty(self, name):
+        # empty hashes and sorted sets are removed (Redis semantics)
+        if self._conn.execute(
+                'SELECT 1 FROM members WHERE key = ? LIMIT 1',
+                (self._key(name),)).fetchone() is None:
+            self._remove(name)
+
+    def _member(self, name, member, column):
+        row = self._conn.execute(
+            'SELECT {} FROM members WHERE key = ? AND member = ?'.format(
+                column), (self._key(name), self._encode(member))).fetchone()
+        return None if row is None else row[0]
+
+    def _store_member(self, name, member, value=None, score=None):
+        self._conn.execute(
+            'INSERT OR REPLACE INTO members (key, member, value, score) '
+            'VALUES (?, ?, ?, ?)',
+            (self._key(name), self._encode(member), value, score))
+
+    def _remove_member(self, name, member):
+        cursor = self._conn.execute(
+            'DELETE FROM members WHERE key = ? AND member = ?',
+            (self._key(name), self._encode(member)))
+        return bool(cursor.rowcount)
+
+    def _count(self, name, condition=None, params=()):
+        sql = 'SELECT COUNT(*) FROM members WHERE key = ?'
+        if condition:
+            sql += ' AND ' + condition
+        return self._conn.execute(
+            sql, (self._key(name),) + params).fetchone()[0]
+
+    def _purge(self, conn):
+        now = time.time()
+        if now - self._last_purge < self.PURGE_INTERVAL:
+            return
+
+        conn.execute(
+            'DELETE FROM members WHERE key IN '
+            '(SELECT key FROM store WHERE expires <= ?)', (now,))
+        conn.execute('DELETE FROM store WHERE expires <= ?', (now,))
+        self._last_purge = now
+
+    def _hincr(self, name, key, amount, type_):
+        with self._txn():
+            self._create(name, _TAG_HASH)
+            try:
+                value = type_(self._member(name, key, 'value') or b'0')
+            except ValueError:
+                raise ResponseError('hash value is not a number')
+
+            value += amount
+            self._store_member(name, key, value=self._encode(value))
+            return value
+
+    @staticmethod
+    def _expires(seconds):
+        return time.time() + float(seconds)
+
+    def _zslice(self, name, start, end):
+        """
+        Return offset and limit of the rank range ``[start, end]``.
+        """
+        if start < 0 or end < 0:
+            num = self._count(name)
+            start = start + num if start < 0 else start
+            end = end + num if end < 0 else end
+
+        start = max(start, 0)
+        return start, max(end - start + 1, 0)
+
+    def _zrangebyscore(self, name, min, max, desc=False):
+        if not self._exists(name, _TAG_ZSET):
+            return []
+
+        condition, params = self._zscore_range(min, max)
+        return self._conn.execute(
+            'SELECT member, score FROM members WHERE key = ? AND {0} '
+            'ORDER BY score {1}, member {1}'.format(
+                condition, 'DESC' if desc else 'ASC'),
+            (self._key(name),) + params).fetchall()
+
+    @classmethod
+    def _zscore_range(cls, min, max):
+        """
+        Return the SQL condition (and its parameters) matching scores within
+        ``[min, max]``. Exclusive bounds are prefixed with ``(``.
+        """
+        def parse(bound):
+            if isinstance(bound, bytes):
+                bound = bound.decode(cls.ENCODING)
+            bound = str(bound)
+            if bound.startswith('('):
+                return float(bound[1:]), True
+            return float(bound), False
+
+        (lower, lower_excl), (upper, upper_excl) = parse(min), parse(max)
+
+        return ('score {} ? AND score {} ?'.format(
+            '>' if lower_excl else '>=', '<' if upper_excl else '<='),
+            (lower, upper))
+
+    @staticmethod
+    def _zresult(items, withscores):
+        if withscores:
+            return [tuple(item) for item in items]
+        return [member for member, _ in items]
+
+    def _key(self, name):
+        return self._encode(name)
+
+    def _encode(self, value):
+        if isinstance(value, bytes):
+            return value
+        if isinstance(value, str):
+            return value.encode(self.ENCODING)
+        if isinstance(value, float):
+            return repr(value).encode(self.ENCODING)
+        return str(value).encode(self.ENCODING)
@@ -9,6 +9,8 @@ import importlib
 import logging
 import random
 import tempfile
+import threading
+import time
 import uuid
 
 from redis.exceptions import RedisError
@@ -32,6 +34,184 @@ class KeepTempfiles(enum.Enum):
     NONE = 2
 
 
+class ContextCancellation:
+    """
+    Per-process facility tracking the cancellation of request contexts.
+
+    When a context lock is released the context's key is published on a Redis
+    channel. Each process runs a single subscriber thread flipping local
+    cancellation flags. Hence, whether a context lock is still held is
+    checked in memory. Only the first check of a context within a process
+    requires a Redis round trip.
+
+    If the subscriber cannot be started, :py:meth:`is_locked` returns
+    ``None`` i.e. callers have to fall back to querying Redis.
+
+    Cancellations are exclusively recorded for contexts checked within the
+    process. The state (including the lock) is reset after forking.
+    """
+    CHANNEL = 'federator:context:released'
+
+    SUBSCRIBE_TIMEOUT = 1  # seconds
+    SLEEP_TIME = 1  # seconds
+    # seconds local flags are retained
+    MAX_AGE = 3600
+
+    def __init__(self, redis):
+        self.redis = redis
+        self._reset()
+
+    def _reset(self):
+        # NOTE: the lock might have been held by another thread while
+        # forking. Hence, it is recreated.
+        self._lock = threading.Lock()
+        self._owner_pid = os.getpid()
+        self._pid = None
+        self._thread = None
+        # key -> timestamp
+        self._watched = {}
+        self._cancelled = {}
+        # key -> number of pending checks
+        self._pending = {}
+        self._last_purge = time.time()
+
+    def _reset_after_fork(self):
+        if self._owner_pid != os.getpid():
+            self._reset()
+
+    @property
+    def active(self):
+        return (self._pid == os.getpid() and self._thread is not None and
+                self._thread.is_alive())
+
+    def start(self):
+        """
+        Start the subscriber thread of the current process (if not running,
+        yet).
+
+        :returns: ``True`` if the subscriber is running else ``False``
+        :rtype: bool
+        """
+        if self.active:
+            return True
+
+        self._reset_after_fork()
+        with self._lock:
+            if self.active:
+                return True
+
+            # NOTE(damb): Messages might have been missed. Hence, contexts
+            # must be verified, again.
+            self._watched = {}
+
+            try:
+                pubsub = self.redis.pubsub()
+                pubsub.subscribe(**{self.CHANNEL: self._handle})
+
+                # wait for the subscription to be confirmed
+                deadline = time.time() + self.SUBSCRIBE_TIMEOUT
+                while True:
+                    msg = pubsub.get_message(timeout=self.SUBSCRIBE_TIMEOUT)
+                    if msg and msg['type'] == 'subscribe':
+                        break
+                    if time.time() > deadline:
+                        pubsub.close()
+                        return False
+
+                self._thread = pubsub.run_in_thread(
+                    sleep_time=self.SLEEP_TIME, daemon=True)
+            except (RedisError, RuntimeError):
+                return False
+
+            self._pid = os.getpid()
+
+        return True
+
+    def is_locked(self, key):
+        """
+        Check if the context lock referenced by ``key`` is still held.
+
+        :returns: ``None`` if the subscriber is not available
+        :rtype: bool or None
+        :raises: :py:class:`redis.exceptions.RedisError`
+        """
+        if not self.start():
+            return None
+
+        with self._lock:
+            if key in self._cancelled:
+                return False
+            if key in self._watched:
+                return True
+
+            # record releases while checking
+            self._pending[key] = self._pending.get(key, 0) + 1
+
+        try:
+            locked = bool(self.redis.exists(key))
+        finally:
+            with self._lock:
+                num = self._pending.pop(key) - 1
+                if num:
+                    self._pending[key] = num
+
+        now = time.time()
+        with self._lock:
+            if key in self._cancelled:
+                # released in the meantime
+                return False
+
+            if locked:
+                self._watched[key] = now
+            else:
+                self._cancelled[key] = now
+
+            self._purge(now)
+
+        return locked
+
+    def is_cancelled(self, key):
+        """
+        Check the local cancellation flag of the context referenced by
+        ``key`` (without accessing Redis).
+
+        :rtype: bool
+        """
+        return self.active and key in self._cancelled
+
+    def publish(self, key):
+        """
+        Publish the cancellation of the context referenced by ``key``.
+        """
+        self.redis.publish(self.CHANNEL, key)
+
+    def _handle(self, message):
+        key = message['data']
+        if isinstance(key, bytes):
+            key = key.decode('utf-8')
+
+        with self._lock:
+            # NOTE: releases of contexts not checked within the process are
+            # ignored
+            if (self._watched.pop(key, None) is not None or
+                    key in self._pending):
+                self._cancelled[key] = time.time()
+
+    def _purge(self, now):
+        if now - self._last_purge < self.MAX_AGE:
+            return
+
+        for flags in (self._watched, self._cancelled):
+            for key, t in list(flags.items()):
+                if now - t > self.MAX_AGE:
+                    del flags[key]
+
+        self._last_purge = now
+
+
+context_cancellation = ContextCancellation(redis_client)
+
+
 class Context:
     """
     Utility implementation of a simple hierarchical request context. Request
@@ -68,12 +248,24 @@ class Context:
     def locked(self):
         if self._is_root:
             try:
-                return bool(redis_client.exists(self._key))
+                locked = context_cancellation.is_locked(self._key)
+                if locked is None:
+                    locked = bool(redis_client.exists(self._key))
+                return locked
             except RedisError as err:
                 raise self.ContextError(err)
         # check if the root context is still locked
         return self._get_root_ctx().locked
 
+    @property
+    def cancelled(self):
+        """
+        Check if the context was cancelled by means of the local cancellation
+        flag. Contrary to :py:attr:`locked` Redis is never accessed.
+        """
+        return context_cancellation.is_cancelled(
+            self._get_root_ctx()._key)
+
     @property
     def payload(self):
         return self._payload
@@ -127,6 +319,13 @@ class Context:
                         'Error while removing context lock: '
                         '{}'.format(self._key))
 
+            try:
+                context_cancellation.publish(self._key)
+            except RedisError as err:
+                raise self.ContextError(
+                    'Error while publishing context cancellation: '
+                    '{}'.format(err))
+
         else:
             root = self._get_root_ctx()
             root.release()
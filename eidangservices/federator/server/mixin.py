@@ -1,10 +1,18 @@
 # -*- coding: utf-8 -*-
 
 import base64
+import datetime
 import hashlib
+import time
 
-from eidangservices.federator.server import cache, response_code_stats
-from eidangservices.federator.server.cache import null_control
+from marshmallow.fields import Boolean
+from marshmallow.utils import missing
+
+from eidangservices import settings
+from eidangservices.federator.server import (
+    cache, popular_queries, redis_client, response_code_stats)
+from eidangservices.federator.server.cache import CacheLease
+from eidangservices.utils.sncl import StreamEpochsHandler, max_as_none
 
 
 class ClientRetryBudgetMixin:
@@ -29,6 +37,22 @@ class ClientRetryBudgetMixin:
         """
         return 100 * self.stats_retry_budget_client.get_error_ratio(url)
 
+    def get_cretry_budget_error_ratios(self, urls):
+        """
+        Return the error ratios of the response code time series referenced
+        by ``urls``. Deprecated values are garbage collected, additionally.
+        Redis is accessed within at most a single round trip.
+
+        :param urls: URLs indicating the response code time series
+        :type urls: list of str
+
+        :returns: Error ratios in percent by URL
+        :rtype: dict
+        """
+        return {url: 100 * e_ratio for url, e_ratio in
+                self.stats_retry_budget_client.get_error_ratios(
+                    urls).items()}
+
     def update_cretry_budget(self, url, code):
         """
         Add ``code`` to the response code time series referenced by
@@ -56,13 +80,50 @@ class CachingMixin:
     :py:class:`~eidangservices.federator.server.process.RequestProcessor`.
     """
 
+    # Query parameter values not restricting the result; parameters
+    # equal to those values are removed when canonicalizing query parameters
+    CACHE_KEY_NOOP_PARAMS = {
+        'minlatitude': -90.,
+        'maxlatitude': 90.,
+        'minlongitude': -180.,
+        'maxlongitude': 180.,
+        'minradius': 0.,
+        'maxradius': 180., }
+
+    # Query parameters with enumerated, case-insensitive values; values of
+    # both these and boolean parameters are lower-cased when canonicalizing
+    CACHE_KEY_CASE_INSENSITIVE_PARAMS = frozenset(('level', 'format'))
+
+    # Schema used to lookup query parameter defaults
+    CACHE_KEY_SCHEMA = None
+
+    # Resource and key class identifiers used for instrumentation
+    CACHE_RESOURCE = None
+    CACHE_KEY_CLASS = 'response'
+
     @property
     def cache(self):
         return cache
 
+    @property
+    def cache_labels(self):
+        """
+        Labels used for cache instrumentation.
+
+        :rtype: dict
+        """
+        return {'resource': self.CACHE_RESOURCE or '',
+                'level': self.query_params.get('level') or '',
+                'key_class': self.CACHE_KEY_CLASS}
+
+    @property
+    def popular_queries(self):
+        return popular_queries
+
     def make_cache_key(self, query_params, stream_epochs, key_prefix=None,
                        sort_args=True, hash_method=hashlib.md5,
-                       exclude_params=('nodata', 'service',)):
+                       exclude_params=('nodata', 'service',),
+                       canonicalize=True):
         """
         Create a cache key from ``query_params`` and ``stream_epochs``.
 
@@ -77,16 +138,185 @@ class CachingMixin:
         :param exclude_params: Keys to be excluded from the ``query_params``
             mapping while generating the key.
         :type exclude_params: tuple of str
+        :param bool canonicalize: Canonicalize both ``query_params`` and
+            ``stream_epochs`` before creating the key. Implies ``sort_args``.
+        """
+        query_params = {k: v for k, v in query_params.items()
+                        if k not in exclude_params}
+
+        if not canonicalize:
+            return self._hash_cache_key(
+                query_params, stream_epochs, key_prefix=key_prefix,
+                sort_args=sort_args, hash_method=hash_method)
+
+        raw_key = self._hash_cache_key(
+            query_params, stream_epochs, key_prefix=key_prefix,
+            hash_method=hash_method)
+
+        cache_key = self._hash_cache_key(
+            self.canonicalize_query_params(query_params),
+            self.canonicalize_stream_epochs(stream_epochs),
+            key_prefix=key_prefix, hash_method=hash_method)
+
+        cache.key_stats.record_key(cache_key, raw_key)
+        return cache_key
+
+    @staticmethod
+    def make_etag(value, hash_method=hashlib.sha256):
+        """
+        Create a strong entity tag (i.e. a content hash) for the cached
+        ``value``.
+
+        :param value: Cached value
+        :type value: bytes or str
+        :param hash_method: Hash method used for entity tag generation.
+            Default is ``hashlib.sha256``.
+        :rtype: str
+        """
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+
+        return hash_method(value).hexdigest()
+
+    @staticmethod
+    def set_cache_control(resp, max_age):
+        """
+        Set the :code:`Cache-Control` header of ``resp`` such that shared
+        caches (e.g. proxies) are allowed to cache the response for
+        ``max_age`` seconds.
+
+        :param resp: Response object
+        :type resp: :py:class:`flask.Response`
+        :param max_age: Maximum age in seconds. If either ``None`` or ``0``
+            (i.e. the cache entry never expires) the header is not set.
+        :type max_age: int or None
+
+        :returns: The response object
+        :rtype: :py:class:`flask.Response`
+        """
+        if max_age:
+            resp.cache_control.public = True
+            resp.cache_control.max_age = int(max_age)
+
+        return resp
+
+    def canonicalize_query_params(self, query_params):
+        """
+        Canonicalize query parameters. Numerical values are normalized.
+        Values of case-insensitive parameters (see
+        :py:attr:`CACHE_KEY_CASE_INSENSITIVE_PARAMS`) are lower-cased.
+        Parameters either equal to their schema default or not restricting
+        the result are removed.
+
+        :param query_params: Mapping with requested query parameters
+        :returns: Canonicalized query parameters
+        :rtype: dict
+        """
+        case_insensitive = self._get_case_insensitive_params()
+
+        def normalize(k, v):
+            try:
+                return repr(float(v))
+            except (TypeError, ValueError):
+                v = str(v)
+                return v.lower() if k in case_insensitive else v
+
+        defaults = {k: normalize(k, v)
+                    for k, v in self.CACHE_KEY_NOOP_PARAMS.items()}
+        if self.CACHE_KEY_SCHEMA is not None:
+            defaults.update(
+                {k: normalize(k, v)
+                 for k, v in self._get_schema_defaults().items()})
+
+        retval = {}
+        for k, v in query_params.items():
+            if v is None:
+                continue
+            v = normalize(k, v)
+            if defaults.get(k) == v:
+                continue
+            retval[k] = v
+
+        return retval
+
+    def canonicalize_stream_epochs(self, stream_epochs, now=None):
+        """
+        Canonicalize stream epochs. Open endtimes are bucketed to the
+        configured granularity i.e. endtimes within the current bucket are
+        treated as open. Finally, overlapping epochs are merged per stream.
+
+        :param stream_epochs: List of
+            :py:class:`~eidangservices.utils.sncl.StreamEpoch` objects.
+        :param now: Reference time used for bucketing; if ``None`` the current
+            time is used
+        :type now: :py:class:`datetime.datetime` or None
+
+        :returns: Sorted list of canonicalized
+            :py:class:`~eidangservices.utils.sncl.StreamEpoch` objects
+        :rtype: list
         """
+        now = now or datetime.datetime.utcnow()
+        granularity = cache.key_endtime_granularity
+
+        bucket = None
+        if granularity:
+            delta = now - datetime.datetime.min
+            bucket = now - datetime.timedelta(
+                seconds=delta.total_seconds() % granularity)
+
+        _stream_epochs = []
+        for se in stream_epochs:
+            starttime = se.starttime or datetime.datetime.min
+            endtime = se.endtime
+            if endtime is None or (bucket is not None and endtime >= bucket):
+                endtime = datetime.datetime.max
+
+            _stream_epochs.append(
+                se._replace(starttime=starttime, endtime=endtime))
+
+        retval = []
+        for stream_epochs in StreamEpochsHandler(_stream_epochs):
+            for se in stream_epochs:
+                with max_as_none(se.endtime) as endtime:
+                    retval.append(se._replace(endtime=endtime))
+
+        return sorted(retval)
+
+    def _get_schema_defaults(self):
+        try:
+            return type(self)._cache_key_schema_defaults
+        except AttributeError:
+            fields = self.CACHE_KEY_SCHEMA().fields
+            type(self)._cache_key_schema_defaults = {
+                name: field.missing for name, field in fields.items()
+                if not (field.load_only or field.dump_only) and
+                field.missing not in (None, missing) and
+                not callable(field.missing)}
+
+            return type(self)._cache_key_schema_defaults
+
+    def _get_case_insensitive_params(self):
+        try:
+            return type(self)._cache_key_case_insensitive_params
+        except AttributeError:
+            params = set(self.CACHE_KEY_CASE_INSENSITIVE_PARAMS)
+            if self.CACHE_KEY_SCHEMA is not None:
+                params.update(
+                    name for name, field in
+                    self.CACHE_KEY_SCHEMA().fields.items()
+                    if isinstance(field, Boolean))
+
+            type(self)._cache_key_case_insensitive_params = frozenset(params)
+            return type(self)._cache_key_case_insensitive_params
+
+    def _hash_cache_key(self, query_params, stream_epochs, key_prefix=None,
+                        sort_args=True, hash_method=hashlib.md5):
         if sort_args:
-            query_params = [(k, v) for k, v in query_params.items()
-                            if k not in exclude_params]
-            query_params = sorted(query_params)
+            query_params = sorted(query_params.items())
             stream_epochs = sorted(stream_epochs)
 
         updated = "{0}{1}{2}".format(
             key_prefix or '', query_params, stream_epochs)
-        updated.translate(*null_control)
 
         cache_key = hash_method()
         cache_key.update(updated.encode("utf-8"))
@@ -95,9 +325,16 @@ class CachingMixin:
 
         return cache_key
 
-    def cache_stream(self, generator, cache_key, timeout=None):
+    def cache_stream(self, generator, cache_key, timeout=None, lease=None,
+                     force=False):
         """
         Caching generator wrapper for ``generator``.
+
+        :param lease: Lease to be released after the stream was cached or
+            streaming was aborted
+        :type lease: None or
+            :py:class:`~eidangservices.federator.server.cache.CacheLease`
+        :param bool force: Bypass the cache admission policy
         """
 
         stream_buffer = []
@@ -111,20 +348,127 @@ class CachingMixin:
             # cache streamed response
             try:
                 cache.set(
-                    cache_key, "".join(stream_buffer), timeout=timeout)
+                    cache_key, "".join(stream_buffer), timeout=timeout,
+                    force=force, labels=self.cache_labels, etag=True)
             except Exception as err:
                 raise err
                 # TODO TODO TODO
                 # Report warning
                 pass
+        finally:
+            if lease is not None:
+                lease.release()
+
+    def create_cache_lease(self, cache_key):
+        """
+        Create a lease for single-flight cache population of ``cache_key``.
+
+        :returns: Lease object or ``None`` if single-flight cache population
+            is disabled.
+        :rtype: None or
+            :py:class:`~eidangservices.federator.server.cache.CacheLease`
+        """
+        if not cache.single_flight:
+            return None
+
+        return CacheLease(cache_key, redis=redis_client,
+                          timeout=cache.lease_timeout)
+
+    def wait_for_cache(
+            self, cache_key, lease,
+            interval=settings.EIDA_FEDERATOR_CACHE_LEASE_POLL_INTERVAL):
+        """
+        Wait until either ``cache_key`` was populated by the request holding
+        ``lease`` or the lease is gone.
+
+        :param str cache_key: Cache key to wait for
+        :param lease: Lease held by a concurrent request
+        :type lease:
+            :py:class:`~eidangservices.federator.server.cache.CacheLease`
+        :param float interval: Polling interval in seconds
+
+        :returns: Tuple of cached value and flag indicating if the value was
+            found. If the lease holder failed populating the cache ``(None,
+            False)`` is returned.
+        :rtype: tuple
+        """
+        deadline = time.time() + lease.timeout
+        while time.time() < deadline:
+            locked = lease.locked
+            cached, found = self.get_cache(
+                cache_key, record_stats=False, record_admission=False,
+                instrument=False)
+            if found and cached:
+                return cached, found
+
+            if not locked:
+                break
+
+            time.sleep(interval)
 
-    def get_cache(self, cache_key):
+        return None, False
+
+    def get_cache_etag(self, cache_key):
+        """
+        Look up the entity tag of the cache entry ``cache_key`` without
+        fetching the cached value.
+
+        :param str cache_key: Cache key to be looked up
+        :returns: Entity tag or ``None`` if not available
+        :rtype: str or None
+        """
+        try:
+            return cache.get_etag(cache_key)
+        except Exception:
+            return None
+
+    def match_cache(self, cache_key, etags):
+        """
+        Validate if the cache entry ``cache_key`` matches any of ``etags``
+        (e.g. from a :code:`If-None-Match` header) without fetching the
+        cached value. A match is recorded as a cache hit.
+
+        :param str cache_key: Cache key to be looked up
+        :param etags: Entity tags to be matched
+        :type etags: :py:class:`werkzeug.datastructures.ETags`
+
+        :returns: The entity tag matched or ``None``
+        :rtype: str or None
+        """
+        etag = self.get_cache_etag(cache_key)
+        if etag is None or not etags.contains(etag):
+            return None
+
+        try:
+            # the entity tag might outlive the entry
+            if cache_key not in cache:
+                return None
+        except Exception:
+            return None
+
+        cache.admission.record(cache_key)
+        cache.key_stats.record_lookup(True)
+        cache.metrics.inc('hits_total', labels=self.cache_labels)
+        return etag
+
+    def get_cache(self, cache_key, record_stats=True, record_admission=True,
+                  instrument=True):
         """
         Lookup ``cache_key`` from the cache.
+
+        :param str cache_key: Cache key to be looked up
+        :param bool record_stats: Record the lookup with the cache key
+            statistics
+        :param bool record_admission: Record the lookup with the cache
+            admission policy
+        :param bool instrument: Record the lookup with the cache
+            instrumentation
         """
 
         try:
-            retval = cache.get(cache_key)
+            retval = cache.get(
+                cache_key, record=record_admission,
+                labels=self.cache_labels if instrument else None)
             found = True
 
             # If the value returned by cache.get() is None, it might be
@@ -137,3 +481,6 @@ class CachingMixin:
             return None, found
         else:
             return retval, found
+        finally:
+            if record_stats:
+                cache.key_stats.record_lookup(found)
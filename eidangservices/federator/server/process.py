@@ -10,21 +10,25 @@ import os
 import time
 import uuid
 
-from flask import current_app, stream_with_context, Response
+from flask import current_app, request, stream_with_context, Response
 
 from eidangservices import settings
 from eidangservices.federator import __version__
+from eidangservices.federator.server import (
+    cache_metrics, tile_cache, wfcatalog_cache)
 from eidangservices.federator.server.misc import (
     Context, ContextLoggerAdapter, KeepTempfiles)
 from eidangservices.federator.server.mixin import (
     ClientRetryBudgetMixin, CachingMixin)
 from eidangservices.federator.server.request import RoutingRequestHandler
+from eidangservices.federator.server.schema import StationSchema
 from eidangservices.federator.server.strategy import (  # noqa
     GranularRequestStrategy, NetworkBulkRequestStrategy,
     NetworkCombiningRequestStrategy, AdaptiveNetworkBulkRequestStrategy)
 from eidangservices.federator.server.task import (
-    RawDownloadTask, RawSplitAndAlignTask, StationTextDownloadTask,
-    StationXMLDownloadTask, StationXMLNetworkCombinerTask,
+    RawDownloadTask, RawSplitAndAlignTask, RawTileDownloadTask,
+    StationTextDownloadTask, StationXMLDownloadTask,
+    StationXMLNetworkCombinerTask, WFCatalogDocumentDownloadTask,
     WFCatalogSplitAndAlignTask)
 from eidangservices.utils.error import ErrorWithTraceback
 from eidangservices.utils.httperrors import FDSNHTTPError
@@ -254,12 +258,16 @@ class RequestProcessor(ClientRetryBudgetMixin):
         routing_req = RoutingRequestHandler(
             self._routing_service, self.stream_epochs,
             self.query_params, proxy_netloc=self._proxy_netloc,
-            access=self.ACCESS)
+            access=self.ACCESS,
+            format=current_app.config.get('FED_ROUTING_FORMAT', 'post'))
 
         self._num_routes = self._strategy.route(
             routing_req, post=self.post, nodata=self._nodata,
             retry_budget_client=self._retry_budget_client,
-            max_stream_epoch_duration=self._max_stream_epoch_duration)
+            max_stream_epoch_duration=self._max_stream_epoch_duration,
+            query_params=self.query_params,
+            routing_shard_size=current_app.config.get(
+                'FED_ROUTING_SHARD_SIZE'))
 
     def _handle_error(self, err):
         self.logger.warning(str(err))
@@ -391,6 +399,8 @@ class RequestProcessor(ClientRetryBudgetMixin):
         for url in self._strategy.routing_table.keys():
             self.gc_cretry_budget(url)
 
+        cache_metrics.flush()
+
         try:
             self._pool.terminate()
             self._pool.join()
@@ -431,8 +441,9 @@ class RawRequestProcessor(RequestProcessor):
         # However, using this parameter seems to lead to processes unexpectedly
         # terminated. Hence some tasks never return a *ready* result.
 
+        task = RawTileDownloadTask if tile_cache.enabled else RawDownloadTask
         self._results = self._strategy.request(
-            self._pool, tasks={'default': RawDownloadTask},
+            self._pool, tasks={'default': task},
             query_params=self.query_params,
             keep_tempfiles=self._keep_tempfiles,
             http_method=self._http_method,
@@ -547,6 +558,8 @@ class StationRequestProcessor(RequestProcessor, CachingMixin):
 
     ACCESS = 'any'
 
+    CACHE_KEY_SCHEMA = StationSchema
+
     @staticmethod
     def create(response_format, *args, **kwargs):
         if response_format == 'xml':
@@ -565,15 +578,124 @@ class StationRequestProcessor(RequestProcessor, CachingMixin):
 
         cache_key = self.make_cache_key(
             self.query_params, self.stream_epochs, key_prefix=type(self))
+        self.popular_queries.record(
+            cache_key, self.query_params, self.stream_epochs, post=self.post)
+
+        if request.if_none_match:
+            etag = self.match_cache(cache_key, request.if_none_match)
+            if etag is not None:
+                return self._create_cached_response(b'', cache_key, etag=etag)
+
         cached, found = self.get_cache(cache_key)
 
         if found and cached:
-            resp = Response(
-                cached, mimetype=self.mimetype, content_type=self.content_type)
+            return self._create_cached_response(cached, cache_key)
+
+        # single-flight cache population
+        lease = self.create_cache_lease(cache_key)
+        if lease is not None and not lease.acquire():
+            self.logger.debug(
+                'Waiting for concurrent request populating the cache '
+                '(cache_key={!r}) ...'.format(cache_key))
+            cached, found = self.wait_for_cache(cache_key, lease)
+            if found and cached:
+                return self._create_cached_response(cached, cache_key)
+
+            self.logger.debug(
+                'Concurrent request failed populating the cache '
+                '(cache_key={!r}). Fall through.'.format(cache_key))
+            lease = None
+
+        try:
+            resp = self._create_response(
+                self.cache_stream, cache_key=cache_key, lease=lease)
+        except Exception:
+            if lease is not None:
+                lease.release()
+            raise
+
+        if lease is not None:
+            # NOTE: The response generator is not run at all if the client
+            # disconnects before the response is streamed. Releasing the
+            # lease is idempotent.
+            resp.call_on_close(lease.release)
+
+        # NOTE: Headers are sent before the response is streamed. At this
+        # point neither the entity tag is known nor if the response is going
+        # to be admitted by the cache admission policy. Hence, both the ETag
+        # and the Cache-Control header are set for cached responses, only.
+        return resp
+
+    def refresh_cache(self, refresh_ahead=0):
+        """
+        (Re-)populate the cache bypassing both cache lookups and the cache
+        admission policy. The request is federated and the response is
+        consumed entirely.
+
+        :param int refresh_ahead: Refresh the cache entry only if it expires
+            within ``refresh_ahead`` seconds. If ``0``, the cache entry is
+            refreshed unconditionally.
+
+        :returns: ``True`` if the cache entry was refreshed, else ``False``
+            (i.e. the entry was still fresh or a concurrent request is
+            populating the cache).
+        :rtype: bool
+        """
+        cache_key = self.make_cache_key(
+            self.query_params, self.stream_epochs, key_prefix=type(self))
+
+        if refresh_ahead:
+            ttl = self.cache.ttl(cache_key)
+            if ttl is not None and (ttl == 0 or ttl > refresh_ahead):
+                return False
+
+        lease = self.create_cache_lease(cache_key)
+        if lease is not None and not lease.acquire():
+            return False
+
+        try:
+            resp = self._create_response(
+                self.cache_stream, cache_key=cache_key, lease=lease,
+                force=True)
+        except Exception:
+            if lease is not None:
+                lease.release()
+            raise
+
+        try:
+            for _ in resp.response:
+                pass
+        finally:
+            resp.close()
 
-            return resp
+        return True
 
-        return self._create_response(self.cache_stream, cache_key=cache_key)
+    def _create_cached_response(self, cached, cache_key, etag=None):
+        """
+        Create a response from ``cached``. The response carries a strong
+        :code:`ETag` such that conditional requests (i.e. requests with an
+        :code:`If-None-Match` header) matching the cached entry are answered
+        with HTTP status code 304.
+
+        :param str etag: Entity tag of ``cached``. If ``None`` the entity tag
+            stored along with the cache entry is used. Entity tags are
+            computed from ``cached`` for entries lacking a stored entity tag,
+            only.
+        """
+        if etag is None:
+            etag = self.get_cache_etag(cache_key) or self.make_etag(cached)
+
+        resp = Response(
+            cached, mimetype=self.mimetype, content_type=self.content_type)
+        resp.set_etag(etag)
+
+        try:
+            ttl = self.cache.ttl(cache_key)
+        except Exception:
+            ttl = None
+        self.set_cache_control(resp, ttl)
+
+        return resp.make_conditional(request)
 
 
 class StationXMLRequestProcessor(StationRequestProcessor):
@@ -594,6 +716,8 @@ class StationXMLRequestProcessor(StationRequestProcessor):
     ALLOWED_STRATEGIES = ('combining', 'adaptive-bulk')
     DEFAULT_REQUEST_STRATEGY = 'combining'
 
+    CACHE_RESOURCE = 'fdsnws-station-xml'
+
     SOURCE = 'EIDA'
     HEADER = ('<?xml version="1.0" encoding="UTF-8"?>'
               '<FDSNStationXML xmlns="http://www.fdsn.org/xml/station/1" '
@@ -775,6 +899,8 @@ class StationTextRequestProcessor(StationRequestProcessor):
     ALLOWED_STRATEGIES = ('granular', 'bulk')
     DEFAULT_REQUEST_STRATEGY = 'bulk'
 
+    CACHE_RESOURCE = 'fdsnws-station-text'
+
     HEADER_NETWORK = '#Network|Description|StartTime|EndTime|TotalStations'
     HEADER_STATION = (
         '#Network|Station|Latitude|Longitude|'
@@ -915,8 +1041,10 @@ class WFCatalogRequestProcessor(RequestProcessor):
         # However, using this parameter seems to lead to processes unexpectedly
         # terminated. Hence some tasks never return a *ready* result.
 
+        task = (WFCatalogDocumentDownloadTask if wfcatalog_cache.enabled
+                else RawDownloadTask)
         self._results = self._strategy.request(
-            self._pool, tasks={'default': RawDownloadTask},
+            self._pool, tasks={'default': task},
             query_params=self.query_params,
             keep_tempfiles=self._keep_tempfiles,
             http_method=self._http_method,
@@ -6,7 +6,7 @@ EIDA federator request handling facilities
 import functools
 
 from collections import OrderedDict
-from copy import deepcopy
+from copy import copy, deepcopy
 from urllib.parse import urlparse, urlunparse
 
 import requests
@@ -79,6 +79,10 @@ class RequestHandlerBase:
     def stream_epochs(self):
         return self._stream_epochs
 
+    @property
+    def query_params(self):
+        return self._query_params
+
     @property
     def payload_get(self):
         raise NotImplementedError
@@ -129,6 +133,8 @@ class RoutingRequestHandler(RequestHandlerBase):
             network location
         :param str access: Specifies the ``access`` query parameter when
         requesting data from StationLite
+        :param str format: Specifies the ``format`` query parameter when
+            requesting data from StationLite (either ``post`` or ``binary``)
         """
 
         super().__init__(url, stream_epochs, query_params)
@@ -137,19 +143,51 @@ class RoutingRequestHandler(RequestHandlerBase):
             (p, v) for p, v in self._query_params.items()
             if p in self.QUERY_PARAMS)
 
-        self._query_params['format'] = 'post'
+        self._query_params['format'] = kwargs.get('format', 'post')
 
         if 'proxy_netloc' in kwargs and kwargs['proxy_netloc'] is not None:
             self._query_params['proxynetloc'] = kwargs['proxy_netloc']
 
         self._query_params['access'] = kwargs.get('access', 'any')
 
+    @property
+    def generation_url(self):
+        """
+        Returns the URL of the routing service's *generation* resource.
+        """
+        return urlunparse(
+            (self._scheme,
+             self._netloc,
+             '{}/{}'.format(self._path,
+                            settings.EIDA_ROUTING_GENERATION_METHOD_TOKEN),
+             '',
+             '',
+             ''))
+
     @property
     def payload_get(self):
         qp = deepcopy(self._query_params)
         qp.update(_query_params_from_stream_epochs(self._stream_epochs))
         return qp
 
+    def split(self, size):
+        """
+        Split the request into requests (*shards*) routing at most ``size``
+        stream epochs, each.
+
+        :param int size: Maximum number of stream epochs per shard
+        :rtype: list
+        """
+        stream_epochs = list(self._stream_epochs)
+
+        retval = []
+        for i in range(0, len(stream_epochs), size):
+            req = copy(self)
+            req._stream_epochs = stream_epochs[i:i + size]
+            retval.append(req)
+
+        return retval
+
     def get(self):
         return functools.partial(requests.get, self.url,
                                  params=self.payload_get, headers=self.HEADERS)
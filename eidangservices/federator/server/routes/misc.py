@@ -11,6 +11,7 @@ from flask_restful import Resource
 
 from eidangservices import settings, utils
 from eidangservices.federator import __version__
+from eidangservices.federator.server import cache_metrics
 from eidangservices.utils import fdsnws
 
 
@@ -97,6 +98,17 @@ class StationWadlResource(MiscResource):
             mimetype=settings.WADL_MIMETYPE)
 
 
+class CacheMetricsResource(MiscResource):
+    """Cache instrumentation (Prometheus text exposition format)."""
+
+    @fdsnws.with_fdsnws_exception_handling(__version__)
+    def get(self):
+        return flask.Response(
+            cache_metrics.dump(), mimetype=settings.MIMETYPE_TEXT,
+            content_type='{}; {}'.format(settings.MIMETYPE_TEXT,
+                                         settings.CHARSET_TEXT))
+
+
 class WFCatalogWadlResource(MiscResource):
     """application.wadl for wfcatalog."""
 
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Routing facilities.
+
+If the federator and *StationLite* share a host, routing may be performed
+in-process by means of the StationLite engine, operating on a read-only
+handle of the StationLite database. Routing tables are produced directly
+i.e. both the serialization of the routing service's output and parsing are
+avoided.
+
+Otherwise, the routing service's output is parsed by means of the parsers
+provided by :py:mod:`eidangservices.utils.routing`.
+
+Embedded routing requires both :code:`SQLAlchemy` and the StationLite
+package. Since neither is a dependency of the federator, they are imported
+only if embedded routing is configured.
+"""
+
+import datetime
+import logging
+
+from urllib.parse import urlsplit, urlunsplit
+
+from eidangservices.utils.error import ErrorWithTraceback
+
+
+class EmbeddedRoutingError(ErrorWithTraceback):
+    """Base embedded routing error ({})."""
+
+
+class EmbeddedRouting:
+    """
+    Routing by means of the StationLite engine.
+
+    Routing tables are returned in the same representation as parsed from
+    the StationLite's ``format=post`` output i.e. open endtimes are not
+    substituted and empty location codes are represented by ``--``.
+
+    :param str url: StationLite DB URL. If :code:`None` embedded routing is
+        disabled.
+    """
+
+    LOGGER = 'flask.app.federator.embedded_routing'
+
+    DB_PRAGMAS = ['PRAGMA case_sensitive_like=on', 'PRAGMA query_only=on']
+
+    # aliases of routing query parameters
+    QUERY_PARAM_ALIASES = {
+        'minlat': 'minlatitude',
+        'maxlat': 'maxlatitude',
+        'minlon': 'minlongitude',
+        'maxlon': 'maxlongitude', }
+
+    SPATIAL_DEFAULTS = {
+        'minlatitude': -90.,
+        'maxlatitude': 90.,
+        'minlongitude': -180.,
+        'maxlongitude': 180., }
+
+    def __init__(self, url=None):
+        self.logger = logging.getLogger(self.LOGGER)
+        self._session = None
+
+        if url:
+            self.configure(url)
+
+    @property
+    def enabled(self):
+        return self._session is not None
+
+    def configure(self, url):
+        """
+        Configure embedded routing.
+
+        :param str url: StationLite DB URL. If :code:`None` embedded routing
+            is disabled.
+        :raises EmbeddedRoutingError: If the dependencies required are not
+            installed
+        """
+        if self._session is not None:
+            self._session.remove()
+            self._session = None
+
+        if not url:
+            return
+
+        try:
+            from sqlalchemy import create_engine
+            from sqlalchemy.event import listens_for
+            from sqlalchemy.orm import scoped_session, sessionmaker
+
+            from eidangservices.stationlite.engine import dbquery # noqa
+        except ImportError as err:
+            raise EmbeddedRoutingError(
+                'Embedded routing requires both SQLAlchemy and the '
+                'StationLite package to be installed: {}'.format(err))
+
+        engine = create_engine(url)
+        if engine.dialect.name == 'sqlite':
+            @listens_for(engine, 'connect')
+            def configure_pragmas(dbapi_connection, connection_record):
+                for pragma in self.DB_PRAGMAS:
+                    dbapi_connection.execute(pragma)
+
+        self._session = scoped_session(sessionmaker(bind=engine))
+
+    def route(self, stream_epochs, query_params={}):
+        """
+        Route ``stream_epochs``.
+
+        :param list stream_epochs: List of
+            :py:class:`~eidangservices.utils.sncl.StreamEpoch` objects to be
+            routed
+        :param dict query_params: Routing query parameters (see
+            :py:class:`~.request.RoutingRequestHandler`)
+
+        :returns: Routing table; an empty routing table if no routes are
+            available
+        :rtype: dict
+        :raises EmbeddedRoutingError: If routing failed
+        """
+        if not self.enabled:
+            raise EmbeddedRoutingError('Embedded routing not configured.')
+
+        from sqlalchemy.exc import SQLAlchemyError
+        from eidangservices.stationlite.engine import dbquery
+
+        query_params = dict(
+            (self.QUERY_PARAM_ALIASES.get(k, k), v)
+            for k, v in query_params.items())
+        kwargs = dict(
+            (k, float(query_params.get(k, default)))
+            for k, default in self.SPATIAL_DEFAULTS.items())
+
+        session = self._session()
+        try:
+            routes = dbquery.find_routes(
+                session, stream_epochs,
+                query_params.get('service', 'dataselect'),
+                level=query_params.get('level', 'channel'),
+                access=query_params.get('access', 'any'),
+                minlat=kwargs['minlatitude'],
+                maxlat=kwargs['maxlatitude'],
+                minlon=kwargs['minlongitude'],
+                maxlon=kwargs['maxlongitude'])
+        except (SQLAlchemyError, ValueError) as err:
+            raise EmbeddedRoutingError(err)
+        finally:
+            self._session.remove()
+
+        netloc_proxy = query_params.get('proxynetloc')
+
+        routing_table = {}
+        for url, stream_epochs in routes:
+            if netloc_proxy:
+                url = prefix_url(url, netloc_proxy)
+            routing_table[url] = [self._normalize(se) for se in stream_epochs]
+
+        return routing_table
+
+    def generation(self):
+        """
+        Return the generation token of the routing information (see
+        :py:func:`eidangservices.stationlite.engine.dbquery.find_generation`).
+
+        :raises EmbeddedRoutingError: If the token is not available
+        """
+        if not self.enabled:
+            raise EmbeddedRoutingError('Embedded routing not configured.')
+
+        from sqlalchemy.exc import SQLAlchemyError
+        from eidangservices.stationlite.engine import dbquery
+
+        session = self._session()
+        try:
+            return dbquery.find_generation(session)
+        except SQLAlchemyError as err:
+            raise EmbeddedRoutingError(err)
+        finally:
+            self._session.remove()
+
+    @staticmethod
+    def _normalize(stream_epoch):
+        if stream_epoch.endtime == datetime.datetime.max:
+            stream_epoch = stream_epoch._replace(endtime=None)
+        if stream_epoch.location == '':
+            stream_epoch = stream_epoch._replace(
+                stream=stream_epoch.stream._replace(location='--'))
+        return stream_epoch
+
+
+def prefix_url(url, netloc_proxy):
+    """
+    Prefix ``url`` with the network location of a proxy (see also
+    :py:meth:`~eidangservices.stationlite.server.stream.OutputStream.\
+prefix_url`).
+    """
+    parsed_url = urlsplit(url)._asdict()
+
+    parsed_url['path'] = '/' + parsed_url['netloc'] + parsed_url['path']
+    parsed_url['netloc'] = netloc_proxy
+    return urlunsplit(parsed_url.values())
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+Key-hash sharding of federator state across several Redis instances.
+
+:py:class:`ShardedRedis` implements the subset of the `redis-py
+<https://redis-py.readthedocs.io/en/latest/>`_ client API used by the
+federator on top of several Redis instances (*shards*). Keys are mapped to
+shards by means of `Redis Cluster <https://redis.io/topics/cluster-spec>`_
+hash slots. Hence, key layouts are *hash tag* aware: keys sharing a hash tag
+(e.g. ``{tag}:a`` and ``{tag}:b``) are stored on the same shard.
+
+The sharded storage is selected by means of a comma-separated list of storage
+URLs, e.g. ``redis://redis0:6379/0,redis://redis1:6379/0``.
+"""
+
+import redis
+
+from redis.exceptions import RedisError
+
+from eidangservices.federator.server.local import LocalRedis
+
+
+NUM_SLOTS = 16384
+URL_SEPARATOR = ','
+
+
+def _crc16_table():
+    # CRC16-CCITT (XMODEM) as used by Redis Cluster
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xffff)
+    return table
+
+
+_CRC16_TABLE = _crc16_table()
+
+
+def crc16(data):
+    crc = 0
+    for b in data:
+        crc = ((crc << 8) & 0xff00) ^ _CRC16_TABLE[((crc >> 8) ^ b) & 0xff]
+    return crc
+
+
+def hash_slot(key):
+    """
+    Compute the Redis Cluster hash slot of ``key``. If the key contains a
+    *hash tag* only the tag is hashed.
+
+    :param key: Key
+    :type key: str or bytes
+    :rtype: int
+    """
+    if isinstance(key, str):
+        key = key.encode('utf-8')
+
+    start = key.find(b'{')
+    if start > -1:
+        end = key.find(b'}', start + 1)
+        if end > start + 1:
+            key = key[start + 1:end]
+
+    return crc16(key) % NUM_SLOTS
+
+
+def hash_tag(tag):
+    """
+    Return ``tag`` formatted as a hash tag.
+    """
+    return '{' + tag + '}'
+
+
+class ShardingError(RedisError):
+    """Sharding error ({})."""
+
+
+# -----------------------------------------------------------------------------
+class _Command:
+    """
+    A command split into parts (i.e. shard specific commands) including the
+    function combining the results of the parts.
+    """
+
+    def __init__(self, parts, combine=None):
+        self.parts = parts
+        self.combine = combine or (lambda results: results[0])
+
+
+class ShardedPipeline:
+    """
+    Pipeline implementation for :py:class:`ShardedRedis`. Commands are
+    buffered and executed by means of a pipeline per shard.
+
+    ..note::
+        Atomicity is guaranteed only with respect to the commands executed on
+        the same shard.
+    """
+
+    def __init__(self, client, transaction=True):
+        self._client = client
+        self._transaction = transaction
+        self._stack = []
+
+    def execute(self, raise_on_error=True):
+        stack, self._stack = self._stack, []
+
+        pipes = {}
+        positions = []
+        for cmd in stack:
+            cmd_positions = []
+            for idx, name, args, kwargs in cmd.parts:
+                if idx not in pipes:
+                    pipes[idx] = self._client.shards[idx].pipeline(
+                        transaction=self._transaction)
+                getattr(pipes[idx], name)(*args, **kwargs)
+                cmd_positions.append((idx, len(pipes[idx]) - 1))
+            positions.append(cmd_positions)
+
+        results = {idx: pipe.execute(raise_on_error=raise_on_error)
+                   for idx, pipe in pipes.items()}
+
+        return [cmd.combine([results[idx][pos] for idx, pos in cmd_pos])
+                for cmd, cmd_pos in zip(stack, positions)]
+
+    def reset(self):
+        self._stack = []
+
+    def __len__(self):
+        return len(self._stack)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.reset()
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def command(*args, **kwargs):
+            self._stack.append(self._client._split(name, args, kwargs))
+            return self
+
+        return command
+
+
+class ShardedRedis:
+    """
+    Redis client sharding keys across several Redis clients (*shards*) by
+    means of hash slots.
+
+    Commands with multiple keys (e.g. :code:`DEL`, :code:`EXISTS` and
+    :code:`MGET`) are split by shard. Transactions (i.e. :code:`WATCH`) are
+    restricted to keys stored on the same shard. Pub/sub is performed by
+    means of the first shard.
+
+    :param list shards: Redis clients
+    """
+
+    # commands taking exactly a single key as the first argument
+    SINGLE_KEY_COMMANDS = frozenset([
+        'get', 'set', 'setex', 'setnx', 'psetex', 'getset', 'incr', 'incrby',
+        'decr', 'decrby', 'ttl', 'pttl', 'expire', 'pexpire', 'persist',
+        'type', 'hget', 'hset', 'hmset', 'hgetall', 'hdel', 'hlen', 'hkeys',
+        'hvals', 'hexists', 'hincrby', 'hincrbyfloat', 'zadd', 'zincrby',
+        'zscore', 'zcard', 'zcount', 'zrange', 'zrevrange', 'zrangebyscore',
+        'zrevrangebyscore', 'zrank', 'zrevrank', 'zrem', 'zremrangebyrank',
+        'zremrangebyscore', 'sadd', 'srem', 'smembers', 'sismember', 'scard',
+        'lpush', 'rpush', 'lpop', 'rpop', 'lrange', 'llen', 'ltrim'])
+
+    def __init__(self, shards):
+        if not shards:
+            raise ValueError('At least a single shard required.')
+
+        self.shards = list(shards)
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        """
+        Create a client from a comma-separated list of storage URLs. Both
+        Redis and local storage URLs are supported.
+        """
+        return cls([create_client(u.strip(), **kwargs)
+                    for u in url.split(URL_SEPARATOR) if u.strip()])
+
+    @staticmethod
+    def is_sharded_url(url):
+        return bool(url) and URL_SEPARATOR in url
+
+    def shard_index(self, key):
+        """
+        Return the index of the shard ``key`` is stored on.
+        """
+        return hash_slot(key) * len(self.shards) // NUM_SLOTS
+
+    def get_shard(self, key):
+        return self.shards[self.shard_index(key)]
+
+    # -------------------------------------------------------------------------
+    def ping(self):
+        return all(shard.ping() for shard in self.shards)
+
+    def dbsize(self):
+        return sum(shard.dbsize() for shard in self.shards)
+
+    def flushdb(self):
+        return all(shard.flushdb() for shard in self.shards)
+
+    def publish(self, channel, message):
+        return self.shards[0].publish(channel, message)
+
+    def pubsub(self, **kwargs):
+        return self.shards[0].pubsub(**kwargs)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return ShardedPipeline(self, transaction=transaction)
+
+    def transaction(self, func, *watches, **kwargs):
+        """
+        Execute ``func`` as a transaction. All keys watched must be stored on
+        the same shard (use hash tags).
+        """
+        if not watches:
+            raise ShardingError('Transactions require watched keys.')
+
+        return self.shards[self._common_shard_index(watches)].transaction(
+            func, *watches, **kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def command(*args, **kwargs):
+            return self._execute(self._split(name, args, kwargs))
+
+        return command
+
+    # -------------------------------------------------------------------------
+    def _execute(self, cmd):
+        return cmd.combine([getattr(self.shards[idx], name)(*args, **kwargs)
+                            for idx, name, args, kwargs in cmd.parts])
+
+    def _split(self, name, args, kwargs):
+        """
+        Split the command ``name`` into shard specific parts.
+
+        :rtype: :py:class:`_Command`
+        """
+        if name in self.SINGLE_KEY_COMMANDS:
+            key = args[0] if args else kwargs['name']
+            return _Command([(self.shard_index(key), name, args, kwargs)])
+
+        if name in ('delete', 'exists', 'unlink'):
+            by_shard = self._group_by_shard(args)
+            return _Command(
+                [(idx, name, tuple(keys), {})
+                 for idx, keys in by_shard.items()],
+                combine=sum)
+
+        if name == 'mget':
+            keys = args[0]
+            if isinstance(keys, (str, bytes)):
+                keys = [keys]
+            keys = list(keys) + list(args[1:])
+
+            by_shard = self._group_by_shard(keys)
+            order = [k for keys in by_shard.values() for k in keys]
+
+            def combine(results):
+                values = dict(zip(order, [v for r in results for v in r]))
+                return [values[k] for k in keys]
+
+            return _Command(
+                [(idx, name, (keys,), {}) for idx, keys in by_shard.items()],
+                combine=combine)
+
+        if name == 'zunionstore':
+            dest, keys = args[0], args[1]
+            idx = self._common_shard_index([dest] + list(keys))
+            return _Command([(idx, name, args, kwargs)])
+
+        raise ShardingError(
+            'Command not supported by the sharded storage: {!r}'.format(name))
+
+    def _group_by_shard(self, keys):
+        by_shard = {}
+        for key in keys:
+            by_shard.setdefault(self.shard_index(key), []).append(key)
+        return by_shard
+
+    def _common_shard_index(self, keys):
+        indices = set(self.shard_index(key) for key in keys)
+        if len(indices) != 1:
+            raise ShardingError(
+                'Keys must be stored on the same shard (CROSSSLOT): '
+                '{!r}'.format(list(keys)))
+        return indices.pop()
+
+
+# -----------------------------------------------------------------------------
+def create_client(url, **kwargs):
+    """
+    Factory function creating a storage client from ``url``. Comma-separated
+    URLs result in a sharded client.
+
+    :param str url: Storage URL
+    """
+    if ShardedRedis.is_sharded_url(url):
+        return ShardedRedis.from_url(url, **kwargs)
+    if LocalRedis.is_local_url(url):
+        return LocalRedis.from_url(url, **kwargs)
+    return redis.StrictRedis.from_url(url, **kwargs)
+
+
+class StorageProvider:
+    """
+    Provider class (see :py:class:`flask_redis.FlaskRedis`) creating storage
+    clients by means of :py:func:`create_client`.
+    """
+    from_url = staticmethod(create_client)
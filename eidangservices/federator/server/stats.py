@@ -4,13 +4,17 @@ Facilities related with statistics.
 """
 
 import abc
+import collections
+import math
 import os
+import threading
 import time
 import uuid
 
 from copy import deepcopy
 from urllib.parse import urlsplit
 
+from eidangservices import settings
 from eidangservices.utils.error import ErrorWithTraceback
 
 
@@ -221,55 +225,303 @@ class ResponseCodeTimeSeries(RedisCollection):
         return ttl, window_size
 
 
+class ResponseCodeCounters(RedisCollection):
+    """
+    Distributed collection implementing response code statistics by means of
+    counters bucketed by time slices. Counters are stored within a Redis
+    `hash <https://redis.io/topics/data-types>`_. For each time slice the
+    total number of response codes and the number of error codes are counted
+    (fields ``<slice>:total`` and ``<slice>:errors``). Hence, counters may be
+    updated by means of pipelined :code:`HINCRBY` commands instead of watched
+    transactions.
+
+    ..note::
+        The ``window_size`` of the collection is approximated with a
+        granularity of time slices, i.e. the error ratio is computed from the
+        most recent time slices until at least ``window_size`` response codes
+        are taken into account.
+    """
+
+    KEY_DELIMITER = ResponseCodeTimeSeries.KEY_DELIMITER
+    FIELD_TOTAL = b'total'
+    FIELD_ERRORS = b'errors'
+
+    _DEFAULT_TTL = ResponseCodeTimeSeries._DEFAULT_TTL
+    _DEFAULT_WINDOW_SIZE = ResponseCodeTimeSeries._DEFAULT_WINDOW_SIZE
+    _DEFAULT_SLICE = 10  # seconds
+
+    ERROR_CODES = ResponseCodeTimeSeries.ERROR_CODES
+
+    def __init__(self, redis, key=None, **kwargs):
+        super().__init__(redis, key, **kwargs)
+
+        self.ttl, self.window_size = \
+            ResponseCodeTimeSeries._validate_ctor_args(
+                kwargs.get('ttl', self._DEFAULT_TTL),
+                kwargs.get('window_size', self._DEFAULT_WINDOW_SIZE))
+
+        self.slice = kwargs.get('slice', self._DEFAULT_SLICE)
+        if self.slice <= 0:
+            raise ValueError('Invalid time slice length specified.')
+        # time slices must not exceed the TTL
+        if self.ttl:
+            self.slice = min(self.slice, self.ttl)
+
+    @property
+    def error_ratio(self):
+        """
+        Returns the error ratio of the response code counters. Values are
+        between ``0`` (no errors) and ``1`` (errors only).
+        """
+        return self.compute_error_ratio(self._data())
+
+    def __len__(self, pipe=None, **kwargs):
+        counts = self._data(pipe=pipe)
+        return sum(total for total, _ in
+                   self._current(counts, **kwargs).values())
+
+    def slice_of(self, t):
+        """
+        Return the time slice index of the timestamp *t*.
+
+        :param float t: Timestamp
+        :rtype: int
+        """
+        return int(t // self.slice)
+
+    def count(self, counts, value, t=None):
+        """
+        Count the response code *value* within the *counts* mapping (i.e.
+        without accessing Redis).
+
+        :param dict counts: Mapping of time slices to ``[total, errors]``
+            counters
+        :param int value: Response code to be counted
+        :param float t: Timestamp the response code is counted for
+        """
+        slice_counts = counts.setdefault(
+            self.slice_of(t or time.time()), [0, 0])
+        slice_counts[0] += 1
+        if int(value) in self.ERROR_CODES:
+            slice_counts[1] += 1
+
+    def append(self, value):
+        """
+        Append *value* to the response code counters.
+
+        :param int value: Response code to be appended
+        """
+        counts = {}
+        self.count(counts, value)
+        self.incr(counts)
+
+    def incr(self, counts, pipe=None):
+        """
+        Increment the counters stored in Redis by *counts*.
+
+        :param dict counts: Mapping of time slices to ``[total, errors]``
+            counters
+        :param pipe: Redis pipe in case increments are performed as a part
+            of a pipeline.
+        :type pipe: :py:class:`redis.client.StrictPipeline` or
+                    :py:class:`redis.client.StrictRedis`
+        """
+        redis = pipe or self.redis
+
+        for slice_idx, (total, errors) in counts.items():
+            redis.hincrby(
+                self.key, self._field(slice_idx, self.FIELD_TOTAL), total)
+            if errors:
+                redis.hincrby(
+                    self.key, self._field(slice_idx, self.FIELD_ERRORS),
+                    errors)
+
+        if self.ttl:
+            redis.expire(self.key, int(math.ceil(self.ttl + self.slice)))
+
+    def gc(self, pipe=None, **kwargs):
+        """
+        Discard deprecated counters.
+        """
+        self.discard(self.deprecated(self._data()), pipe=pipe)
+
+    def deprecated(self, counts, **kwargs):
+        """
+        Return the time slices of *counts* which are outdated.
+
+        :param dict counts: Mapping of time slices to ``[total, errors]``
+            counters
+        :rtype: list
+        """
+        thres = self._threshold(**kwargs)
+        return [slice_idx for slice_idx in counts if slice_idx < thres]
+
+    def discard(self, slices, pipe=None):
+        """
+        Remove the counters of *slices* from Redis.
+
+        :param list slices: Time slices to be removed
+        """
+        if not slices:
+            return
+
+        redis = pipe or self.redis
+        fields = []
+        for slice_idx in slices:
+            fields.append(self._field(slice_idx, self.FIELD_TOTAL))
+            fields.append(self._field(slice_idx, self.FIELD_ERRORS))
+
+        redis.hdel(self.key, *fields)
+
+    def clear(self, pipe=None, **kwargs):
+        self._clear(pipe=pipe)
+
+    def compute_error_ratio(self, counts, **kwargs):
+        """
+        Compute the error ratio from *counts* with respect to both the
+        collection's ``ttl`` and ``window_size``.
+
+        :param dict counts: Mapping of time slices to ``[total, errors]``
+            counters
+        """
+        num_total = num_errors = 0
+        for slice_idx in sorted(self._current(counts, **kwargs),
+                                reverse=True):
+            total, errors = counts[slice_idx]
+            num_total += total
+            num_errors += errors
+
+            if self.window_size and num_total >= self.window_size:
+                break
+
+        if not num_total:
+            return 0
+
+        return num_errors / num_total
+
+    def _current(self, counts, **kwargs):
+        thres = self._threshold(**kwargs)
+        return {slice_idx: v for slice_idx, v in counts.items()
+                if slice_idx >= thres}
+
+    def _threshold(self, **kwargs):
+        ttl = kwargs.get('ttl') or self.ttl
+        if not ttl:
+            return float('-inf')
+
+        return self.slice_of(time.time() - ttl)
+
+    def _data(self, pipe=None, **kwargs):
+        """
+        Helper for getting the counters.
+
+        :param pipe: Redis pipe in case creation is performed as a part
+                     of transaction.
+        :type pipe: :py:class:`redis.client.StrictPipeline` or
+                    :py:class:`redis.client.StrictRedis`
+        :returns: Mapping of time slices to ``[total, errors]`` counters
+        :rtype: dict
+        """
+        redis = pipe or self.redis
+        return self._deserialize(redis.hgetall(self.key))
+
+    def _deserialize(self, value, **kwargs):
+        counts = {}
+        for field, v in (value or {}).items():
+            slice_idx, name = field.split(self.KEY_DELIMITER)
+            slice_counts = counts.setdefault(int(slice_idx), [0, 0])
+            slice_counts[0 if name == self.FIELD_TOTAL else 1] = int(v)
+
+        return counts
+
+    def _field(self, slice_idx, name):
+        return str(slice_idx).encode(self.ENCODING) + self.KEY_DELIMITER + name
+
+
 class ResponseCodeStats:
     """
     Container for datacenter response code statistics handling.
+
+    Response codes are aggregated locally (i.e. per process) by means of
+    counters bucketed by time slices. Aggregated counters are flushed to Redis
+    periodically (at the latest after ``flush_interval`` seconds) by means of
+    a single pipeline. Error ratios are computed from a locally cached
+    snapshot of the Redis counters (refreshed after ``max_staleness`` seconds)
+    merged with the counters not flushed, yet.
+
+    :param float flush_interval: Interval in seconds local counters are
+        flushed to Redis
+    :param float max_staleness: Maximum age in seconds of the locally cached
+        counters error ratios are computed from
     """
 
     DEFAULT_PREFIX = b'stats:response-codes'
 
-    def __init__(self, redis, prefix=None, **kwargs):
+    def __init__(self, redis, prefix=None, flush_interval=None,
+                 max_staleness=None, **kwargs):
 
         self.redis = redis
         self.kwargs_series = kwargs
 
+        self.flush_interval = (
+            settings.EIDA_FEDERATOR_RETRY_BUDGET_CLIENT_FLUSH_INTERVAL
+            if flush_interval is None else flush_interval)
+        self.max_staleness = (
+            settings.EIDA_FEDERATOR_RETRY_BUDGET_CLIENT_MAX_STALENESS
+            if max_staleness is None else max_staleness)
+
         self._prefix = prefix or self.DEFAULT_PREFIX
         if isinstance(self._prefix, str):
             self._prefix = self._prefix.encode(RedisCollection.ENCODING)
 
         self._map = {}
+        self._reset()
 
     def add(self, url, code, **kwargs):
         """
-        Add ``code`` to a response code time series specified by ``url``.
+        Add ``code`` to the response code statistics specified by ``url``.
+        The code is counted locally and flushed to Redis lazily.
         """
-        kwargs_series = deepcopy(self.kwargs_series)
-        kwargs_series.update(kwargs)
-
+        self._check_pid()
         key = self._create_key_from_url(url, prefix=self._prefix)
+        series = self._get_series(key, **kwargs)
 
-        if key not in self._map:
-            self._map[key] = ResponseCodeTimeSeries(
-                redis=self.redis, key=key, **kwargs_series)
+        with self._lock:
+            series.count(self._pending[key], code)
+
+        self._flush_if_due()
+
+    def flush(self):
+        """
+        Flush locally aggregated counters to Redis. Counters of all response
+        code statistics are flushed by means of a single pipeline.
+        """
+        self._check_pid()
+        pipe = self.redis.pipeline(transaction=False)
+        staged = self._stage_flush(pipe)
+        if staged is None:
+            return
 
-        self._map[key].append(code)
+        self._execute(pipe, staged)
 
     def gc(self, url, lazy_load=True):
         """
-        Discard deprecated values from a response code time series specified by
-        ``url``.
+        Discard deprecated values from the response code statistics specified
+        by ``url``. Deprecated counters are removed from Redis with the next
+        flush which is performed immediately.
 
-        :param bool lazy_load: Lazily load the response code time series to be
+        :param bool lazy_load: Lazily load the response code statistics to be
             garbage collected
         """
         key = self._create_key_from_url(url, prefix=self._prefix)
 
-        if lazy_load and key not in self._map:
-            # lazy loading
-            self._map[key] = ResponseCodeTimeSeries(
-                redis=self.redis, key=key, **self.kwargs_series)
+        if not lazy_load and key not in self._map:
+            raise KeyError(key)
 
-        self._map[key].gc()
+        self._get_series(key)
+        self._prune(key)
+
+        self.flush()
 
     def clear(self, url):
         key = self._create_key_from_url(url, prefix=self._prefix)
@@ -279,23 +531,81 @@ class ResponseCodeStats:
         except KeyError as err:
             raise StatsError(err)
 
+        with self._lock:
+            self._pending.pop(key, None)
+            self._deprecated.pop(key, None)
+            self._snapshots.pop(key, None)
+
     def get_error_ratio(self, url, lazy_load=True):
         """
-        Return the error ratio of a response code time series specified by
+        Return the error ratio of the response code statistics specified by
         ``url``.
 
-        :param bool lazy_load: Lazily load the response code time series the
+        :param bool lazy_load: Lazily load the response code statistics the
             error ratio is computed from
         """
+        return self.get_error_ratios([url], lazy_load=lazy_load)[url]
 
-        key = self._create_key_from_url(url, prefix=self._prefix)
+    def get_error_ratios(self, urls, lazy_load=True, gc=True):
+        """
+        Return the error ratios of the response code statistics specified by
+        ``urls``. Outdated snapshots are refreshed, pending counters are
+        flushed and deprecated counters are discarded by means of a single
+        pipeline, i.e. within at most one round trip.
+
+        :param urls: URLs the error ratios are computed for
+        :type urls: list of str
+        :param bool lazy_load: Lazily load the response code statistics the
+            error ratios are computed from
+        :param bool gc: Discard deprecated values from the response code
+            statistics
+        :returns: Error ratios by URL
+        :rtype: dict
+        """
+        self._check_pid()
 
-        if lazy_load and key not in self._map:
-            # lazy loading
-            self._map[key] = ResponseCodeTimeSeries(
-                redis=self.redis, key=key, **self.kwargs_series)
+        keys = {}
+        for url in urls:
+            key = self._create_key_from_url(url, prefix=self._prefix)
+            if not lazy_load and key not in self._map:
+                raise KeyError(key)
 
-        return self._map[key].error_ratio
+            self._get_series(key)
+            keys[url] = key
+
+        now = time.time()
+        stale = []
+        for key in set(keys.values()):
+            with self._lock:
+                snapshot = self._snapshots.get(key)
+            if snapshot is None or now - snapshot[0] > self.max_staleness:
+                stale.append(key)
+            elif gc:
+                self._prune(key)
+
+        if stale or now - self._last_flush >= self.flush_interval:
+            pipe = self.redis.pipeline(transaction=False)
+            staged = self._stage_flush(pipe)
+            for key in stale:
+                pipe.hgetall(key)
+
+            results = self._execute(pipe, staged)
+            fetched_at = time.time()
+            for key, value in zip(stale, results[len(results) - len(stale):]):
+                counts = self._map[key]._deserialize(value)
+                with self._lock:
+                    self._snapshots[key] = (fetched_at, counts)
+                # deprecated counters are discarded with the next flush
+                self._prune(key)
+
+        error_ratios = {}
+        with self._lock:
+            for url, key in keys.items():
+                counts = deepcopy(self._snapshots[key][1])
+                self._merge(counts, self._pending.get(key, {}))
+                error_ratios[url] = self._map[key].compute_error_ratio(counts)
+
+        return error_ratios
 
     def __contains__(self, url):
         return self._create_key_from_url(url) in self._map
@@ -303,6 +613,114 @@ class ResponseCodeStats:
     def __getitem__(self, key):
         return self._map[key]
 
+    def _get_series(self, key, **kwargs):
+        if key not in self._map:
+            kwargs_series = deepcopy(self.kwargs_series)
+            kwargs_series.update(kwargs)
+            # lazy loading
+            self._map[key] = ResponseCodeCounters(
+                redis=self.redis, key=key, **kwargs_series)
+
+        return self._map[key]
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        # counters not flushed, yet
+        self._pending = collections.defaultdict(dict)
+        # time slices to be discarded with the next flush
+        self._deprecated = collections.defaultdict(set)
+        # locally cached snapshots of counters: key -> (timestamp, counts)
+        self._snapshots = {}
+        self._last_flush = time.time()
+
+    def _check_pid(self):
+        # NOTE(damb): Forked worker processes must not flush the counters
+        # inherited from their parent process.
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _prune(self, key):
+        """
+        Remove deprecated time slices from the locally cached snapshot
+        referenced by ``key``. The corresponding counters are discarded from
+        Redis with the next flush.
+        """
+        with self._lock:
+            if key not in self._snapshots:
+                return
+
+            counts = self._snapshots[key][1]
+            deprecated = self._map[key].deprecated(counts)
+            for slice_idx in deprecated:
+                del counts[slice_idx]
+            if deprecated:
+                self._deprecated[key].update(deprecated)
+
+    def _stage_flush(self, pipe):
+        """
+        Stage the commands flushing locally aggregated counters to ``pipe``.
+
+        :returns: Staged state required by :py:meth:`_execute` or ``None`` if
+            there is nothing to be flushed
+        """
+        with self._lock:
+            pending, self._pending = (
+                self._pending, collections.defaultdict(dict))
+            deprecated, self._deprecated = (
+                self._deprecated, collections.defaultdict(set))
+            self._last_flush = flushed_at = time.time()
+
+        if not pending and not deprecated:
+            return None
+
+        for key, slices in deprecated.items():
+            self._map[key].discard(slices, pipe=pipe)
+        for key, counts in pending.items():
+            self._map[key].incr(counts, pipe=pipe)
+
+        return pending, deprecated, flushed_at
+
+    def _execute(self, pipe, staged=None):
+        """
+        Execute ``pipe`` containing commands staged by
+        :py:meth:`_stage_flush`.
+        """
+        try:
+            results = pipe.execute()
+        except Exception:
+            if staged is not None:
+                # keep counters for the next flush
+                pending, deprecated, _ = staged
+                with self._lock:
+                    for key, counts in pending.items():
+                        self._merge(self._pending[key], counts)
+                    for key, slices in deprecated.items():
+                        self._deprecated[key] |= slices
+            raise
+
+        if staged is not None:
+            pending, _, flushed_at = staged
+            # account for flushed counters until the snapshot is refreshed
+            with self._lock:
+                for key, counts in pending.items():
+                    snapshot = self._snapshots.get(key)
+                    if snapshot is not None and snapshot[0] < flushed_at:
+                        self._merge(snapshot[1], counts)
+
+        return results
+
+    def _flush_if_due(self):
+        if time.time() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    @staticmethod
+    def _merge(counts, other):
+        for slice_idx, (total, errors) in other.items():
+            slice_counts = counts.setdefault(slice_idx, [0, 0])
+            slice_counts[0] += total
+            slice_counts[1] += errors
+
     @staticmethod
     def _create_key_from_url(url, prefix=None):
         delimiter = ResponseCodeTimeSeries.KEY_DELIMITER
@@ -5,20 +5,28 @@ Facilities for route based requesting strategies.
 
 import collections
 import datetime
+import functools
 import logging
 
+from multiprocessing.pool import ThreadPool
+
 from eidangservices import utils, settings
 from eidangservices.federator import __version__
+from eidangservices.federator.server import (
+    embedded_routing, negative_cache, routing_cache)
 from eidangservices.federator.server.misc import (
     Context, ContextLoggerAdapter)
 from eidangservices.federator.server.mixin import ClientRetryBudgetMixin
 from eidangservices.federator.server.request import (
     GranularFdsnRequestHandler, BulkFdsnRequestHandler)
+from eidangservices.federator.server.routing import EmbeddedRoutingError
+from eidangservices.utils.binroute import BinaryRoutingFormatError
 from eidangservices.utils.httperrors import FDSNHTTPError
 from eidangservices.utils.request import (binary_request, RequestsError,
                                           NoContent)
+from eidangservices.utils.routing import RoutingParser
 from eidangservices.utils.error import ErrorWithTraceback
-from eidangservices.utils.sncl import StreamEpoch
+from eidangservices.utils.sncl import StreamEpochsHandler, max_as_none
 
 
 def demux_routes(routing_table):
@@ -146,75 +154,236 @@ class RequestStrategyBase(ClientRetryBudgetMixin):
             in days of a single stream epoch before raising a *request too
             large* error.
         :type max_stream_epoch_duration: :py:class:`datetime.timedelta`
+        :param int routing_shard_size: Maximum number of stream epochs routed
+            by means of a single routing request. Larger requests are split
+            into shards routed concurrently. If :code:`None` or :code:`0`
+            sharding is disabled.
 
         :raises NoContent: If no routes are available
         :raises RequestsError: General exception if request to routing service
             failed
         """
 
-        _req = (req.post() if post else req.get())
+        cache_key = None
+        if routing_cache.enabled:
+            if embedded_routing.enabled:
+                routing_cache.validate_with(embedded_routing.generation,
+                                            errors=EmbeddedRoutingError)
+            else:
+                routing_cache.validate(req.generation_url)
+            cache_key = routing_cache.make_key(
+                req.url, req.query_params, req.stream_epochs)
+            _routing_table = routing_cache.get(cache_key)
+            if _routing_table is not None:
+                self.logger.debug(
+                    'Routing table cache hit: {}'.format(req.url))
+                if not _routing_table:
+                    # cached NoContent
+                    nodata = int(
+                        kwargs.get(
+                            'nodata',
+                            settings.FDSN_DEFAULT_NO_CONTENT_ERROR_CODE))
+                    raise FDSNHTTPError.create(nodata)
+
+                return self._process_routing_table(
+                    _routing_table, post=post,
+                    max_stream_epoch_duration=max_stream_epoch_duration,
+                    **kwargs)
 
-        routing_table = {}
-        total_stream_duration = datetime.timedelta()
-        self.logger.info("Fetching routes from %s" % req.url)
         try:
-            with binary_request(_req) as fd:
-                # parse the routing service's output stream; create a routing
-                # table
-                urlline = None
-                stream_epochs = []
-
-                while True:
-                    line = fd.readline()
-
-                    if not urlline:
-                        urlline = line.strip()
-                    elif not line.strip():
-                        # set up the routing table
-                        if stream_epochs:
-                            routing_table[urlline] = stream_epochs
-
-                        urlline = None
-                        stream_epochs = []
-
-                        if not line:
-                            break
-                    else:
-                        # XXX(damb): Do not substitute an empty endtime when
-                        # performing HTTP GET requests in order to guarantee
-                        # more cache hits (if eida-federator is coupled with
-                        # HTTP caching proxy).
-                        se = StreamEpoch.from_snclline(
-                            line, default_endtime=(
-                                self._default_endtime if post else None))
-
-                        duration = se.duration
-                        if (max_stream_epoch_duration is not None and
-                                duration > max_stream_epoch_duration):
-                            raise FDSNHTTPError.create(
-                                413, service_version=__version__)
-
-                        try:
-                            total_stream_duration += duration
-                        except OverflowError:
-                            total_stream_duration = datetime.timedelta.max
-
-                        stream_epochs.append(se)
+            if embedded_routing.enabled:
+                route = self._route_embedded
+            else:
+                route = functools.partial(self._fetch_routing_table,
+                                          post=post)
 
+            shard_size = kwargs.get('routing_shard_size')
+            if shard_size and len(req.stream_epochs) > shard_size:
+                _routing_table = self._route_sharded(
+                    route, req.split(shard_size))
+            else:
+                _routing_table = route(req)
         except NoContent as err:
             self.logger.warning(err)
+            # cache the fact that no routes are available, too
+            if cache_key is not None:
+                routing_cache.set(cache_key, {})
             nodata = int(
                 kwargs.get('nodata',
                            settings.FDSN_DEFAULT_NO_CONTENT_ERROR_CODE))
             raise FDSNHTTPError.create(nodata)
-        except RequestsError as err:
+        except (RequestsError, EmbeddedRoutingError,
+                BinaryRoutingFormatError) as err:
             self.logger.error(err)
             raise FDSNHTTPError.create(500, service_version=__version__)
         else:
             self.logger.debug(
-                'Number of routes received: {}'.format(len(routing_table)))
+                'Number of routes received: {}'.format(len(_routing_table)))
+
+        if cache_key is not None and _routing_table:
+            routing_cache.set(cache_key, _routing_table)
+
+        return self._process_routing_table(
+            _routing_table, post=post,
+            max_stream_epoch_duration=max_stream_epoch_duration, **kwargs)
+
+    def _fetch_routing_table(self, req, post=True):
+        """
+        Fetch a routing table from the routing service. Open endtimes are
+        not substituted.
+
+        :param req: Routing service request handler
+        :type req: :py:class:`RoutingRequestHandler`
+        :param bool post: Execute a the request to the routing service via HTTP
+            POST
+
+        :raises NoContent: If no routes are available
+        :raises RequestsError: General exception if request to routing service
+            failed
+        """
+        _req = (req.post() if post else req.get())
+
+        self.logger.info("Fetching routes from %s" % req.url)
+        with binary_request(_req) as fd:
+            # default endtimes are substituted when processing the routing
+            # table such that the raw routing table may be cached
+            routing_table = RoutingParser.create(
+                req.query_params.get('format', 'post')).parse(fd)
+
+        return routing_table
+
+    def _route_embedded(self, req):
+        """
+        Route a request in-process by means of the StationLite engine. Open
+        endtimes are not substituted.
+
+        :param req: Routing service request handler
+        :type req: :py:class:`RoutingRequestHandler`
+
+        :raises NoContent: If no routes are available
+        :raises EmbeddedRoutingError: If routing failed
+        """
+        self.logger.info("Routing in-process (embedded)")
+        routing_table = embedded_routing.route(
+            req.stream_epochs, req.query_params)
+        if not routing_table:
+            raise NoContent(req.url, 'no routes available')
+
+        return routing_table
 
-        return routing_table, total_stream_duration
+    def _route_sharded(self, route, reqs):
+        """
+        Route the shards ``reqs`` of a request concurrently and merge the
+        resulting routing tables. Stream epochs routed to the same URL by
+        several shards are merged.
+
+        :param route: Callable routing a single routing service request (see
+            e.g. :py:meth:`_fetch_routing_table`)
+        :param list reqs: List of :py:class:`RoutingRequestHandler` objects
+
+        :raises NoContent: If no routes are available for any shard
+        """
+        def route_shard(req):
+            try:
+                return route(req)
+            except NoContent:
+                return {}
+
+        self.logger.info(
+            'Routing {} stream epochs by means of {} shards'.format(
+                sum(len(req.stream_epochs) for req in reqs), len(reqs)))
+
+        pool = ThreadPool(processes=min(
+            len(reqs), settings.EIDA_FEDERATOR_ROUTING_SHARD_CONCURRENCY))
+        try:
+            routing_tables = pool.map(route_shard, reqs)
+        finally:
+            pool.close()
+            pool.join()
+
+        routing_table = self._merge_routing_tables(routing_tables)
+        if not routing_table:
+            raise NoContent(reqs[0].url, 'no routes available')
+
+        return routing_table
+
+    @staticmethod
+    def _merge_routing_tables(routing_tables):
+        """
+        Merge routing tables. Overlapping stream epochs are merged per URL.
+        Open endtimes are preserved.
+
+        :param list routing_tables: Routing tables to be merged
+        :rtype: dict
+        """
+        stream_epochs_by_url = collections.defaultdict(list)
+        for routing_table in routing_tables:
+            for url, stream_epochs in routing_table.items():
+                stream_epochs_by_url[url].extend(stream_epochs)
+
+        retval = {}
+        for url, stream_epochs in stream_epochs_by_url.items():
+            if (len(set(tuple(se.stream) for se in stream_epochs)) ==
+                    len(stream_epochs)):
+                # fast path: streams are unique i.e. nothing to be merged
+                retval[url] = stream_epochs
+                continue
+
+            _stream_epochs = []
+            for ses in StreamEpochsHandler(
+                    se._replace(endtime=se.endtime or datetime.datetime.max)
+                    for se in stream_epochs):
+                for se in ses:
+                    with max_as_none(se.endtime) as endtime:
+                        _stream_epochs.append(se._replace(endtime=endtime))
+
+            retval[url] = sorted(_stream_epochs)
+
+        return retval
+
+    def _process_routing_table(self, routing_table, post=True,
+                               max_stream_epoch_duration=None, **kwargs):
+        """
+        Substitute default endtimes and validate the stream epochs of a
+        routing table. Returns the routing table processed and the total
+        stream duration.
+
+        :param dict routing_table: Routing table with open endtimes not
+            substituted
+        :param bool post: Substitute open endtimes
+        :param max_stream_epoch_duration: Maximum allowed stream epoch duration
+            in days of a single stream epoch before raising a *request too
+            large* error.
+        :type max_stream_epoch_duration: :py:class:`datetime.timedelta`
+        """
+        retval = {}
+        total_stream_duration = datetime.timedelta()
+        for url, stream_epochs in routing_table.items():
+            _stream_epochs = []
+            for se in stream_epochs:
+                # XXX(damb): Do not substitute an empty endtime when
+                # performing HTTP GET requests in order to guarantee more
+                # cache hits (if eida-federator is coupled with HTTP caching
+                # proxy).
+                if post and se.endtime is None:
+                    se = se._replace(endtime=self._default_endtime)
+
+                duration = se.duration
+                if (max_stream_epoch_duration is not None and
+                        duration > max_stream_epoch_duration):
+                    raise FDSNHTTPError.create(
+                        413, service_version=__version__)
+
+                try:
+                    total_stream_duration += duration
+                except OverflowError:
+                    total_stream_duration = datetime.timedelta.max
+
+                _stream_epochs.append(se)
+
+            retval[url] = _stream_epochs
+
+        return retval, total_stream_duration
 
     def route(self, req, retry_budget_client=100, **kwargs):
         """
@@ -284,8 +453,7 @@ class RequestStrategyBase(ClientRetryBudgetMixin):
             return
 
         routed_urls = list(routing_table.keys())
-        error_ratios = {url: self.get_cretry_budget_error_ratio(url)
-                        for url in routed_urls}
+        error_ratios = self.get_cretry_budget_error_ratios(routed_urls)
 
         for url in routed_urls:
             if error_ratios[url] > retry_budget_client:
@@ -300,6 +468,37 @@ class RequestStrategyBase(ClientRetryBudgetMixin):
 
                 del routing_table[url]
 
+    def _filter_by_negative_cache(self, routing_table, query_params=None):
+        """
+        Filter ``routing_table`` by means of the negative cache i.e. remove
+        stream epochs endpoints recently had no data available for.
+
+        :param dict routing_table: Routing table to be filtered and modified
+            in-place
+        :param query_params: Query parameters requested. If ``None`` no
+            filtering is performed at all.
+        :type query_params: dict or None
+        """
+        if not negative_cache.enabled or query_params is None:
+            return
+
+        for url in list(routing_table.keys()):
+            stream_epochs = routing_table[url]
+            nocontent = negative_cache.lookup(url, stream_epochs,
+                                              query_params)
+            if not any(nocontent):
+                continue
+
+            self.logger.debug(
+                'Removing {} stream epoch(s) (URL={}) due to negative cache '
+                'hits.'.format(sum(nocontent), url))
+            stream_epochs = [se for se, hit in zip(stream_epochs, nocontent)
+                             if not hit]
+            if stream_epochs:
+                routing_table[url] = stream_epochs
+            else:
+                del routing_table[url]
+
 
 class GranularRequestStrategy(RequestStrategyBase):
     """
@@ -317,6 +516,8 @@ class GranularRequestStrategy(RequestStrategyBase):
             total_stream_duration=(total_stream_duration if
                                    datetime.timedelta.max !=
                                    total_stream_duration else None))
+        self._filter_by_negative_cache(
+            routing_table, query_params=kwargs.get('query_params'))
         self._routing_table_raw = routing_table
         self._total_stream_duration = total_stream_duration
 
@@ -372,6 +573,8 @@ class NetworkBulkRequestStrategy(RequestStrategyBase):
             total_stream_duration=(total_stream_duration if
                                    datetime.timedelta.max !=
                                    total_stream_duration else None))
+        self._filter_by_negative_cache(
+            routing_table, query_params=kwargs.get('query_params'))
         self._routing_table_raw = routing_table
         self._total_stream_duration = total_stream_duration
 
@@ -438,6 +641,8 @@ class AdaptiveNetworkBulkRequestStrategy(NetworkBulkRequestStrategy):
             total_stream_duration=(total_stream_duration if
                                    datetime.timedelta.max !=
                                    total_stream_duration else None))
+        self._filter_by_negative_cache(
+            routing_table, query_params=kwargs.get('query_params'))
         self._routing_table_raw = routing_table
         self._total_stream_duration = total_stream_duration
 
@@ -518,6 +723,8 @@ class NetworkCombiningRequestStrategy(RequestStrategyBase):
             total_stream_duration=(total_stream_duration if
                                    datetime.timedelta.max !=
                                    total_stream_duration else None))
+        self._filter_by_negative_cache(
+            routing_table, query_params=kwargs.get('query_params'))
         self._routing_table_raw = routing_table
         self._total_stream_duration = total_stream_duration
 
@@ -18,13 +18,20 @@ import ijson
 from lxml import etree
 
 from eidangservices import settings
+from eidangservices.federator.server import (
+    negative_cache, response_code_stats, tile_cache, wfcatalog_cache)
+from eidangservices.federator.server.cache import (
+    iter_mseed_records, utc_days)
 from eidangservices.federator.server.misc import (
     Context, ContextLoggerAdapter, KeepTempfiles, get_temp_filepath)
-from eidangservices.federator.server.mixin import ClientRetryBudgetMixin
+from eidangservices.federator.server.mixin import (
+    CachingMixin, ClientRetryBudgetMixin)
 from eidangservices.federator.server.request import GranularFdsnRequestHandler
 from eidangservices.utils.request import (binary_request, raw_request,
-                                          stream_request, RequestsError)
+                                          stream_request, NoContent,
+                                          RequestsError)
 from eidangservices.utils.error import Error, ErrorWithTraceback
+from eidangservices.utils.sncl import StreamEpoch, none_as_now
 
 
 class ETask(enum.Enum):
@@ -223,6 +230,11 @@ class TaskBase:
     def _has_inactive_ctx(self):
         return self._ctx and not self._ctx.locked
 
+    def _is_cancelled(self):
+        # check the local cancellation flag, only; cheap enough to be called
+        # while streaming
+        return self._ctx and self._ctx.cancelled
+
     def _teardown(self, paths_tempfiles=None):
         """
         Securely tear a task down and perform garbage collection.
@@ -318,18 +330,24 @@ class CombinerTask(TaskBase):
         return '<{}: {}>'.format(type(self).__name__, self.name)
 
 
-class StationXMLNetworkCombinerTask(CombinerTask):
+class StationXMLNetworkCombinerTask(CombinerTask, CachingMixin):
     """
     Task downloading and combining `StationXML
     <http://www.fdsn.org/xml/station/fdsn-station-1.0.xsd>`_ information for a
     network element.
     Downloading is performed concurrently.
+
+    :code:`<Network></Network>` fragments are cached per route. Hence, only
+    routes not cached, yet, are downloaded.
     """
 
     LOGGER = 'flask.app.federator.task_combiner_stationxml'
 
     POOL_SIZE = 5
 
+    CACHE_RESOURCE = 'fdsnws-station-xml'
+    CACHE_KEY_CLASS = 'fragment'
+
     NETWORK_TAG = settings.STATIONXML_ELEMENT_NETWORK
     STATION_TAG = settings.STATIONXML_ELEMENT_STATION
     CHANNEL_TAG = settings.STATIONXML_ELEMENT_CHANNEL
@@ -349,8 +367,26 @@ class StationXMLNetworkCombinerTask(CombinerTask):
         self._level = self.query_params.get('level', 'station')
 
         self._network_elements = collections.OrderedDict()
+        self._fragment_keys = {}
         self.path_tempfile = None
 
+    @catch_default_task_exception
+    @with_ctx_guard
+    def __call__(self):
+        try:
+            return self._run()
+        finally:
+            # NOTE(damb): The task is executed by a worker process. Hence,
+            # cache instrumentation samples and response code statistics are
+            # flushed explicitly.
+            self.cache.metrics.flush()
+            try:
+                response_code_stats.flush()
+            except Exception as err:
+                self.logger.warning(
+                    'Error while flushing response code stats: {}'.format(
+                        err))
+
     def _clean(self, result):
         self.logger.debug(
             'Removing temporary file {!r} ...'.format(
@@ -372,6 +408,19 @@ class StationXMLNetworkCombinerTask(CombinerTask):
         self._pool = ThreadPool(processes=self._num_workers)
 
         for route in self._routes:
+            fragment_key = self._make_fragment_key(route)
+            # NOTE: fragment lookups are recorded with the admission policy
+            # (otherwise, fragments would never be admitted) but not with the
+            # cache key statistics
+            fragment, found = self.get_cache(fragment_key, record_stats=False)
+            if found and fragment:
+                self.logger.debug(
+                    'Using cached fragment for route {!r} ...'.format(route))
+                for net_element in self._load_fragment(fragment):
+                    self._merge_net_element(net_element, level=self._level)
+                self._sizes.append(len(fragment))
+                continue
+
             self.logger.debug(
                 'Creating DownloadTask for route {!r} ...'.format(route))
             ctx = Context()
@@ -391,6 +440,7 @@ class StationXMLNetworkCombinerTask(CombinerTask):
             result = self._pool.apply_async(t)
 
             self._results.append(result)
+            self._fragment_keys[result] = fragment_key
 
         self._pool.close()
 
@@ -401,8 +451,11 @@ class StationXMLNetworkCombinerTask(CombinerTask):
                 if result.ready():
                     _result = result.get()
                     if _result.status_code == 200:
-                        for net_element in self._extract_net_elements(
-                                _result.data):
+                        net_elements = list(
+                            self._extract_net_elements(_result.data))
+                        self._dump_fragment(self._fragment_keys[result],
+                                            net_elements)
+                        for net_element in net_elements:
                             self._merge_net_element(net_element,
                                                     level=self._level)
                         self._clean(_result)
@@ -454,6 +507,40 @@ class StationXMLNetworkCombinerTask(CombinerTask):
         return Result.ok(data=self.path_tempfile, length=_length,
                          extras={'type_task': self._TYPE})
 
+    def _make_fragment_key(self, route):
+        """
+        Create the cache key for the :code:`<Network></Network>` fragment of
+        ``route``.
+        """
+        return self.make_cache_key(
+            self.query_params, route.streams,
+            key_prefix='{}{}'.format(type(self).__name__, route.url))
+
+    def _dump_fragment(self, fragment_key, net_elements):
+        """
+        Cache the :code:`<Network></Network>` elements ``net_elements`` as a
+        fragment.
+        """
+        fragment = b''.join(etree.tostring(net_element, with_tail=False)
+                            for net_element in net_elements)
+        try:
+            self.cache.set(fragment_key, fragment.decode('utf-8'),
+                           labels=self.cache_labels, size=len(fragment))
+        except Exception as err:
+            self.logger.warning(
+                'Error while caching fragment: {}'.format(err))
+
+    def _load_fragment(self, fragment,
+                       namespaces=settings.STATIONXML_NAMESPACES):
+        """
+        Load :code:`<Network></Network>` elements from a cached fragment.
+        """
+        network_tags = ['{}{}'.format(ns, self.NETWORK_TAG)
+                        for ns in namespaces]
+
+        root = etree.fromstring(b'<Fragment>' + fragment + b'</Fragment>')
+        yield from list(root.iter(*network_tags))
+
     def _merge_net_element(self, net_element, level,
                            namespaces=settings.STATIONXML_NAMESPACES):
         """
@@ -712,6 +799,7 @@ class RawSplitAndAlignTask(SplitAndAlignTask):
                     self._http_method,
                     self.path_tempfile))
 
+            code = None
             try:
                 with open(self.path_tempfile, 'ab') as ofd:
                     for chunk in stream_request(
@@ -719,6 +807,8 @@ class RawSplitAndAlignTask(SplitAndAlignTask):
                             logger=self.logger):
                         if last_chunk is not None and last_chunk == chunk:
                             continue
+                        if self._is_cancelled():
+                            raise self.MissingContextLock
                         self._size += len(chunk)
                         ofd.write(chunk)
 
@@ -733,6 +823,10 @@ class RawSplitAndAlignTask(SplitAndAlignTask):
                     self.update_cretry_budget(self.url, code)
                     self._run(stream_epoch)
                 else:
+                    if isinstance(err, NoContent):
+                        negative_cache.add(self.url,
+                                           request_handler.stream_epochs,
+                                           request_handler.query_params)
                     return self._handle_error(err)
             else:
                 code = 200
@@ -834,6 +928,10 @@ class WFCatalogSplitAndAlignTask(SplitAndAlignTask):
                     self.update_cretry_budget(self.url, code)
                     self._run(stream_epoch)
                 else:
+                    if isinstance(err, NoContent):
+                        negative_cache.add(self.url,
+                                           request_handler.stream_epochs,
+                                           request_handler.query_params)
                     return self._handle_error(err)
             else:
                 code = 200
@@ -901,6 +999,11 @@ class RawDownloadTask(TaskBase, ClientRetryBudgetMixin):
         code = None
         try:
             self._run(req)
+        except NoContent as err:
+            code = err.response.status_code
+            negative_cache.add(self.url, self._request_handler.stream_epochs,
+                               self._request_handler.query_params)
+            return self._handle_error(err)
         except RequestsError as err:
             if hasattr(err, 'response') and err.response is not None:
                 # set response code only if a connection could be established
@@ -971,9 +1074,393 @@ class RawDownloadTask(TaskBase, ClientRetryBudgetMixin):
                     method='raw',
                     decode_unicode=self.decode_unicode,
                     logger=self.logger):
+                if self._is_cancelled():
+                    raise self.MissingContextLock
                 self._size += len(chunk)
                 ofd.write(chunk)
 
+    def _download(self, stream_epoch):
+        """
+        Download ``stream_epoch`` to a temporary file.
+
+        :returns: Path to the temporary file or ``None`` if no data is
+            available.
+        :raises RequestsError: If the endpoint request failed
+        """
+        request_handler = GranularFdsnRequestHandler(
+            self.url, stream_epoch,
+            query_params=self._request_handler.query_params)
+        req = (request_handler.get()
+               if self._http_method == 'GET' else request_handler.post())
+
+        path = get_temp_filepath()
+        code = None
+        try:
+            with open(path, 'wb') as ofd:
+                for chunk in stream_request(
+                        req, chunk_size=self.chunk_size, method='raw',
+                        logger=self.logger):
+                    if self._is_cancelled():
+                        raise self.MissingContextLock
+                    ofd.write(chunk)
+        except NoContent as err:
+            code = err.response.status_code
+            self._teardown(path)
+            return None
+        except RequestsError as err:
+            if hasattr(err, 'response') and err.response is not None:
+                code = err.response.status_code
+            self._teardown(path)
+            raise
+        except self.MissingContextLock:
+            self._teardown(path)
+            raise
+        else:
+            code = 200
+        finally:
+            if code is not None:
+                self.update_cretry_budget(self.url, code)
+
+        return path
+
+
+class RawTileDownloadTask(RawDownloadTask):
+    """
+    Task downloading `miniSEED
+    <https://www.fdsn.org/seed_manual/SEEDManual_V2.4.pdf>`_ data by means of
+    the miniSEED tile cache.
+
+    Final tiles are served from the cache. Missing tiles are downloaded (a
+    single request is issued for consecutive missing tiles), cached and
+    finally trimmed at record granularity. Tiles not final, yet, are
+    downloaded without caching.
+    """
+
+    LOGGER = 'flask.app.federator.task_download_tile'
+
+    # maximum number of consecutive tiles downloaded by means of a single
+    # request
+    MAX_TILES_PER_REQUEST = 7
+
+    @property
+    def tile_cache(self):
+        return tile_cache
+
+    @catch_default_task_exception
+    @with_ctx_guard
+    @with_client_retry_budget_validation
+    def __call__(self):
+        self._now = datetime.datetime.utcnow()
+        self._last_record = None
+
+        self.logger.debug(
+            'Downloading (url={}, stream_epochs={}) by means of tiles to '
+            'tempfile {!r}...'.format(self.url,
+                                      self._request_handler.stream_epochs,
+                                      self.path_tempfile))
+        try:
+            with open(self.path_tempfile, 'wb') as ofd:
+                for stream_epoch in self._request_handler.stream_epochs:
+                    self._run_stream_epoch(stream_epoch, ofd)
+
+                    if self._has_inactive_ctx():
+                        raise self.MissingContextLock
+
+        except RequestsError as err:
+            return self._handle_error(err)
+
+        if not self._size:
+            self._teardown(self.path_tempfile)
+            return Result.nocontent(extras={'type_task': self._TYPE})
+
+        self.logger.debug(
+            'Download (url={}, stream_epochs={}) finished.'.format(
+                self.url, self._request_handler.stream_epochs))
+
+        return Result.ok(data=self.path_tempfile, length=self._size,
+                         extras={'type_task': self._TYPE})
+
+    def _run_stream_epoch(self, stream_epoch, ofd):
+        starttime = stream_epoch.starttime
+        endtime = stream_epoch.endtime or self._now
+
+        missing = []
+        for day in self.tile_cache.tiles(starttime, endtime):
+            if not self.tile_cache.is_final(day, now=self._now):
+                self._fetch_tiles(stream_epoch, missing, ofd)
+                missing = []
+
+                path = self._download(StreamEpoch(
+                    stream_epoch.stream, max(starttime, day),
+                    min(endtime, day + self.tile_cache.TILE_DURATION)))
+                self._write_records(path, starttime, endtime, ofd)
+                self._teardown(path)
+                continue
+
+            path = self.tile_cache.get(stream_epoch.stream, day)
+            if path is None:
+                missing.append(day)
+                if len(missing) == self.MAX_TILES_PER_REQUEST:
+                    self._fetch_tiles(stream_epoch, missing, ofd)
+                    missing = []
+                continue
+
+            self._fetch_tiles(stream_epoch, missing, ofd)
+            missing = []
+
+            self.logger.debug(
+                'Serving tile (stream={}, day={}) from cache.'.format(
+                    stream_epoch.stream, day.date()))
+            self._write_records(path, starttime, endtime, ofd)
+
+        self._fetch_tiles(stream_epoch, missing, ofd)
+
+    def _fetch_tiles(self, stream_epoch, days, ofd):
+        """
+        Download, cache and write the tiles of consecutive ``days``.
+        """
+        if not days:
+            return
+
+        path = self._download(StreamEpoch(
+            stream_epoch.stream, days[0],
+            days[-1] + self.tile_cache.TILE_DURATION))
+
+        tiles = collections.OrderedDict((day, []) for day in days)
+        if path is not None:
+            with open(path, 'rb') as ifd:
+                for _starttime, _endtime, record in iter_mseed_records(ifd):
+                    # records overlapping midnight are part of both tiles
+                    for day in self.tile_cache.tiles(
+                            _starttime,
+                            max(_endtime, _starttime +
+                                datetime.timedelta(microseconds=1))):
+                        if day in tiles:
+                            tiles[day].append(record)
+
+        for day, records in tiles.items():
+            self.tile_cache.set(stream_epoch.stream, day, records)
+
+        with none_as_now(stream_epoch.endtime, now=self._now) as endtime:
+            self._write_records(path, stream_epoch.starttime, endtime, ofd)
+        self._teardown(path)
+
+    def _write_records(self, path, starttime, endtime, ofd):
+        """
+        Write the records from ``path`` overlapping ``[starttime, endtime)``
+        to ``ofd``.
+        """
+        if path is None:
+            return
+
+        with open(path, 'rb') as ifd:
+            for _starttime, _endtime, record in iter_mseed_records(ifd):
+                if (_starttime >= endtime or
+                        (_endtime <= starttime and _starttime < starttime)):
+                    continue
+
+                # skip records overlapping tiles
+                if record == self._last_record:
+                    continue
+                self._last_record = record
+
+                self._size += len(record)
+                ofd.write(record)
+
+
+class WFCatalogDocumentDownloadTask(RawDownloadTask, CachingMixin):
+    """
+    Task downloading `WFCatalog <https://www.orfeus-eu.org/data/eida/
+    webservices/wfcatalog/>`_ documents by means of the WFCatalog document
+    cache.
+
+    Documents are cached per stream and (entire) UTC day. Cached documents
+    are served from the cache. Documents of missing days are downloaded (a
+    single request is issued for consecutive missing days) and cached.
+    Partial days (i.e. at the beginning or at the end of a stream epoch) are
+    downloaded without caching.
+    """
+
+    LOGGER = 'flask.app.federator.task_download_wfcatalog'
+
+    JSON_LIST_START = b'['
+    JSON_LIST_END = b']'
+    JSON_LIST_SEP = b','
+
+    # maximum number of consecutive days downloaded by means of a single
+    # request
+    MAX_DAYS_PER_REQUEST = 31
+
+    CACHE_RESOURCE = 'eidaws-wfcatalog'
+    CACHE_KEY_CLASS = 'document'
+
+    @property
+    def cache(self):
+        return wfcatalog_cache
+
+    @property
+    def cache_labels(self):
+        return {'resource': self.CACHE_RESOURCE, 'level': '',
+                'key_class': self.CACHE_KEY_CLASS}
+
+    @catch_default_task_exception
+    @with_ctx_guard
+    @with_client_retry_budget_validation
+    def __call__(self):
+        self._now = datetime.datetime.utcnow()
+        self._last_obj = None
+
+        self.logger.debug(
+            'Downloading (url={}, stream_epochs={}) by means of the document '
+            'cache to tempfile {!r}...'.format(
+                self.url, self._request_handler.stream_epochs,
+                self.path_tempfile))
+        try:
+            with open(self.path_tempfile, 'wb') as ofd:
+                for stream_epoch in self._request_handler.stream_epochs:
+                    self._run_stream_epoch(stream_epoch, ofd)
+
+                    if self._has_inactive_ctx():
+                        raise self.MissingContextLock
+
+                if self._size:
+                    ofd.write(self.JSON_LIST_END)
+                    self._size += len(self.JSON_LIST_END)
+
+        except RequestsError as err:
+            return self._handle_error(err)
+
+        if not self._size:
+            self._teardown(self.path_tempfile)
+            return Result.nocontent(extras={'type_task': self._TYPE})
+
+        self.logger.debug(
+            'Download (url={}, stream_epochs={}) finished.'.format(
+                self.url, self._request_handler.stream_epochs))
+
+        return Result.ok(data=self.path_tempfile, length=self._size,
+                         extras={'type_task': self._TYPE})
+
+    def _run_stream_epoch(self, stream_epoch, ofd):
+        starttime = stream_epoch.starttime
+        endtime = stream_epoch.endtime or self._now
+
+        missing = []
+        for day in utc_days(starttime, endtime):
+            cacheable = (starttime <= day and
+                         day + self.cache.DAY <= endtime and
+                         self.cache.get_timeout(day, now=self._now) != 0)
+
+            if not cacheable:
+                self._fetch_days(stream_epoch, missing, ofd)
+                missing = []
+
+                self._write_docs(self._load_docs(self._download(StreamEpoch(
+                    stream_epoch.stream, max(starttime, day),
+                    min(endtime, day + self.cache.DAY)))), ofd)
+                continue
+
+            try:
+                docs = json.loads(self.cache.get(
+                    self._make_document_key(stream_epoch.stream, day),
+                    labels=self.cache_labels))
+            except Exception:
+                missing.append(day)
+                if len(missing) == self.MAX_DAYS_PER_REQUEST:
+                    self._fetch_days(stream_epoch, missing, ofd)
+                    missing = []
+                continue
+
+            self._fetch_days(stream_epoch, missing, ofd)
+            missing = []
+
+            self.logger.debug(
+                'Serving documents (stream={}, day={}) from cache.'.format(
+                    stream_epoch.stream, day.date()))
+            self._write_docs(docs, ofd)
+
+        self._fetch_days(stream_epoch, missing, ofd)
+
+    def _fetch_days(self, stream_epoch, days, ofd):
+        """
+        Download, cache and write the documents of consecutive ``days``.
+        """
+        if not days:
+            return
+
+        docs = self._load_docs(self._download(StreamEpoch(
+            stream_epoch.stream, days[0], days[-1] + self.cache.DAY)))
+
+        docs_by_day = collections.OrderedDict((day, []) for day in days)
+        try:
+            for doc in docs:
+                day = datetime.datetime.strptime(
+                    doc['start_time'][:10], '%Y-%m-%d')
+                docs_by_day[day].append(doc)
+        except (KeyError, TypeError, ValueError) as err:
+            # NOTE(damb): Documents which cannot be assigned to a day are
+            # served but not cached at all.
+            self.logger.warning(
+                'Unable to assign WFCatalog documents to days: {}'.format(
+                    err))
+        else:
+            for day, _docs in docs_by_day.items():
+                try:
+                    self.cache.set(
+                        self._make_document_key(stream_epoch.stream, day),
+                        json.dumps(_docs),
+                        timeout=self.cache.get_timeout(day, now=self._now),
+                        labels=self.cache_labels)
+                except Exception as err:
+                    self.logger.warning(
+                        'Error while caching documents: {}'.format(err))
+
+        self._write_docs(docs, ofd)
+
+    def _load_docs(self, path):
+        """
+        Load the WFCatalog documents from a temporary file.
+
+        :param path: Path to the temporary file or ``None``
+        :rtype: list
+        """
+        if path is None:
+            return []
+
+        try:
+            with open(path, 'r', encoding='utf-8') as ifd:
+                return json.load(ifd)
+        finally:
+            self._teardown(path)
+
+    def _write_docs(self, docs, ofd):
+        for doc in docs:
+            # skip documents served twice
+            if self._last_obj is not None and self._last_obj == doc:
+                continue
+
+            ofd.write(self.JSON_LIST_SEP if self._last_obj is not None else
+                      self.JSON_LIST_START)
+            self._size += 1
+
+            self._last_obj = doc
+            doc = json.dumps(doc).encode('utf-8')
+            self._size += len(doc)
+            ofd.write(doc)
+
+    def _make_document_key(self, stream, day):
+        """
+        Create the cache key for the documents of ``stream`` and ``day``.
+        """
+        query_params = {k: v
+                        for k, v in self._request_handler.query_params.items()
+                        if k not in ('nodata', 'service')}
+
+        return self._hash_cache_key(
+            self.canonicalize_query_params(query_params),
+            [StreamEpoch(stream, day, day + self.cache.DAY)],
+            key_prefix='{}{}'.format(type(self).__name__, self.url))
+
 
 class StationTextDownloadTask(RawDownloadTask):
     """
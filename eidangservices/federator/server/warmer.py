@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Launch the EIDA NG Federator cache warmer.
+
+The cache warmer periodically refreshes the cache entries of the most popular
+fdsnws-station queries before they expire. Queries are tracked by the
+federator (see the :code:`--cache-warmer-tracked-queries` option of
+:code:`eida-federator`). Since the cache warmer shares its configuration with
+the federator it reads the federator's configuration section.
+"""
+
+import sys
+import time
+import traceback
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from eidangservices import settings
+from eidangservices.federator import __version__
+from eidangservices.federator.server import cache, popular_queries
+from eidangservices.federator.server.app import (
+    FederatorWebserviceBase, pos_int)
+from eidangservices.federator.server.misc import Context
+from eidangservices.federator.server.process import RequestProcessor
+from eidangservices.utils.app import AppError
+from eidangservices.utils.error import Error, ExitCodes
+from eidangservices.utils.httperrors import FDSNHTTPError
+
+
+class CacheWarmer(FederatorWebserviceBase):
+    """
+    Implementation of the EIDA Federator cache warmer.
+    """
+    PROG = 'eida-federator-cache-warmer'
+
+    def build_parser(self, parents=[]):
+        """
+        Set up the commandline argument parser.
+
+        :param list parents: list of parent parsers
+        :returns: parser
+        :rtype: :py:class:`argparse.ArgumentParser`
+        """
+        parser = super().build_parser(parents)
+        parser.description = (
+            'Refresh cache entries of popular fdsnws-station queries.')
+
+        parser.add_argument('-n', '--num-queries', type=pos_int,
+                            dest='num_queries', metavar='NUM',
+                            default=settings.
+                            EIDA_FEDERATOR_DEFAULT_CACHE_WARMER_NUM_QUERIES,
+                            help=('Number of most popular queries to be '
+                                  'refreshed. (default: %(default)s)'))
+        parser.add_argument('-i', '--interval', type=pos_int,
+                            dest='interval', metavar='SECONDS',
+                            default=settings.
+                            EIDA_FEDERATOR_DEFAULT_CACHE_WARMER_INTERVAL,
+                            help=('Interval in seconds between two runs. '
+                                  '(default: %(default)s)'))
+        parser.add_argument('--refresh-ahead', type=pos_int,
+                            dest='refresh_ahead', metavar='SECONDS',
+                            default=settings.
+                            EIDA_FEDERATOR_DEFAULT_CACHE_WARMER_REFRESH_AHEAD,
+                            help=('Refresh cache entries expiring within '
+                                  'SECONDS. (default: %(default)s)'))
+        parser.add_argument('--concurrency', type=pos_int,
+                            dest='concurrency', metavar='NUM',
+                            default=settings.
+                            EIDA_FEDERATOR_DEFAULT_CACHE_WARMER_CONCURRENCY,
+                            help=('Maximum number of queries refreshed '
+                                  'concurrently. (default: %(default)s)'))
+        parser.add_argument('--oneshot', action='store_true',
+                            default=False,
+                            help=('Run once and exit (e.g. when scheduled '
+                                  'by means of cron).'))
+
+        return parser
+
+    def run(self):
+        """
+        Run application.
+        """
+        exit_code = ExitCodes.EXIT_SUCCESS
+        try:
+            self.logger.info('{}: Version v{}'.format(self.PROG, __version__))
+            self.logger.debug('Configuration: {!r}'.format(self.args))
+
+            app = self.setup_app()
+            if not cache.enabled:
+                raise AppError('No caching backend configured.')
+
+            aging_interval = (
+                settings.EIDA_FEDERATOR_CACHE_WARMER_AGING_INTERVAL)
+            last_aged = time.time()
+            while True:
+                start = time.time()
+                with app.app_context():
+                    self.warm(app)
+
+                    if start - last_aged >= aging_interval:
+                        popular_queries.age()
+                        last_aged = start
+
+                if self.args.oneshot:
+                    break
+
+                time.sleep(
+                    max(0, self.args.interval - (time.time() - start)))
+
+        except KeyboardInterrupt:
+            pass
+        except Error as err:
+            self.logger.error(err)
+            exit_code = ExitCodes.EXIT_ERROR
+        except Exception as err:
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            self.logger.critical('Local Exception: %s' % err)
+            self.logger.critical('Traceback information: ' +
+                                 repr(traceback.format_exception(
+                                     exc_type, exc_value, exc_traceback)))
+            exit_code = ExitCodes.EXIT_ERROR
+
+        sys.exit(exit_code)
+
+    def warm(self, app):
+        """
+        Refresh the cache entries of the most popular queries.
+
+        :param app: Flask application
+        :type app: :py:class:`flask.Flask`
+        """
+        queries = popular_queries.most_popular(self.args.num_queries)
+        self.logger.debug(
+            'Processing {} popular queries ...'.format(len(queries)))
+
+        refreshed = 0
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as executor:
+            futures = {executor.submit(self._refresh, app, query): cache_key
+                       for cache_key, query in queries}
+
+            for future in as_completed(futures):
+                try:
+                    refreshed += int(future.result())
+                except FDSNHTTPError as err:
+                    self.logger.debug(
+                        'No data for query (cache_key={!r}): {}'.format(
+                            futures[future], err.code))
+                except Exception as err:
+                    self.logger.warning(
+                        'Error while refreshing query (cache_key={!r}): '
+                        '{}'.format(futures[future], err))
+
+        self.logger.info(
+            'Refreshed {} out of {} popular queries.'.format(
+                refreshed, len(queries)))
+
+    def _refresh(self, app, query):
+        query_params = query['query_params']
+        if query_params.get('format', 'xml') == 'text':
+            mimetype = settings.STATION_MIMETYPE_TEXT
+        else:
+            mimetype = settings.STATION_MIMETYPE_XML
+
+        resource_cfg = 'fdsnws-station-' + query_params.get('format', 'xml')
+
+        with app.test_request_context():
+            ctx = Context()
+            ctx.acquire()
+            try:
+                processor = RequestProcessor.create(
+                    'station', mimetype,
+                    query_params=query_params,
+                    stream_epochs=query['stream_epochs'],
+                    context=ctx,
+                    keep_tempfiles=app.config['FED_KEEP_TEMPFILES'],
+                    retry_budget_client=app.config[
+                        'FED_CRETRY_BUDGET_ERATIO'],
+                    **app.config['FED_RESOURCE_CONFIG'][resource_cfg])
+                processor.post = query['post']
+
+                return processor.refresh_cache(
+                    refresh_ahead=self.args.refresh_ahead)
+            finally:
+                try:
+                    ctx.release()
+                except Error:
+                    pass
+
+
+# -----------------------------------------------------------------------------
+def main():
+    """
+    main function for the EIDA Federator cache warmer
+    """
+    app = CacheWarmer(log_id='FED')
+
+    try:
+        app.configure(
+            settings.PATH_EIDANGWS_CONF,
+            config_section=settings.EIDA_FEDERATOR_CONFIG_SECTION)
+    except AppError as err:
+        # handle errors during the application configuration
+        print('ERROR: Application configuration failed "%s".' % err,
+              file=sys.stderr)
+        sys.exit(ExitCodes.EXIT_ERROR)
+
+    app.run()
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
@@ -3,15 +3,48 @@
 Cache related test facilities.
 """
 
+import datetime
+import io
 import os
 import random
 import shutil
 import string
+import struct
 import tempfile
 import time
 import unittest
 
-from eidangservices.federator.server.cache import FileSystemCache
+from unittest import mock
+
+from flask import Response
+from werkzeug.datastructures import ETags
+
+from eidangservices.federator.server import cache
+from eidangservices.federator.server.cache import (
+    AdmissionPolicy, Cache, CacheKeyStats, CacheLease, CacheMetrics,
+    FileSystemCache, FrequencySketch, MiniSEEDTileCache, NegativeCache,
+    PopularQueries, RoutingCache, iter_mseed_records)
+from eidangservices.federator.server.mixin import CachingMixin
+from eidangservices.federator.server.schema import StationSchema
+from eidangservices.federator.tests.stats import RedisTestCase
+from eidangservices.utils.sncl import Stream, StreamEpoch
+
+
+def _create_mseed_record(starttime, num_samples=100, sample_rate=100,
+                         record_length=512, byte_order='>'):
+    """
+    Create a miniSEED record with header and blockette 1000, only.
+    """
+    header = b'000001D ' + b'STA  00HHZNE'
+    header += struct.pack(
+        byte_order + 'HHBBBBHHhhBBBBlHH', starttime.year,
+        starttime.timetuple().tm_yday, starttime.hour, starttime.minute,
+        starttime.second, 0, starttime.microsecond // 100, num_samples,
+        sample_rate, 1, 0, 0, 0, 1, 0, 64, 48)
+    b1000 = struct.pack(byte_order + 'HHBBBB', 1000, 0, 11, 1,
+                        record_length.bit_length() - 1, 0)
+    record = header + b1000
+    return record + b'\x00' * (record_length - len(record))
 
 
 class FileSystemCacheTestCase(unittest.TestCase):
@@ -61,6 +94,38 @@ class FileSystemCacheTestCase(unittest.TestCase):
 
         self.assertEqual(fs_cache._file_count, 4)
 
+    def test_max_size(self):
+        fs_cache = FileSystemCache(cache_dir=self.cache_dir, threshold=0,
+                                   max_size=2000)
+
+        fs_cache.set('key0', 'a' * 10)
+        fs_cache.set('key1', os.urandom(1024).hex())
+        fs_cache.set('key2', 'b' * 10)
+        past = time.time() - 10
+        for key in ('key0', 'key1', 'key2'):
+            os.utime(fs_cache._get_filename(key), (past, past))
+
+        fs_cache.set('key3', os.urandom(1024).hex())
+        # large entries not used recently are evicted first
+        fs_cache.set('key4', 'c' * 10)
+
+        self.assertIsNone(fs_cache.get('key1'))
+        for key in ('key0', 'key2', 'key3', 'key4'):
+            self.assertIsNotNone(fs_cache.get(key))
+
+    def test_size(self):
+        fs_cache = FileSystemCache(cache_dir=self.cache_dir, threshold=0,
+                                   max_size=2000)
+
+        fs_cache.set('key0', 'a' * 10)
+        size = os.path.getsize(fs_cache._get_filename('key0'))
+        for _ in range(3):
+            fs_cache.set('key0', 'a' * 10)
+        self.assertEqual(fs_cache._size, size)
+
+        fs_cache.delete('key0')
+        self.assertEqual(fs_cache._size, 0)
+
     def test_timeout(self):
         fs_cache = FileSystemCache(cache_dir=self.cache_dir, default_timeout=1)
         fs_cache.set('key0', 'foo')
@@ -69,3 +134,689 @@ class FileSystemCacheTestCase(unittest.TestCase):
 
         self.assertEqual(fs_cache.get('key0'), None)
         self.assertEqual(fs_cache._file_count, 1)
+
+    def test_ttl(self):
+        fs_cache = FileSystemCache(cache_dir=self.cache_dir,
+                                   default_timeout=60)
+        fs_cache.set('key0', 'foo')
+        fs_cache.set('key1', 'bar', timeout=0)
+
+        self.assertTrue(0 < fs_cache.ttl('key0') <= 60)
+        self.assertEqual(fs_cache.ttl('key1'), 0)
+        self.assertIsNone(fs_cache.ttl('key2'))
+
+
+class CacheLeaseTestCase(RedisTestCase):
+
+    def test_acquire_release(self):
+        lease = CacheLease('key0', redis=self.redis, timeout=10)
+
+        self.assertTrue(lease.acquire())
+        self.assertTrue(lease.acquired)
+        self.assertTrue(lease.locked)
+
+        lease.release()
+        self.assertFalse(lease.acquired)
+        self.assertFalse(lease.locked)
+
+    def test_concurrent(self):
+        leader = CacheLease('key0', redis=self.redis, timeout=10)
+        follower = CacheLease('key0', redis=self.redis, timeout=10)
+
+        self.assertTrue(leader.acquire())
+        self.assertFalse(follower.acquire())
+        self.assertTrue(follower.locked)
+
+        # releasing a lease not acquired is a no-op
+        follower.release()
+        self.assertTrue(leader.locked)
+
+        leader.release()
+        self.assertFalse(follower.locked)
+        self.assertTrue(follower.acquire())
+
+    def test_timeout(self):
+        leader = CacheLease('key0', redis=self.redis, timeout=0.1)
+        self.assertTrue(leader.acquire())
+
+        time.sleep(0.2)
+
+        follower = CacheLease('key0', redis=self.redis, timeout=10)
+        self.assertFalse(leader.locked)
+        self.assertTrue(follower.acquire())
+
+        # the expired lease must not release the lease of the follower
+        leader.release()
+        self.assertTrue(follower.locked)
+
+    def test_release_on_close(self):
+        lease = CacheLease('key0', redis=self.redis, timeout=10)
+        self.assertTrue(lease.acquire())
+
+        def generate():
+            try:
+                yield b'foo'
+            finally:
+                lease.release()
+
+        # the client disconnected before the response was streamed
+        resp = Response(generate())
+        resp.call_on_close(lease.release)
+        resp.close()
+        self.assertFalse(lease.locked)
+
+
+class FrequencySketchTestCase(unittest.TestCase):
+
+    def test_frequency(self):
+        sketch = FrequencySketch(width=1024)
+        for _ in range(3):
+            sketch.increment('key0')
+        sketch.increment('key1')
+
+        self.assertEqual(sketch.frequency('key0'), 3)
+        self.assertEqual(sketch.frequency('key1'), 1)
+        self.assertEqual(sketch.frequency('key2'), 0)
+
+    def test_aging(self):
+        sketch = FrequencySketch(width=1024, sample_size=4)
+        for _ in range(4):
+            sketch.increment('key0')
+
+        self.assertEqual(sketch.frequency('key0'), 2)
+
+
+class AdmissionPolicyTestCase(unittest.TestCase):
+
+    def test_max_entry_size(self):
+        policy = AdmissionPolicy(max_entry_size=10)
+
+        self.assertTrue(policy.admit('key0', 10))
+        self.assertFalse(policy.admit('key0', 11))
+        self.assertEqual(policy.rejected, 1)
+
+    def test_min_frequency(self):
+        policy = AdmissionPolicy(min_frequency=2)
+
+        policy.record('key0')
+        self.assertFalse(policy.admit('key0', 10))
+        policy.record('key0')
+        self.assertTrue(policy.admit('key0', 10))
+
+    def test_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        _cache = Cache(config={'CACHE_TYPE': 'fs',
+                               'CACHE_KWARGS': {'cache_dir': cache_dir},
+                               'CACHE_MAX_ENTRY_SIZE': 5,
+                               'CACHE_ADMISSION_MIN_FREQUENCY': 1})
+
+        self.assertFalse(_cache.set('key0', 'foo'))
+        self.assertIsNone(_cache.get('key0'))
+        self.assertTrue(_cache.set('key0', 'foo'))
+        self.assertEqual(_cache.get('key0'), b'foo')
+        # exceeds maximum entry size
+        self.assertIsNone(_cache.get('key1'))
+        self.assertFalse(_cache.set('key1', 'foobar'))
+        # the entry size is measured in bytes (UTF-8 encoded)
+        self.assertIsNone(_cache.get('key2'))
+        self.assertFalse(_cache.set('key2', '\u00e4\u00e4\u00e4'))
+
+
+class CacheMetricsTestCase(unittest.TestCase):
+
+    LABELS = {'resource': 'fdsnws-station-xml', 'level': 'station',
+              'key_class': 'response'}
+
+    def test_disabled(self):
+        metrics = CacheMetrics()
+        metrics.inc('hits_total', labels=self.LABELS)
+
+        self.assertEqual(metrics.as_dict(), {})
+
+    def test_inc_observe(self):
+        metrics = CacheMetrics(enabled=True)
+        metrics.inc('hits_total', labels=self.LABELS)
+        metrics.inc('bytes_out_total', 42, labels=self.LABELS)
+        metrics.observe('get_seconds', 0.002, labels=self.LABELS)
+
+        samples = metrics.as_dict()
+        self.assertEqual(
+            samples['federator_cache_hits_total{key_class="response",'
+                    'level="station",resource="fdsnws-station-xml"}'], 1)
+        self.assertEqual(
+            samples['federator_cache_bytes_out_total{key_class="response",'
+                    'level="station",resource="fdsnws-station-xml"}'], 42)
+        self.assertNotIn(
+            'federator_cache_get_seconds_bucket{key_class="response",'
+            'le="0.001",level="station",resource="fdsnws-station-xml"}',
+            samples)
+        self.assertEqual(
+            samples['federator_cache_get_seconds_bucket{key_class="response",'
+                    'le="0.005",level="station",'
+                    'resource="fdsnws-station-xml"}'], 1)
+        self.assertEqual(
+            samples['federator_cache_get_seconds_count{key_class="response",'
+                    'level="station",resource="fdsnws-station-xml"}'], 1)
+
+        dump = metrics.dump()
+        self.assertIn('# TYPE federator_cache_hits_total counter', dump)
+        self.assertIn('# TYPE federator_cache_get_seconds histogram', dump)
+
+    def test_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        metrics = CacheMetrics(enabled=True)
+        _cache = Cache(config={'CACHE_TYPE': 'fs',
+                               'CACHE_KWARGS': {'cache_dir': cache_dir,
+                                                'threshold': 0}},
+                       metrics=metrics)
+
+        _cache.get('key0', labels=self.LABELS)
+        _cache.set('key0', 'foo', labels=self.LABELS)
+        _cache.get('key0', labels=self.LABELS)
+        # not instrumented
+        _cache.get('key0')
+
+        samples = {k.split('{')[0]: v for k, v in metrics.as_dict().items()
+                   if '_bucket' not in k}
+        self.assertEqual(samples['federator_cache_hits_total'], 1)
+        self.assertEqual(samples['federator_cache_misses_total'], 1)
+        self.assertEqual(samples['federator_cache_sets_total'], 1)
+        self.assertEqual(samples['federator_cache_bytes_in_total'], 3)
+        self.assertEqual(samples['federator_cache_bytes_out_total'], 3)
+        self.assertEqual(samples['federator_cache_compress_seconds_count'], 1)
+        self.assertEqual(
+            samples['federator_cache_decompress_seconds_count'], 2)
+
+    def test_key_stats(self):
+        metrics = CacheMetrics(enabled=True)
+        stats = CacheKeyStats(metrics=metrics)
+
+        stats.record_key('key0', 'raw0')
+        stats.record_key('key0', 'raw1')
+        stats.record_lookup(True)
+        stats.record_lookup(False)
+        stats.record_lookup(False)
+
+        samples = metrics.as_dict()
+        self.assertEqual(
+            samples['federator_cache_key_lookups_total{result="hit"}'], 1)
+        self.assertEqual(
+            samples['federator_cache_key_lookups_total{result="miss"}'], 2)
+        self.assertEqual(
+            samples['federator_cache_key_canonicalized_total'], 1)
+        self.assertIn('# TYPE federator_cache_key_lookups_total counter',
+                      metrics.dump())
+
+
+class NegativeCacheTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = 'http://eida.ethz.ch/fdsnws/dataselect/1/query'
+        self.stream_epochs = [
+            StreamEpoch(Stream(network='CH', station='DAVOX', location='',
+                               channel='HHZ'),
+                        datetime.datetime(2018, 1, 1),
+                        datetime.datetime(2018, 1, 2)),
+            StreamEpoch(Stream(network='CH', station='DAVOX', location='',
+                               channel='HHN'),
+                        datetime.datetime(2018, 1, 1),
+                        datetime.datetime(2018, 1, 2))]
+
+    def test_make_key(self):
+        negative_cache = NegativeCache(self.redis, ttl=60)
+        now = datetime.datetime(2020, 1, 1, 12, 0, 30)
+        se = self.stream_epochs[0]
+
+        self.assertEqual(
+            negative_cache.make_key(self.url, se, {'quality': 'B'}, now=now),
+            negative_cache.make_key(
+                self.url.encode('utf-8'), se,
+                {'quality': 'B', 'nodata': '404'}, now=now))
+        self.assertNotEqual(
+            negative_cache.make_key(self.url, se, {'quality': 'B'}, now=now),
+            negative_cache.make_key(self.url, se, {'quality': 'M'}, now=now))
+        # endtimes within the current bucket are treated as open
+        self.assertEqual(
+            negative_cache.make_key(
+                self.url, se._replace(endtime=now), {}, now=now),
+            negative_cache.make_key(
+                self.url, se._replace(endtime=None), {}, now=now))
+
+    def test_add_lookup(self):
+        negative_cache = NegativeCache(self.redis, ttl=60)
+
+        self.assertEqual(
+            negative_cache.lookup(self.url, self.stream_epochs, {}),
+            [False, False])
+
+        negative_cache.add(self.url, self.stream_epochs[:1], {})
+        self.assertEqual(
+            negative_cache.lookup(self.url, self.stream_epochs, {}),
+            [True, False])
+        self.assertEqual(
+            negative_cache.lookup(self.url, self.stream_epochs,
+                                  {'quality': 'B'}),
+            [False, False])
+        self.assertLessEqual(self.redis.ttl(negative_cache.make_key(
+            self.url, self.stream_epochs[0], {})), 60)
+
+    def test_disabled(self):
+        negative_cache = NegativeCache(self.redis)
+
+        negative_cache.add(self.url, self.stream_epochs, {})
+        self.assertEqual(self.redis.dbsize(), 0)
+        self.assertEqual(
+            negative_cache.lookup(self.url, self.stream_epochs, {}),
+            [False, False])
+
+
+class PopularQueriesTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.stream_epochs = [
+            StreamEpoch(Stream(network='CH', station='DAVOX', location='',
+                               channel='HHZ'),
+                        datetime.datetime(2018, 1, 1),
+                        datetime.datetime(2018, 1, 2))]
+
+    def test_record(self):
+        popular_queries = PopularQueries(self.redis, max_queries=2)
+
+        popular_queries.record('key0', {'level': 'station'},
+                               self.stream_epochs, post=False)
+        for _ in range(2):
+            popular_queries.record('key1', {'level': 'channel'},
+                                   self.stream_epochs)
+
+        queries = popular_queries.most_popular(2)
+        self.assertEqual([k for k, _ in queries], ['key1', 'key0'])
+        self.assertEqual(queries[1][1]['query_params'], {'level': 'station'})
+        self.assertEqual(queries[1][1]['stream_epochs'], self.stream_epochs)
+        self.assertFalse(queries[1][1]['post'])
+
+        # the least popular queries are dropped when trimming
+        for _ in range(3):
+            popular_queries.record('key2', {}, self.stream_epochs)
+        popular_queries.record('key3', {}, self.stream_epochs)
+        self.assertEqual(
+            self.redis.zcard(popular_queries._key_scores), 4)
+        popular_queries.record('key4', {}, self.stream_epochs)
+        self.assertEqual(
+            [k for k, _ in popular_queries.most_popular(3)], ['key2', 'key1'])
+
+    def test_record_full(self):
+        popular_queries = PopularQueries(self.redis, max_queries=2)
+        for key in ('key1', 'key2'):
+            for _ in range(3):
+                popular_queries.record(key, {}, self.stream_epochs)
+
+        # a new query (ranked lowest) enters the full registry
+        popular_queries.record('key0', {}, self.stream_epochs)
+        self.assertEqual(
+            self.redis.zscore(popular_queries._key_scores, 'key0'), 1)
+
+        for _ in range(3):
+            popular_queries.record('key0', {}, self.stream_epochs)
+        self.assertEqual(
+            [k for k, _ in popular_queries.most_popular(1)], ['key0'])
+
+    def test_age(self):
+        popular_queries = PopularQueries(self.redis, max_queries=10)
+        for _ in range(4):
+            popular_queries.record('key0', {}, self.stream_epochs)
+
+        popular_queries.age()
+        self.assertEqual(
+            self.redis.zscore(popular_queries._key_scores, 'key0'), 2)
+
+    def test_disabled(self):
+        popular_queries = PopularQueries(self.redis)
+
+        popular_queries.record('key0', {}, self.stream_epochs)
+        self.assertEqual(self.redis.dbsize(), 0)
+
+
+class RoutingCacheTestCase(unittest.TestCase):
+
+    URL = 'http://localhost/eidaws/routing/1/query'
+
+    def setUp(self):
+        self.stream_epochs = [
+            StreamEpoch(Stream(network='CH', station='DAVOX', location='',
+                               channel='HHZ'),
+                        datetime.datetime(2018, 1, 1)),
+            StreamEpoch(Stream(network='CH', station='BALST', location='',
+                               channel='HHZ'),
+                        datetime.datetime(2018, 1, 1),
+                        datetime.datetime(2018, 1, 2))]
+        self.routing_table = {
+            'http://eida.ethz.ch/fdsnws/station/1/query': self.stream_epochs}
+
+    def test_make_key(self):
+        key = RoutingCache.make_key(
+            self.URL, {'service': 'station', 'minlat': 10},
+            self.stream_epochs)
+
+        self.assertEqual(
+            key, RoutingCache.make_key(
+                self.URL, {'minlatitude': '10', 'service': 'station'},
+                list(reversed(self.stream_epochs))))
+        self.assertNotEqual(
+            key, RoutingCache.make_key(
+                self.URL, {'service': 'dataselect', 'minlat': 10},
+                self.stream_epochs))
+
+    def test_get_set(self):
+        routing_cache = RoutingCache(ttl=60, max_entries=2)
+
+        routing_cache.set('key0', self.routing_table)
+        routing_cache.set('key1', {})
+        self.assertEqual(routing_cache.get('key1'), {})
+        self.assertEqual(routing_cache.get('key0'), self.routing_table)
+        self.assertIsNone(routing_cache.get('key2'))
+
+        # the least recently used entry is evicted
+        routing_cache.set('key2', self.routing_table)
+        self.assertIsNone(routing_cache.get('key1'))
+        self.assertEqual(routing_cache.get('key0'), self.routing_table)
+
+    def test_expiration(self):
+        routing_cache = RoutingCache(ttl=0.1)
+
+        routing_cache.set('key', self.routing_table)
+        time.sleep(0.15)
+        self.assertIsNone(routing_cache.get('key'))
+
+    def test_disabled(self):
+        routing_cache = RoutingCache()
+
+        routing_cache.set('key', self.routing_table)
+        self.assertFalse(routing_cache.enabled)
+        self.assertIsNone(routing_cache.get('key'))
+
+    @mock.patch('requests.get')
+    def test_validate(self, mock_get):
+        routing_cache = RoutingCache(ttl=60, generation_interval=0)
+        mock_get.return_value.text = 'generation0\n'
+
+        routing_cache.validate(self.URL)
+        routing_cache.set('key', self.routing_table)
+        routing_cache.validate(self.URL)
+        self.assertEqual(routing_cache.generation, 'generation0')
+        self.assertEqual(routing_cache.get('key'), self.routing_table)
+
+        # harvesting changed the generation token
+        mock_get.return_value.text = 'generation1\n'
+        routing_cache.validate(self.URL)
+        self.assertEqual(routing_cache.generation, 'generation1')
+        self.assertIsNone(routing_cache.get('key'))
+
+    @mock.patch('requests.get')
+    def test_validate_interval(self, mock_get):
+        routing_cache = RoutingCache(ttl=60, generation_interval=60)
+        mock_get.return_value.text = 'generation0'
+
+        routing_cache.validate(self.URL)
+        routing_cache.validate(self.URL)
+        self.assertEqual(mock_get.call_count, 1)
+
+
+class CachingMixinTestCase(unittest.TestCase):
+
+    class Processor(CachingMixin):
+        CACHE_KEY_SCHEMA = StationSchema
+
+    def setUp(self):
+        cache.init_cache(config={'CACHE_KEY_ENDTIME_GRANULARITY': 3600})
+        cache.key_stats.clear()
+
+        self.processor = self.Processor()
+        self.stream = Stream(network='CH', station='DAVOX', location='',
+                             channel='BHZ')
+
+    def test_canonicalize_query_params(self):
+        self.assertEqual(
+            self.processor.canonicalize_query_params(
+                {'level': 'station', 'minlatitude': '-90',
+                 'maxlatitude': '45', 'format': 'xml',
+                 'includerestricted': 'true', 'starttime': None}),
+            {'maxlatitude': '45.0'})
+
+        # exclusively values of case-insensitive parameters are lower-cased
+        self.assertEqual(
+            self.processor.canonicalize_query_params(
+                {'level': 'CHANNEL', 'format': 'XML',
+                 'includerestricted': 'TRUE', 'other': 'Value'}),
+            {'level': 'channel', 'other': 'Value'})
+
+    def test_canonicalize_stream_epochs(self):
+        now = datetime.datetime(2019, 1, 1, 12, 30)
+        stream_epochs = [
+            StreamEpoch(self.stream, datetime.datetime(2010, 1, 1),
+                        datetime.datetime(2012, 1, 1)),
+            StreamEpoch(self.stream, datetime.datetime(2011, 1, 1),
+                        datetime.datetime(2019, 1, 1, 12, 15))]
+
+        self.assertEqual(
+            self.processor.canonicalize_stream_epochs(stream_epochs, now=now),
+            [StreamEpoch(self.stream, datetime.datetime(2010, 1, 1), None)])
+
+    def test_canonicalize_stream_epochs_past_endtime(self):
+        now = datetime.datetime(2019, 1, 1, 12, 30)
+        stream_epochs = [
+            StreamEpoch(self.stream, datetime.datetime(2010, 1, 1),
+                        datetime.datetime(2019, 1, 1, 11, 59))]
+
+        self.assertEqual(
+            self.processor.canonicalize_stream_epochs(stream_epochs, now=now),
+            stream_epochs)
+
+    def test_make_cache_key(self):
+        now = datetime.datetime.utcnow()
+        k0 = self.processor.make_cache_key(
+            {'level': 'station', 'nodata': '204'},
+            [StreamEpoch(self.stream, datetime.datetime(2010, 1, 1), None)])
+        k1 = self.processor.make_cache_key(
+            {'level': 'station', 'minlongitude': '-180.0'},
+            [StreamEpoch(self.stream, datetime.datetime(2010, 1, 1), now)])
+
+        self.assertEqual(k0, k1)
+        self.assertEqual(cache.key_stats.canonicalized, 1)
+
+        k2 = self.processor.make_cache_key(
+            {'level': 'channel'},
+            [StreamEpoch(self.stream, datetime.datetime(2010, 1, 1), None)])
+        self.assertNotEqual(k0, k2)
+
+    def test_get_cache_record_admission(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        self.addCleanup(cache.init_cache, config={})
+        cache.init_cache(config={'CACHE_TYPE': 'fs',
+                                 'CACHE_KWARGS': {'cache_dir': cache_dir},
+                                 'CACHE_ADMISSION_MIN_FREQUENCY': 1})
+        self.processor.query_params = {}
+
+        # e.g. fragment lookups
+        self.assertEqual(self.processor.get_cache('key0', record_stats=False),
+                         (None, False))
+        self.assertEqual(cache.key_stats.lookups, 0)
+        self.assertTrue(cache.set('key0', 'foo'))
+
+        self.processor.get_cache('key1', record_stats=False,
+                                 record_admission=False)
+        self.assertFalse(cache.set('key1', 'foo'))
+
+    def test_match_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        self.addCleanup(cache.init_cache, config={})
+        cache.init_cache(config={'CACHE_TYPE': 'fs',
+                                 'CACHE_KWARGS': {'cache_dir': cache_dir},
+                                 'CACHE_ADMISSION_MIN_FREQUENCY': 1})
+        self.processor.query_params = {}
+
+        # not admitted i.e. no entity tag is stored
+        self.assertFalse(cache.set('key0', 'foo', etag=True))
+        self.assertIsNone(self.processor.get_cache_etag('key0'))
+
+        cache.admission.record('key0')
+        self.assertTrue(cache.set('key0', 'foo', etag=True))
+        etag = self.processor.make_etag('foo')
+        self.assertEqual(self.processor.get_cache_etag('key0'), etag)
+
+        self.assertIsNone(self.processor.match_cache('key0', ETags(['bar'])))
+        self.assertEqual(cache.key_stats.lookups, 0)
+        self.assertEqual(self.processor.match_cache('key0', ETags([etag])),
+                         etag)
+        self.assertEqual(cache.key_stats.hit_ratio, 1.)
+
+        # the entity tag is updated along with the entry
+        self.assertTrue(cache.set('key0', 'bar', force=True, etag=True))
+        self.assertIsNone(self.processor.match_cache('key0', ETags([etag])))
+        self.assertEqual(self.processor.get_cache_etag('key0'),
+                         self.processor.make_etag('bar'))
+
+        # the entity tag outlived the entry
+        cache.delete('key0')
+        self.assertIsNone(self.processor.match_cache(
+            'key0', ETags([self.processor.make_etag('bar')])))
+
+    def test_make_etag(self):
+        etag = self.processor.make_etag(b'foo')
+
+        self.assertEqual(etag, self.processor.make_etag('foo'))
+        self.assertNotEqual(etag, self.processor.make_etag(b'bar'))
+
+    def test_set_cache_control(self):
+        resp = self.processor.set_cache_control(Response(b'foo'), 60)
+        self.assertTrue(resp.cache_control.public)
+        self.assertEqual(resp.cache_control.max_age, 60)
+
+        resp = self.processor.set_cache_control(Response(b'foo'), 0)
+        self.assertNotIn('Cache-Control', resp.headers)
+
+
+class CacheKeyStatsTestCase(unittest.TestCase):
+
+    def test_stats(self):
+        stats = CacheKeyStats(max_keys=2)
+        stats.record_key('key0', 'raw0')
+        stats.record_key('key0', 'raw0')
+        stats.record_key('key0', 'raw1')
+        stats.record_lookup(True)
+        stats.record_lookup(False)
+
+        self.assertEqual(stats.as_dict(),
+                         {'lookups': 2, 'hits': 1, 'misses': 1,
+                          'canonicalized': 1, 'hit_ratio': 0.5})
+
+        stats.record_key('key1', 'raw0')
+        stats.record_key('key2', 'raw0')
+        # key0 is evicted
+        stats.record_key('key0', 'raw2')
+        self.assertEqual(stats.canonicalized, 1)
+
+
+class MiniSEEDRecordsTestCase(unittest.TestCase):
+
+    def test_iter_records(self):
+        starttime = datetime.datetime(2019, 12, 31, 23, 59, 59, 500000)
+        records = [
+            _create_mseed_record(starttime),
+            _create_mseed_record(starttime + datetime.timedelta(seconds=1),
+                                 record_length=256, byte_order='<'),
+            _create_mseed_record(starttime + datetime.timedelta(seconds=2),
+                                 num_samples=0, record_length=4096)]
+
+        retval = list(iter_mseed_records(io.BytesIO(b''.join(records))))
+
+        self.assertEqual([r for _, _, r in retval], records)
+        self.assertEqual(
+            [(s, e) for s, e, _ in retval],
+            [(starttime, starttime + datetime.timedelta(seconds=1)),
+             (starttime + datetime.timedelta(seconds=1),
+              starttime + datetime.timedelta(seconds=2)),
+             (starttime + datetime.timedelta(seconds=2),
+              starttime + datetime.timedelta(seconds=2))])
+
+
+class MiniSEEDTileCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp(suffix='__fed_tile_cache')
+        self.stream = Stream(network='NE', station='STA', location='00',
+                             channel='HHZ')
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_tiles(self):
+        self.assertEqual(
+            MiniSEEDTileCache.tiles(datetime.datetime(2020, 1, 1, 12),
+                                    datetime.datetime(2020, 1, 3)),
+            [datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 2)])
+        self.assertEqual(
+            MiniSEEDTileCache.tiles(datetime.datetime(2020, 1, 1, 12),
+                                    datetime.datetime(2020, 1, 1, 13)),
+            [datetime.datetime(2020, 1, 1)])
+
+    def test_is_final(self):
+        tile_cache = MiniSEEDTileCache(cache_dir=self.cache_dir, min_age=3600)
+        day = datetime.datetime(2020, 1, 1)
+
+        self.assertFalse(tile_cache.is_final(
+            day, now=datetime.datetime(2020, 1, 2, 0, 30)))
+        self.assertTrue(tile_cache.is_final(
+            day, now=datetime.datetime(2020, 1, 2, 1)))
+
+    def test_set_get(self):
+        tile_cache = MiniSEEDTileCache(cache_dir=self.cache_dir)
+        day = datetime.datetime(2020, 1, 1)
+        record = _create_mseed_record(day)
+
+        self.assertTrue(tile_cache.enabled)
+        self.assertIsNone(tile_cache.get(self.stream, day))
+        self.assertTrue(tile_cache.set(self.stream, day, [record]))
+
+        with open(tile_cache.get(self.stream, day), 'rb') as ifd:
+            self.assertEqual(ifd.read(), record)
+
+        # empty tiles
+        day += datetime.timedelta(days=1)
+        self.assertTrue(tile_cache.set(self.stream, day, []))
+        self.assertEqual(os.path.getsize(tile_cache.get(self.stream, day)),
+                         0)
+
+    def test_quota(self):
+        tile_cache = MiniSEEDTileCache(cache_dir=self.cache_dir, quota=1024)
+        days = [datetime.datetime(2020, 1, i) for i in range(1, 4)]
+
+        tile_cache.set(self.stream, days[0], [_create_mseed_record(days[0])])
+        tile_cache.set(self.stream, days[1], [_create_mseed_record(days[1])])
+        # age the second tile and mark the first tile as recently used
+        os.utime(tile_cache._get_filename(self.stream, days[1]),
+                 (time.time() - 10, time.time() - 10))
+        tile_cache.get(self.stream, days[0])
+        tile_cache.set(self.stream, days[2], [_create_mseed_record(days[2])])
+
+        self.assertIsNotNone(tile_cache.get(self.stream, days[0]))
+        self.assertIsNone(tile_cache.get(self.stream, days[1]))
+        self.assertIsNotNone(tile_cache.get(self.stream, days[2]))
+        self.assertEqual(tile_cache._size, 1024)
+
+    def test_overwrite(self):
+        tile_cache = MiniSEEDTileCache(cache_dir=self.cache_dir, quota=1024)
+        day = datetime.datetime(2020, 1, 1)
+        record = _create_mseed_record(day)
+
+        for _ in range(3):
+            self.assertTrue(tile_cache.set(self.stream, day, [record]))
+        self.assertEqual(tile_cache._size, 512)
+
+        self.assertTrue(tile_cache.set(self.stream, day, []))
+        self.assertEqual(tile_cache._size, 0)
@@ -44,6 +44,30 @@ class CLITestCase(unittest.TestCase):
 
         os.rmdir(path_tempdir)
 
+    @mock.patch('sys.stderr', open(os.devnull, 'w'))
+    def test_routing_shard_size(self):
+        args = self.parser.parse_args([])
+        self.assertEqual(args.routing_shard_size, 0)
+        args = self.parser.parse_args(['--routing-shard-size', '0'])
+        self.assertEqual(args.routing_shard_size, 0)
+        args = self.parser.parse_args(['--routing-shard-size', '100'])
+        self.assertEqual(args.routing_shard_size, 100)
+
+        with self.assertRaises(SystemExit):
+            self.parser.parse_args(['--routing-shard-size', '-1'])
+
+    @mock.patch('sys.stderr', open(os.devnull, 'w'))
+    def test_routing_cache_ttl(self):
+        args = self.parser.parse_args([])
+        self.assertEqual(args.routing_cache_ttl, 0)
+        args = self.parser.parse_args(['--routing-cache-ttl', '0'])
+        self.assertEqual(args.routing_cache_ttl, 0)
+        args = self.parser.parse_args(['--routing-cache-ttl', '3600'])
+        self.assertEqual(args.routing_cache_ttl, 3600)
+
+        with self.assertRaises(SystemExit):
+            self.parser.parse_args(['--routing-cache-ttl', '-1'])
+
 
 # -----------------------------------------------------------------------------
 if __name__ == '__main__':
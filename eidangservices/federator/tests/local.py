@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+Local storage related test facilities.
+"""
+
+import os
+import shutil
+import sqlite3
+import stat
+import tempfile
+import time
+import unittest
+
+from redis.exceptions import RedisError
+
+from eidangservices.federator.server.local import LocalRedis, LocalStoreError
+
+
+class LocalRedisTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.redis = LocalRedis(path=os.path.join(self.tmpdir, 'test.db'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_from_url(self):
+        path = os.path.join(self.tmpdir, 'other.db')
+        client = LocalRedis.from_url('local://' + path)
+
+        self.assertEqual(client.path, path)
+        self.assertTrue(LocalRedis.is_local_url('local://' + path))
+        self.assertFalse(LocalRedis.is_local_url('redis://localhost:6379/0'))
+        with self.assertRaises(ValueError):
+            LocalRedis.from_url('redis://localhost:6379/0')
+
+    def test_strings(self):
+        self.assertIsNone(self.redis.get('key'))
+        self.assertTrue(self.redis.set('key', 'value'))
+        self.assertIsNone(self.redis.set('key', 'other', nx=True))
+
+        self.assertEqual(self.redis.get('key'), b'value')
+        self.assertEqual(self.redis.mget(['key', 'missing']), [b'value', None])
+        self.assertEqual(self.redis.exists('key'), 1)
+        self.assertEqual(self.redis.ttl('key'), -1)
+        self.assertEqual(self.redis.delete('key', 'missing'), 1)
+        self.assertEqual(self.redis.ttl('key'), -2)
+
+    def test_expiration(self):
+        self.redis.set('key', 1, px=100)
+        self.assertEqual(self.redis.ttl('key'), 1)
+
+        time.sleep(0.15)
+        self.assertIsNone(self.redis.get('key'))
+        self.assertEqual(self.redis.dbsize(), 0)
+
+    def test_hashes(self):
+        self.assertEqual(self.redis.hincrby('key', 'a', 2), 2)
+        self.assertEqual(self.redis.hincrby('key', 'a'), 3)
+        self.assertEqual(self.redis.hincrbyfloat('key', 'b', 0.5), 0.5)
+
+        self.assertEqual(self.redis.hgetall('key'),
+                         {b'a': b'3', b'b': b'0.5'})
+        self.assertEqual(self.redis.hdel('key', 'a', 'b'), 2)
+        self.assertEqual(self.redis.exists('key'), 0)
+
+    def test_sorted_sets(self):
+        self.redis.zadd('key', {'a': 1, 'b': 3, 'c': 2})
+        self.redis.zincrby('key', 3, 'a')
+
+        self.assertEqual(self.redis.zrevrange('key', 0, 1), [b'a', b'b'])
+        self.assertEqual(self.redis.zcount('key', '-inf', '(3'), 1)
+        self.assertEqual(self.redis.zrevrangebyscore('key', 3, 2),
+                         [b'b', b'c'])
+
+        self.redis.zunionstore('key', {'key': 0.5})
+        self.assertEqual(self.redis.zscore('key', 'c'), 1)
+        self.assertEqual(self.redis.zremrangebyrank('key', 0, 0), 1)
+        self.assertEqual(self.redis.zrange('key', 0, -1), [b'b', b'a'])
+
+    def test_sorted_sets_ranges(self):
+        self.redis.zadd('key', {'a': 1, 'b': 1, 'c': 2, 'd': 3})
+
+        self.assertEqual(self.redis.zcard('key'), 4)
+        # ties are ordered lexicographically
+        self.assertEqual(self.redis.zrange('key', 0, 1, withscores=True),
+                         [(b'a', 1.), (b'b', 1.)])
+        self.assertEqual(self.redis.zrange('key', -2, -1), [b'c', b'd'])
+        self.assertEqual(self.redis.zrange('key', 3, 1), [])
+        self.assertEqual(self.redis.zrangebyscore('key', '(1', '+inf'),
+                         [b'c', b'd'])
+        self.assertEqual(self.redis.zremrangebyscore('key', '-inf', 1), 2)
+        self.assertEqual(self.redis.zremrangebyrank('key', 0, -2), 1)
+        self.assertEqual(self.redis.zrem('key', 'd', 'missing'), 1)
+        self.assertEqual(self.redis.exists('key'), 0)
+
+    def test_overwrite(self):
+        self.redis.hset('key', 'a', 1)
+        self.assertTrue(self.redis.set('key', 'value'))
+        self.assertEqual(self.redis.get('key'), b'value')
+
+        self.redis.zunionstore('key', ['missing'])
+        self.assertEqual(self.redis.exists('key'), 0)
+
+    def test_expired_collection(self):
+        self.redis.zadd('key', {'a': 1})
+        self.redis.expire('key', 0.1)
+
+        time.sleep(0.15)
+        self.assertEqual(self.redis.zcard('key'), 0)
+        self.assertEqual(self.redis.zincrby('key', 1, 'b'), 1)
+        self.assertEqual(self.redis.zrange('key', 0, -1), [b'b'])
+        self.assertEqual(self.redis.ttl('key'), -1)
+
+    def test_read_deferred(self):
+        self.redis.set('key', 'value')
+        self.redis.hset('hash', 'a', 1)
+        redis = LocalRedis(path=self.redis.path, timeout=0.1)
+
+        # concurrent writer holding the write lock
+        conn = sqlite3.connect(self.redis.path, isolation_level=None)
+        self.addCleanup(conn.close)
+        conn.execute('BEGIN IMMEDIATE')
+        self.addCleanup(conn.execute, 'ROLLBACK')
+
+        self.assertEqual(redis.get('key'), b'value')
+        self.assertEqual(redis.hgetall('hash'), {b'a': b'1'})
+        with self.assertRaises(LocalStoreError):
+            redis.set('key', 'other')
+
+    def test_schema_upgrade(self):
+        conn = sqlite3.connect(self.redis.path)
+        conn.execute('CREATE TABLE store '
+                     '(key BLOB PRIMARY KEY, value BLOB NOT NULL, '
+                     'expires REAL)')
+        conn.execute("INSERT INTO store (key, value) VALUES (?, ?)",
+                     (b'key', b'h\x00'))
+        conn.commit()
+        conn.close()
+
+        # data stored with a previous schema is discarded
+        self.assertEqual(self.redis.dbsize(), 0)
+        self.assertEqual(self.redis.hincrby('key', 'a'), 1)
+
+    def test_update_keeps_expiration(self):
+        self.redis.hset('key', 'a', 1)
+        self.redis.expire('key', 60)
+        self.assertEqual(self.redis.hset('key', 'b', 2), 1)
+        self.assertEqual(self.redis.hincrby('key', 'a'), 2)
+
+        self.assertEqual(self.redis.ttl('key'), 60)
+        self.assertEqual(self.redis.hgetall('key'), {b'a': b'2', b'b': b'2'})
+
+    def test_encoding(self):
+        self.redis.set('string', b'\x80\x03value')
+        self.redis.hset('hash', 'a', '\u00e4')
+        self.redis.zadd('zset', {'a': 1.5})
+
+        conn = sqlite3.connect(self.redis.path)
+        self.addCleanup(conn.close)
+        rows = dict(conn.execute('SELECT key, value FROM store'))
+        self.assertEqual(rows[b'string'], b's\x80\x03value')
+        self.assertEqual(rows[b'hash'], b'h')
+        self.assertEqual(rows[b'zset'], b'z')
+        # members are stored as individual rows
+        self.assertEqual(
+            conn.execute('SELECT key, member, value, score FROM members '
+                         'ORDER BY key').fetchall(),
+            [(b'hash', b'a', '\u00e4'.encode(), None),
+             (b'zset', b'a', None, 1.5)])
+
+        self.assertEqual(self.redis.get('string'), b'\x80\x03value')
+        self.assertEqual(self.redis.hget('hash', 'a'), '\u00e4'.encode())
+        self.assertEqual(self.redis.zscore('zset', 'a'), 1.5)
+
+        # invalid (e.g. pickled) values are refused
+        conn.execute("INSERT INTO store (key, value) VALUES (?, ?)",
+                     (b'invalid', b'\x80\x03N.'))
+        conn.commit()
+        with self.assertRaises(LocalStoreError):
+            self.redis.get('invalid')
+
+    def test_file_permissions(self):
+        self.redis.ping()
+        self.assertEqual(stat.S_IMODE(os.stat(self.redis.path).st_mode),
+                         0o600)
+
+    def test_refuse_symlink(self):
+        path = os.path.join(self.tmpdir, 'link.db')
+        os.symlink(self.redis.path, path)
+
+        with self.assertRaises(LocalStoreError):
+            LocalRedis(path=path).ping()
+
+    @unittest.skipUnless(hasattr(os, 'geteuid') and os.geteuid() == 0,
+                         'Changing file ownership requires root.')
+    def test_refuse_foreign_owner(self):
+        path = os.path.join(self.tmpdir, 'foreign.db')
+        open(path, 'wb').close()
+        os.chown(path, 65534, -1)
+
+        with self.assertRaises(LocalStoreError):
+            LocalRedis(path=path).ping()
+
+    def test_wrong_type(self):
+        self.redis.set('key', 'value')
+
+        with self.assertRaises(RedisError):
+            self.redis.hgetall('key')
+
+    def test_pipeline(self):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.set('key', 'value')
+        pipe.hincrby('hash', 'a', 1)
+        pipe.get('key')
+
+        self.assertEqual(self.redis.dbsize(), 0)
+        self.assertEqual(pipe.execute(), [True, 1, b'value'])
+
+    def test_transaction(self):
+        self.redis.set('key', 'token')
+
+        def release(pipe):
+            if pipe.get('key') == b'token':
+                pipe.multi()
+                pipe.delete('key')
+
+        self.assertEqual(self.redis.transaction(release, 'key'), [1])
+        self.assertEqual(self.redis.exists('key'), 0)
+
+    def test_pubsub(self):
+        with self.assertRaises(RedisError):
+            self.redis.pubsub()
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
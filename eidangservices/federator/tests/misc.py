@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Miscellaneous utils related test facilities.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from unittest import mock
+
+from eidangservices.federator.server.local import LocalRedis
+from eidangservices.federator.server.misc import ContextCancellation
+
+
+class _Thread:
+
+    def is_alive(self):
+        return True
+
+
+class _PubSub:
+
+    def __init__(self, redis):
+        self._redis = redis
+
+    def subscribe(self, **handlers):
+        self._redis.handlers.update(handlers)
+
+    def get_message(self, timeout=0):
+        return {'type': 'subscribe'}
+
+    def run_in_thread(self, sleep_time=0, daemon=False):
+        return _Thread()
+
+    def close(self):
+        pass
+
+
+class _PubSubRedis:
+    """
+    Minimal Redis stub delivering published messages synchronously.
+    """
+
+    def __init__(self):
+        self.keys = set()
+        self.handlers = {}
+
+    def exists(self, key):
+        return int(key in self.keys)
+
+    def pubsub(self):
+        return _PubSub(self)
+
+    def publish(self, channel, message):
+        handler = self.handlers.get(channel)
+        if handler is None:
+            return 0
+
+        handler({'type': 'message', 'channel': channel,
+                 'data': message.encode('utf-8')})
+        return 1
+
+
+class ContextCancellationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = _PubSubRedis()
+        self.cancellation = ContextCancellation(self.redis)
+
+    def test_publish(self):
+        self.redis.keys.add('request:0')
+
+        self.assertTrue(self.cancellation.is_locked('request:0'))
+        self.assertFalse(self.cancellation.is_cancelled('request:0'))
+
+        # released i.e. the flag is flipped without accessing Redis
+        self.redis.keys.discard('request:0')
+        self.cancellation.publish('request:0')
+        self.assertTrue(self.cancellation.is_cancelled('request:0'))
+        self.assertFalse(self.cancellation.is_locked('request:0'))
+
+    def test_publish_unwatched(self):
+        self.cancellation.start()
+        self.cancellation.publish('request:0')
+
+        self.assertFalse(self.cancellation.is_cancelled('request:0'))
+        self.assertEqual(self.cancellation._cancelled, {})
+
+    def test_publish_while_checking(self):
+        self.redis.keys.add('request:0')
+
+        def exists(key):
+            # released while checking
+            self.redis.keys.discard(key)
+            self.cancellation.publish(key)
+            return 1
+
+        self.cancellation.start()
+        with mock.patch.object(self.redis, 'exists', side_effect=exists):
+            self.assertFalse(self.cancellation.is_locked('request:0'))
+
+        self.assertTrue(self.cancellation.is_cancelled('request:0'))
+        self.assertEqual(self.cancellation._pending, {})
+
+    def test_fallback(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        # pub/sub is not supported by the local storage
+        cancellation = ContextCancellation(
+            LocalRedis(path=os.path.join(tmpdir, 'test.db')))
+
+        self.assertFalse(cancellation.start())
+        self.assertIsNone(cancellation.is_locked('request:0'))
+        self.assertFalse(cancellation.is_cancelled('request:0'))
+
+    def test_reset_after_fork(self):
+        self.redis.keys.add('request:0')
+        self.assertTrue(self.cancellation.is_locked('request:0'))
+        self.cancellation.publish('request:0')
+
+        # e.g. the subscriber thread holds the lock while forking
+        self.cancellation._lock.acquire()
+        self.addCleanup(self.cancellation._lock.release)
+
+        pid = os.getpid() + 1
+        with mock.patch('os.getpid', return_value=pid):
+            t = threading.Thread(target=self.cancellation.start,
+                                 daemon=True)
+            t.start()
+            t.join(timeout=5)
+
+            self.assertFalse(t.is_alive())
+            self.assertTrue(self.cancellation.active)
+            self.assertFalse(self.cancellation.is_cancelled('request:0'))
+
+        self.assertEqual(self.cancellation._owner_pid, pid)
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
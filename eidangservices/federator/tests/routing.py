@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Routing related test facilities.
+"""
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from eidangservices.federator.server.request import RoutingRequestHandler
+from eidangservices.federator.server.routing import (
+    EmbeddedRouting, EmbeddedRoutingError, prefix_url)
+from eidangservices.federator.server.strategy import GranularRequestStrategy
+from eidangservices.stationlite.engine import dbquery, orm
+from eidangservices.utils.request import NoContent, RequestsError
+from eidangservices.utils.sncl import Stream, StreamEpoch
+
+
+class EmbeddedRoutingTestCase(unittest.TestCase):
+
+    URL = 'http://eida.ethz.ch/fdsnws/dataselect/1/query'
+    STATION_URL = 'http://eida.ethz.ch/fdsnws/station/1/query'
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_url = 'sqlite:///' + os.path.join(self.tmpdir, 'test.db')
+
+        engine = create_engine(self.db_url)
+        orm.ORMBase.metadata.create_all(engine)
+
+        session = sessionmaker(bind=engine)()
+        net = orm.Network(code='CH')
+        sta = orm.Station(code='DAVOX')
+        session.add(orm.StationEpoch(
+            station=sta, starttime=datetime.datetime(2000, 1, 1),
+            latitude=46.7805, longitude=9.87952))
+        cha_epoch = orm.ChannelEpoch(
+            network=net, station=sta, code='HHZ', locationcode='',
+            starttime=datetime.datetime(2004, 2, 20))
+        endpoint = orm.Endpoint(
+            url=self.URL, service=orm.Service(name='dataselect'))
+        session.add(orm.Routing(
+            channel_epoch=cha_epoch, endpoint=endpoint,
+            starttime=datetime.datetime(2000, 1, 1)))
+        session.add(orm.Routing(
+            channel_epoch=cha_epoch,
+            endpoint=orm.Endpoint(url=self.STATION_URL,
+                                  service=orm.Service(name='station')),
+            starttime=datetime.datetime(2000, 1, 1)))
+        session.commit()
+        session.close()
+        engine.dispose()
+
+        self.routing = EmbeddedRouting(self.db_url)
+
+    def tearDown(self):
+        self.routing.configure(None)
+        shutil.rmtree(self.tmpdir)
+
+    def test_route(self):
+        stream_epochs = [
+            StreamEpoch(Stream(network='CH', station='DAVOX', location='*',
+                               channel='HH?'),
+                        datetime.datetime(2018, 1, 1))]
+
+        self.assertEqual(
+            self.routing.route(stream_epochs, {'service': 'dataselect'}),
+            {self.URL: [
+                StreamEpoch(Stream(network='CH', station='DAVOX',
+                                   location='--', channel='HHZ'),
+                            datetime.datetime(2018, 1, 1))]})
+
+    def test_route_query_params(self):
+        stream_epochs = [
+            StreamEpoch(Stream(network='CH', station='*', location='*',
+                               channel='*'),
+                        datetime.datetime(2018, 1, 1),
+                        datetime.datetime(2018, 1, 2))]
+
+        routing_table = self.routing.route(
+            stream_epochs, {'service': 'dataselect',
+                            'proxynetloc': 'proxy.example.com'})
+        self.assertEqual(
+            list(routing_table),
+            ['http://proxy.example.com/eida.ethz.ch/fdsnws/dataselect/1/'
+             'query'])
+        self.assertEqual(routing_table[
+            'http://proxy.example.com/eida.ethz.ch/fdsnws/dataselect/1/'
+            'query'][0].endtime, datetime.datetime(2018, 1, 2))
+
+        self.assertEqual(
+            self.routing.route(stream_epochs, {'service': 'wfcatalog'}), {})
+        self.assertEqual(
+            self.routing.route(stream_epochs, {'service': 'dataselect',
+                                               'minlat': '50'}), {})
+
+        with self.assertRaises(EmbeddedRoutingError):
+            self.routing.route(stream_epochs, {'service': 'dataselect',
+                                               'access': 'invalid'})
+
+    def test_find_routes_by_service(self):
+        stream_epochs = [
+            StreamEpoch(Stream(network='CH', station='DAVOX', location='*',
+                               channel='*'),
+                        datetime.datetime(2018, 1, 1),
+                        datetime.datetime(2018, 1, 2))]
+
+        engine = create_engine(self.db_url)
+        session = sessionmaker(bind=engine)()
+        try:
+            routes = dbquery.find_routes_by_service(
+                session, stream_epochs, ['station', 'dataselect', 'wfcatalog'],
+                level='station', access='open')
+            self.assertEqual(
+                routes['station'],
+                dbquery.find_routes(session, stream_epochs, 'station',
+                                    level='station'))
+            self.assertEqual(
+                routes['dataselect'],
+                dbquery.find_routes(session, stream_epochs, 'dataselect',
+                                    access='open'))
+            self.assertEqual(routes['wfcatalog'], [])
+            self.assertEqual(
+                routes['station'][0].streams[0].stream,
+                Stream(network='CH', station='DAVOX', location='*',
+                       channel='*'))
+        finally:
+            session.close()
+            engine.dispose()
+
+    def test_generation(self):
+        generation = self.routing.generation()
+        self.assertEqual(generation, self.routing.generation())
+
+        engine = create_engine(self.db_url)
+        engine.execute(orm.Routing.__table__.delete())
+        engine.dispose()
+
+        self.assertNotEqual(generation, self.routing.generation())
+
+    def test_disabled(self):
+        routing = EmbeddedRouting()
+
+        self.assertFalse(routing.enabled)
+        with self.assertRaises(EmbeddedRoutingError):
+            routing.route([])
+
+    def test_missing_dependencies(self):
+        routing = EmbeddedRouting()
+
+        for module in ('sqlalchemy', 'eidangservices.stationlite.engine'):
+            with self.subTest(module=module):
+                with mock.patch.dict('sys.modules', {module: None}):
+                    with self.assertRaises(EmbeddedRoutingError):
+                        routing.configure(self.db_url)
+                self.assertFalse(routing.enabled)
+
+    def test_prefix_url(self):
+        self.assertEqual(prefix_url(self.URL, 'proxy.example.com'),
+                         'http://proxy.example.com/eida.ethz.ch/fdsnws/'
+                         'dataselect/1/query')
+
+
+class ShardedRoutingTestCase(unittest.TestCase):
+
+    ROUTING_URL = 'http://localhost/eidaws/routing/1/query'
+    URL = 'http://eida.ethz.ch/fdsnws/dataselect/1/query'
+
+    def setUp(self):
+        self.stream_epochs = [
+            StreamEpoch(Stream(network='CH', station='STA{}'.format(i),
+                               location='--', channel='HHZ'),
+                        datetime.datetime(2018, 1, 1))
+            for i in range(10)]
+        self.req = RoutingRequestHandler(
+            self.ROUTING_URL, self.stream_epochs,
+            {'service': 'dataselect'})
+        self.strategy = GranularRequestStrategy()
+
+    def test_split(self):
+        reqs = self.req.split(3)
+
+        self.assertEqual([len(req.stream_epochs) for req in reqs],
+                         [3, 3, 3, 1])
+        self.assertEqual([se for req in reqs for se in req.stream_epochs],
+                         self.stream_epochs)
+        for req in reqs:
+            self.assertEqual(req.url, self.req.url)
+            self.assertEqual(req.query_params, self.req.query_params)
+
+    def test_route_sharded(self):
+        def route(req):
+            if req.stream_epochs[0].station == 'STA9':
+                raise NoContent(req.url, 204)
+            return {self.URL: list(req.stream_epochs)}
+
+        self.assertEqual(
+            self.strategy._route_sharded(route, self.req.split(3)),
+            {self.URL: self.stream_epochs[:9]})
+
+        with self.assertRaises(NoContent):
+            self.strategy._route_sharded(route, self.req.split(3)[3:])
+
+    def test_route_sharded_error(self):
+        def route(req):
+            raise RequestsError('error')
+
+        with self.assertRaises(RequestsError):
+            self.strategy._route_sharded(route, self.req.split(3))
+
+    def test_merge_routing_tables(self):
+        stream = Stream(network='CH', station='DAVOX', location='--',
+                        channel='HHZ')
+        routing_tables = [
+            {self.URL: [StreamEpoch(stream, datetime.datetime(2018, 1, 1),
+                                    datetime.datetime(2018, 1, 3))]},
+            {self.URL: [StreamEpoch(stream, datetime.datetime(2018, 1, 2))],
+             self.ROUTING_URL: [StreamEpoch(stream,
+                                            datetime.datetime(2018, 1, 1))]}]
+
+        self.assertEqual(
+            self.strategy._merge_routing_tables(routing_tables),
+            {self.URL: [StreamEpoch(stream, datetime.datetime(2018, 1, 1))],
+             self.ROUTING_URL: [StreamEpoch(stream,
+                                            datetime.datetime(2018, 1, 1))]})
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
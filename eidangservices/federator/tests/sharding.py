@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Sharding related test facilities.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from eidangservices.federator.server.local import LocalRedis
+from eidangservices.federator.server.sharding import (
+    ShardedRedis, ShardingError, create_client, hash_slot, hash_tag)
+from eidangservices.federator.server.stats import ResponseCodeStats
+
+
+class HashSlotTestCase(unittest.TestCase):
+
+    def test_hash_slot(self):
+        # reference values taken from the Redis Cluster specification
+        self.assertEqual(hash_slot('123456789'), 0x31c3)
+        self.assertEqual(hash_slot(b'123456789'), 0x31c3)
+
+    def test_hash_tag(self):
+        self.assertEqual(hash_slot('{user1000}.following'),
+                         hash_slot('{user1000}.followers'))
+        self.assertEqual(hash_slot('foo{}{bar}'), hash_slot('foo{}{bar}'))
+        self.assertNotEqual(hash_slot('foo{}{bar}'), hash_slot('bar'))
+        self.assertEqual(hash_slot('foo{{bar}}zap'), hash_slot('{bar'))
+        self.assertEqual(hash_slot(hash_tag('tag') + ':a'), hash_slot('tag'))
+
+
+class ShardedRedisTestCase(unittest.TestCase):
+
+    NUM_SHARDS = 3
+
+    def setUp(self):
+        # local storages act as Redis stand-ins
+        self.tmpdir = tempfile.mkdtemp()
+        self.shards = [
+            LocalRedis(path=os.path.join(self.tmpdir, '{}.db'.format(i)))
+            for i in range(self.NUM_SHARDS)]
+        self.redis = ShardedRedis(self.shards)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_from_url(self):
+        urls = ','.join('local://' + shard.path for shard in self.shards)
+
+        client = create_client(urls)
+        self.assertIsInstance(client, ShardedRedis)
+        self.assertEqual([shard.path for shard in client.shards],
+                         [shard.path for shard in self.shards])
+        self.assertIsInstance(
+            create_client('local://' + self.shards[0].path), LocalRedis)
+
+    def test_distribution(self):
+        keys = ['key{}'.format(i) for i in range(100)]
+        for key in keys:
+            self.redis.set(key, key)
+
+        self.assertEqual(self.redis.dbsize(), 100)
+        for shard in self.shards:
+            self.assertGreater(shard.dbsize(), 0)
+
+        for key in keys:
+            self.assertEqual(self.redis.get_shard(key).get(key),
+                             key.encode('utf-8'))
+
+    def test_hash_tag(self):
+        tag = hash_tag('tag')
+        for i in range(10):
+            self.redis.set(tag + str(i), i)
+
+        self.assertEqual(self.redis.get_shard(tag).dbsize(), 10)
+
+    def test_multi_key(self):
+        keys = ['key{}'.format(i) for i in range(10)]
+        for key in keys[:5]:
+            self.redis.set(key, key)
+
+        self.assertEqual(self.redis.exists(*keys), 5)
+        self.assertEqual(
+            self.redis.mget(keys),
+            [k.encode('utf-8') for k in keys[:5]] + [None] * 5)
+        self.assertEqual(self.redis.delete(*keys), 5)
+        self.assertEqual(self.redis.dbsize(), 0)
+
+    def test_pipeline(self):
+        keys = ['key{}'.format(i) for i in range(10)]
+
+        pipe = self.redis.pipeline(transaction=False)
+        for i, key in enumerate(keys):
+            pipe.hincrby(key, 'field', i)
+        pipe.exists(*keys)
+
+        self.assertEqual(pipe.execute(), list(range(10)) + [10])
+
+    def test_transaction(self):
+        tag = hash_tag('tag')
+        self.redis.set(tag + 'a', 'token')
+
+        def release(pipe):
+            if pipe.get(tag + 'a') == b'token':
+                pipe.multi()
+                pipe.delete(tag + 'a')
+
+        self.redis.transaction(release, tag + 'a', tag + 'b')
+        self.assertEqual(self.redis.exists(tag + 'a'), 0)
+
+        keys = ['key{}'.format(i) for i in range(10)]
+        with self.assertRaises(ShardingError):
+            self.redis.transaction(release, *keys)
+
+    def test_response_code_stats(self):
+        urls = ['http://eida{}.example.com/fdsnws/station/1/query'.format(i)
+                for i in range(10)]
+        stats = ResponseCodeStats(self.redis, flush_interval=60,
+                                  max_staleness=0)
+        for url in urls:
+            stats.add(url, 200)
+            stats.add(url, 500)
+
+        stats.flush()
+        self.assertEqual(self.redis.dbsize(), 10)
+        self.assertEqual(stats.get_error_ratios(urls),
+                         {url: 0.5 for url in urls})
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
@@ -3,12 +3,17 @@
 Statistics related test facilities.
 """
 
+import os
+import shutil
+import tempfile
 import time
 import unittest
 
 import redis
 
-from eidangservices.federator.server.stats import ResponseCodeTimeSeries
+from eidangservices.federator.server.local import LocalRedis
+from eidangservices.federator.server.stats import (
+    ResponseCodeCounters, ResponseCodeStats, ResponseCodeTimeSeries)
 
 
 class RedisTestCase(unittest.TestCase):
@@ -16,19 +21,25 @@ class RedisTestCase(unittest.TestCase):
     db = 15
 
     def setUp(self):
-        # requires a Redis instance serving at redis://localhost:6379/
+        # uses a Redis instance serving at redis://localhost:6379/ if
+        # available, else falls back to the local (Redis-free) storage
         self.redis = redis.StrictRedis(db=self.db)
+        self._tmpdir = None
 
         try:
             if self.redis.dbsize():
                 raise EnvironmentError(
                     'Redis database number %d is not empty, tests could harm '
                     'your data.' % self.db)
-        except redis.exceptions.ConnectionError as err:
-            raise unittest.SkipTest(err)
+        except redis.exceptions.ConnectionError:
+            self._tmpdir = tempfile.mkdtemp()
+            self.redis = LocalRedis(
+                path=os.path.join(self._tmpdir, 'test.db'))
 
     def tearDown(self):
         self.redis.flushdb()
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir)
 
 
 class ResponseCodeTimeSeriesTestCase(RedisTestCase):
@@ -97,6 +108,181 @@ class ResponseCodeTimeSeriesTestCase(RedisTestCase):
         self.assertEqual(ts.error_ratio, 0.5)
 
 
+class ResponseCodeCountersTestCase(RedisTestCase):
+
+    def create_counters(self, *args, **kwargs):
+        return ResponseCodeCounters(self.redis, *args, **kwargs)
+
+    def test_init(self):
+        counters = self.create_counters()
+
+        self.assertEqual(len(counters), 0)
+        self.assertEqual(counters.error_ratio, 0)
+
+    def test_append(self):
+        counters = self.create_counters()
+
+        status_codes = [200, 500, 503, 204]
+        for c in status_codes:
+            counters.append(c)
+
+        self.assertEqual(len(counters), 4)
+        self.assertEqual(counters.error_ratio, 0.5)
+
+    def test_incr(self):
+        counters = self.create_counters()
+
+        counts = {}
+        for c in [200, 500, 503, 204, 204]:
+            counters.count(counts, c)
+
+        self.assertEqual(list(counts.values()), [[5, 2]])
+
+        pipe = self.redis.pipeline(transaction=False)
+        counters.incr(counts, pipe=pipe)
+        counters.incr(counts, pipe=pipe)
+        pipe.execute()
+
+        self.assertEqual(len(counters), 10)
+        self.assertEqual(counters.error_ratio, 0.4)
+        self.assertGreater(self.redis.ttl(counters.key), 0)
+
+    def test_ttl(self):
+        ttl = 0.2
+        counters = self.create_counters(ttl=ttl, slice=0.1)
+
+        for c in [200, 500, 503, 204]:
+            counters.append(c)
+
+        time.sleep(2 * ttl)
+        self.assertEqual(len(counters), 0)
+        self.assertEqual(counters.error_ratio, 0)
+
+    def test_window_size(self):
+        counters = self.create_counters(window_size=2, slice=0.1)
+
+        counts = {}
+        now = time.time()
+        counters.count(counts, 500, t=now - 0.2)
+        counters.count(counts, 500, t=now - 0.2)
+        counters.count(counts, 200, t=now)
+        counters.count(counts, 204, t=now)
+        counters.incr(counts)
+
+        self.assertEqual(len(counters), 4)
+        self.assertEqual(counters.error_ratio, 0)
+
+    def test_gc(self):
+        ttl = 0.4
+        counters = self.create_counters(ttl=ttl, slice=0.1)
+
+        counts = {}
+        now = time.time()
+        counters.count(counts, 500, t=now - 1)
+        counters.count(counts, 200, t=now)
+        counters.incr(counts)
+
+        self.assertEqual(self.redis.hlen(counters.key), 3)
+        counters.gc()
+        self.assertEqual(self.redis.hlen(counters.key), 1)
+        self.assertEqual(counters.error_ratio, 0)
+
+
+class ResponseCodeStatsTestCase(RedisTestCase):
+
+    URL = 'http://eida.example.com/fdsnws/station/1/query'
+
+    def create_stats(self, **kwargs):
+        return ResponseCodeStats(self.redis, prefix='test:stats', **kwargs)
+
+    def test_add_local(self):
+        stats = self.create_stats(flush_interval=60)
+
+        for c in [200, 500, 503, 204]:
+            stats.add(self.URL, c)
+
+        self.assertEqual(self.redis.dbsize(), 0)
+        self.assertEqual(stats.get_error_ratio(self.URL), 0.5)
+
+    def test_flush(self):
+        stats = self.create_stats(flush_interval=60, max_staleness=60)
+
+        for c in [200, 500, 503, 204]:
+            stats.add(self.URL, c)
+
+        stats.flush()
+        self.assertEqual(self.redis.dbsize(), 1)
+        # counters must not be accounted twice
+        self.assertEqual(stats.get_error_ratio(self.URL), 0.5)
+        self.assertEqual(
+            len(stats[stats._create_key_from_url(
+                self.URL, prefix=b'test:stats')]), 4)
+
+    def test_shared(self):
+        stats = self.create_stats(flush_interval=0, max_staleness=0)
+        other = self.create_stats(flush_interval=0, max_staleness=0)
+
+        for c in [200, 500]:
+            stats.add(self.URL, c)
+        for c in [503, 204]:
+            other.add(self.URL, c)
+
+        self.assertEqual(stats.get_error_ratio(self.URL), 0.5)
+        self.assertEqual(other.get_error_ratio(self.URL), 0.5)
+
+    def test_staleness(self):
+        stats = self.create_stats(flush_interval=0, max_staleness=60)
+        other = self.create_stats(flush_interval=0, max_staleness=0)
+
+        self.assertEqual(stats.get_error_ratio(self.URL), 0)
+        other.add(self.URL, 500)
+
+        self.assertEqual(stats.get_error_ratio(self.URL), 0)
+        self.assertEqual(other.get_error_ratio(self.URL), 1)
+
+    def test_get_error_ratios(self):
+        other_url = 'http://other.example.com/fdsnws/station/1/query'
+        stats = self.create_stats(flush_interval=60, max_staleness=60)
+
+        for c in [200, 500]:
+            stats.add(self.URL, c)
+        stats.add(other_url, 503)
+
+        self.assertEqual(self.redis.dbsize(), 0)
+        self.assertEqual(stats.get_error_ratios([self.URL, other_url]),
+                         {self.URL: 0.5, other_url: 1})
+        # pending counters are flushed within the same pipeline
+        self.assertEqual(self.redis.dbsize(), 2)
+        self.assertEqual(stats.get_error_ratios([self.URL, other_url]),
+                         {self.URL: 0.5, other_url: 1})
+
+    def test_get_error_ratios_gc(self):
+        stats = self.create_stats(flush_interval=0, max_staleness=0,
+                                  ttl=0.4, slice=0.1)
+
+        key = stats._create_key_from_url(self.URL, prefix=b'test:stats')
+        counters = ResponseCodeCounters(self.redis, key=key, ttl=0.4,
+                                        slice=0.1)
+        counts = {}
+        now = time.time()
+        counters.count(counts, 500, t=now - 1)
+        counters.count(counts, 200, t=now)
+        counters.incr(counts)
+
+        self.assertEqual(stats.get_error_ratios([self.URL]), {self.URL: 0})
+        stats.flush()
+        self.assertEqual(self.redis.hlen(key), 1)
+
+    def test_clear(self):
+        stats = self.create_stats(flush_interval=0)
+
+        stats.add(self.URL, 500)
+        stats.clear(self.URL)
+
+        self.assertEqual(self.redis.dbsize(), 0)
+        self.assertEqual(stats.get_error_ratio(self.URL), 0)
+
+
 # -----------------------------------------------------------------------------
 if __name__ == '__main__':
     unittest.main()
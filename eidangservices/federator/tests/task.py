@@ -7,6 +7,7 @@ import datetime
 import io
 import json
 import os
+import shutil
 import tempfile
 import unittest
 
@@ -15,9 +16,12 @@ from unittest import mock
 from lxml import etree
 
 from eidangservices import settings
+from eidangservices.federator.server import cache, wfcatalog_cache
+from eidangservices.federator.server.request import (
+    GranularFdsnRequestHandler)
 from eidangservices.federator.server.task import (
     ETask, StationXMLNetworkCombinerTask, SplitAndAlignTask,
-    WFCatalogSplitAndAlignTask, Result)
+    WFCatalogDocumentDownloadTask, WFCatalogSplitAndAlignTask, Result)
 from eidangservices.utils import Route
 from eidangservices.utils.request import RequestsError
 from eidangservices.utils.sncl import Stream, StreamEpoch
@@ -179,6 +183,131 @@ class StationXMLNetworkCombinerTaskTestCase(unittest.TestCase):
         self.assertEqual(self.serialize_net_elements(t), reference_xml)
         mock_max_threads.has_calls()
 
+    def test_fragment(self):
+        cache_dir = tempfile.mkdtemp()
+        cache.init_cache(config={'CACHE_TYPE': 'fs',
+                                 'CACHE_KWARGS': {'cache_dir': cache_dir}})
+        self.addCleanup(shutil.rmtree, cache_dir)
+        self.addCleanup(cache.init_cache, config={})
+
+        route = Route(url='http://eida.ethz.ch/fdsnws/station/1/query',
+                      streams=[StreamEpoch(
+                          Stream(network='CH', station='DAVOX', location='',
+                                 channel='HHZ'),
+                          starttime=datetime.datetime(2018, 1, 1),
+                          endtime=datetime.datetime(2018, 1, 2))])
+
+        davox_xml = b'<Network xmlns="http://www.fdsn.org/xml/station/1" code="CH" startDate="1980-01-01T00:00:00" restrictedStatus="open"><Description>National Seismic Networks of Switzerland</Description><Station code="DAVOX" startDate="2002-07-24T00:00:00" restrictedStatus="open"><Latitude>46.7805</Latitude><Longitude>9.87952</Longitude><Elevation>1830</Elevation><Site><Name>Davos, Dischmatal, GR</Name><Country>Switzerland</Country></Site><CreationDate>2002-07-24T00:00:00</CreationDate></Station></Network>'  # noqa
+
+        t = self.create_task([route], {'format': 'xml', 'level': 'station'})
+        fragment_key = t._make_fragment_key(route)
+        t._dump_fragment(fragment_key, [etree.fromstring(davox_xml)])
+
+        fragment, found = t.get_cache(fragment_key, record_stats=False)
+        self.assertTrue(found)
+        self.assertEqual(
+            [etree.tostring(e) for e in t._load_fragment(fragment)],
+            [davox_xml])
+
+        # fragments are keyed by level
+        t = self.create_task([route], {'format': 'xml', 'level': 'channel'})
+        self.assertNotEqual(t._make_fragment_key(route), fragment_key)
+
+
+# -----------------------------------------------------------------------------
+# Download task related test cases
+class WFCatalogDocumentDownloadTaskTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        wfcatalog_cache.init_cache(
+            config={'CACHE_TYPE': 'fs',
+                    'CACHE_KWARGS': {'cache_dir': self.cache_dir}})
+
+        self.stream = Stream(network='CH', station='DAVOX', location='',
+                             channel='LHZ')
+        self.url = 'http://eida.ethz.ch/eidaws/wfcatalog/1/query'
+        self.requested = []
+
+    def tearDown(self):
+        wfcatalog_cache.init_cache(config={})
+        shutil.rmtree(self.cache_dir)
+
+    def create_task(self, starttime, endtime):
+        return WFCatalogDocumentDownloadTask(
+            GranularFdsnRequestHandler(
+                self.url, StreamEpoch(self.stream, starttime, endtime),
+                query_params={'include': 'default'}),
+            http_method='GET', retry_budget_client=100)
+
+    @staticmethod
+    def create_doc(day):
+        return {'network': 'CH', 'station': 'DAVOX', 'location': '',
+                'channel': 'LHZ',
+                'start_time': day.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                'end_time': (day + datetime.timedelta(days=1)).strftime(
+                    '%Y-%m-%dT%H:%M:%S.000Z')}
+
+    def stream_request(self, req, **kwargs):
+        params = req.keywords['params']
+        starttime = datetime.datetime.strptime(
+            params['starttime'][:10], '%Y-%m-%d')
+        endtime = datetime.datetime.strptime(
+            params['endtime'][:10], '%Y-%m-%d')
+        self.requested.append((starttime, endtime))
+
+        docs = []
+        while starttime < endtime:
+            docs.append(self.create_doc(starttime))
+            starttime += datetime.timedelta(days=1)
+
+        yield json.dumps(docs).encode('utf-8')
+
+    def run_task(self, starttime, endtime):
+        t = self.create_task(starttime, endtime)
+        with mock.patch.object(
+                WFCatalogDocumentDownloadTask,
+                'get_cretry_budget_error_ratio', return_value=0), \
+            mock.patch.object(
+                WFCatalogDocumentDownloadTask, 'update_cretry_budget'), \
+            mock.patch(
+                'eidangservices.federator.server.task.stream_request',
+                side_effect=self.stream_request):
+            result = t()
+
+        self.assertEqual(result.status_code, 200)
+        with open(result.data, 'r') as ifd:
+            docs = json.load(ifd)
+        os.remove(result.data)
+        return docs
+
+    def test_documents(self):
+        days = [datetime.datetime(2018, 1, i) for i in range(1, 6)]
+
+        self.assertEqual(self.run_task(days[0], days[3]),
+                         [self.create_doc(day) for day in days[:3]])
+        self.assertEqual(self.requested, [(days[0], days[3])])
+
+        # overlapping request fetching the missing day, only
+        self.requested = []
+        self.assertEqual(self.run_task(days[1], days[4]),
+                         [self.create_doc(day) for day in days[1:4]])
+        self.assertEqual(self.requested, [(days[3], days[4])])
+
+        self.requested = []
+        self.assertEqual(self.run_task(days[0], days[4]),
+                         [self.create_doc(day) for day in days[:4]])
+        self.assertEqual(self.requested, [])
+
+    def test_current_day(self):
+        today = datetime.datetime.combine(datetime.datetime.utcnow().date(),
+                                          datetime.time())
+        starttime = today - datetime.timedelta(days=1)
+
+        for _ in range(2):
+            self.run_task(starttime, today)
+        self.assertEqual(self.requested, [(starttime, today)] * 2)
+
 
 # -----------------------------------------------------------------------------
 # SplitAndAlign task related test cases
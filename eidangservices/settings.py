@@ -513,6 +513,10 @@ EIDA_WFCATALOG_PATH = '/eidaws/wfcatalog/1/'
 EIDA_WFCATALOG_WADL_FILENAME = 'wfcatalog.wadl'
 
 EIDA_ROUTING_PATH = '/eidaws/routing/1/'
+# method token of the routing generation resource
+EIDA_ROUTING_GENERATION_METHOD_TOKEN = 'generation'
+
+EIDA_FEDERATOR_CACHE_METRICS_PATH = '/eidaws/federator/cache/metrics'
 
 # -----------------------------------------------------------------------------
 # EIDA NG webservice specific
@@ -521,6 +525,7 @@ MIMETYPE_MSEED = 'application/vnd.fdsn.mseed'
 MIMETYPE_TEXT = 'text/plain'
 MIMETYPE_JSON = 'application/json'
 MIMETYPE_XML = 'application/xml'
+MIMETYPE_OCTET_STREAM = 'application/octet-stream'
 
 DATASELECT_MIMETYPE = MIMETYPE_MSEED
 STATION_MIMETYPE_XML = MIMETYPE_XML
@@ -542,6 +547,9 @@ STATIONXML_ELEMENT_CHANNEL = 'Channel'
 # max bytes allowed for post requests
 MAX_POST_CONTENT_LENGTH = 1024 * 1024
 
+# max number of memoised FDSNWS datetime strings
+FDSNWS_DATETIME_CACHE_SIZE = 4096
+
 # -----------------------------------------------------------------------------
 # Federator configuration parameters
 
@@ -556,6 +564,8 @@ EIDA_FEDERATOR_DEFAULT_ROUTING_URL = \
 # default storage (Redis) URL
 EIDA_FEDERATOR_DEFAULT_STORAGE_URL = \
     'redis://localhost:6379/0'
+# filename of the local (Redis-free) storage database file
+EIDA_FEDERATOR_LOCAL_STORAGE_FILENAME = 'eida-federator.db'
 # default federator endpoint resources
 EIDA_FEDERATOR_DEFAULT_RESOURCES = (
     'fdsnws-dataselect', 'fdsnws-station', 'eidaws-wfcatalog')
@@ -632,11 +642,64 @@ EIDA_FEDERATOR_RESOURCE_CONFIG = {
     }
 }
 
+# default timeout in seconds of a cache lease used for single-flight cache
+# population; a value of 0 disables single-flight cache population
+EIDA_FEDERATOR_DEFAULT_CACHE_LEASE_TIMEOUT = 120
+# interval in seconds requests are polling for a cache key populated by a
+# concurrent request
+EIDA_FEDERATOR_CACHE_LEASE_POLL_INTERVAL = 0.1
+# default granularity in seconds open endtimes are bucketed to when creating
+# cache keys; endtimes within the current bucket are treated as open
+EIDA_FEDERATOR_DEFAULT_CACHE_KEY_ENDTIME_GRANULARITY = 3600
+# default maximum size in bytes of a single cache entry; a value of 0
+# indicates no limit
+EIDA_FEDERATOR_DEFAULT_CACHE_MAX_ENTRY_SIZE = 0
+# default number of lookups (within the frequency sketch's sample period)
+# required before an entry is admitted to the cache; a value of 0 disables
+# frequency based cache admission
+EIDA_FEDERATOR_DEFAULT_CACHE_ADMISSION_MIN_FREQUENCY = 0
+
 EIDA_FEDERATOR_CACHE_CONFIG = {
     'CACHE_TYPE': 'null',
     'CACHE_KWARGS': {},
+    'CACHE_LEASE_TIMEOUT': EIDA_FEDERATOR_DEFAULT_CACHE_LEASE_TIMEOUT,
+    'CACHE_KEY_ENDTIME_GRANULARITY':
+    EIDA_FEDERATOR_DEFAULT_CACHE_KEY_ENDTIME_GRANULARITY,
+    'CACHE_MAX_ENTRY_SIZE': EIDA_FEDERATOR_DEFAULT_CACHE_MAX_ENTRY_SIZE,
+    'CACHE_ADMISSION_MIN_FREQUENCY':
+    EIDA_FEDERATOR_DEFAULT_CACHE_ADMISSION_MIN_FREQUENCY,
 }
 
+# default disk quota in bytes of the fdsnws-dataselect miniSEED tile cache
+EIDA_FEDERATOR_DEFAULT_TILE_CACHE_QUOTA = 10 * 1024**3
+# default minimum age in seconds of a tile's end before the tile is cached
+EIDA_FEDERATOR_DEFAULT_TILE_CACHE_MIN_AGE = 86400
+# minimum age in seconds of a day's end before the corresponding WFCatalog
+# documents are considered as final
+EIDA_FEDERATOR_WFCATALOG_CACHE_MIN_AGE = 86400
+
+# TTL in seconds of the request parameters of a tracked station query
+EIDA_FEDERATOR_CACHE_WARMER_QUERY_TTL = 86400
+# default number of most popular station queries refreshed by the cache warmer
+EIDA_FEDERATOR_DEFAULT_CACHE_WARMER_NUM_QUERIES = 100
+# default interval in seconds between two cache warmer runs
+EIDA_FEDERATOR_DEFAULT_CACHE_WARMER_INTERVAL = 60
+# default time in seconds before expiry a cache entry is refreshed
+EIDA_FEDERATOR_DEFAULT_CACHE_WARMER_REFRESH_AHEAD = 300
+# default number of station queries refreshed concurrently
+EIDA_FEDERATOR_DEFAULT_CACHE_WARMER_CONCURRENCY = 2
+# interval in seconds popularity scores of tracked station queries are halved
+EIDA_FEDERATOR_CACHE_WARMER_AGING_INTERVAL = 3600
+# formats routing information may be requested with from StationLite
+EIDA_FEDERATOR_ROUTING_FORMATS = ('post', 'binary')
+# maximum number of routing tables cached (per process)
+EIDA_FEDERATOR_ROUTING_CACHE_MAX_ENTRIES = 1024
+# interval in seconds the routing generation token is checked
+EIDA_FEDERATOR_ROUTING_CACHE_GENERATION_INTERVAL = 10
+# maximum number of routing requests issued concurrently when routing a
+# sharded request
+EIDA_FEDERATOR_ROUTING_SHARD_CONCURRENCY = 4
+
 EIDA_FEDERATOR_REQUEST_STRATEGIES = (
     'granular',
     'bulk',
@@ -650,6 +713,10 @@ EIDA_FEDERATOR_DEFAULT_RETRY_BUDGET_CLIENT = 1.0
 EIDA_FEDERATOR_DEFAULT_RETRY_BUDGET_CLIENT_TTL = 1800
 # default rolling window size with respect to response code time series
 EIDA_FEDERATOR_DEFAULT_RETRY_BUDGET_CLIENT_WSIZE = 4096
+# interval in seconds locally aggregated response codes are flushed to Redis
+EIDA_FEDERATOR_RETRY_BUDGET_CLIENT_FLUSH_INTERVAL = 1
+# maximum age in seconds of locally cached response code statistics
+EIDA_FEDERATOR_RETRY_BUDGET_CLIENT_MAX_STALENESS = 1
 
 EIDA_FEDERATOR_SHARE_DIR = FDSN_WADL_DIR
 EIDA_FEDERATOR_APP_SHARE = os.path.join(APP_ROOT, EIDA_FEDERATOR_SERVICE_ID,
@@ -4,8 +4,11 @@ DB query tools for stationlite web service.
 """
 
 import collections
+import hashlib
 import logging
 
+from sqlalchemy import func
+
 from eidangservices import utils, settings
 from eidangservices.utils.sncl import (
     StreamEpoch, StreamEpochs, StreamEpochsHandler, none_as_max)
@@ -17,6 +20,27 @@ logger = logging.getLogger('flask.app.stationlite.dbquery')
 
 
 # ----------------------------------------------------------------------------
+def find_generation(session):
+    """
+    Compute a token identifying the current generation of the routing
+    information. The token changes whenever routing information is harvested
+    or removed.
+
+    :param session: SQLAlchemy session
+    :type session: :py:class:`sqlalchemy.orm.session.Session`
+
+    :returns: Generation token
+    :rtype: str
+    """
+    values = []
+    for model in (orm.Routing, orm.StreamEpoch):
+        values.extend(
+            session.query(func.max(model.lastseen), func.count(model.id)).
+            one())
+
+    return hashlib.sha1(repr(values).encode('utf-8')).hexdigest()
+
+
 def resolve_vnetwork(session, stream_epoch, like_escape='/'):
     """
     Resolve a stream epoch regarding virtual networks.
@@ -108,6 +132,36 @@ def find_streamepochs_and_routes(session, stream_epoch, service,
     :return: List of :py:class:`~eidangservices.utils.Route` objects
     :rtype: list
     """
+    return find_streamepochs_and_routes_by_service(
+        session, stream_epoch, [service], level=level, access=access,
+        minlat=minlat, maxlat=maxlat, minlon=minlon, maxlon=maxlon,
+        like_escape=like_escape)[service]
+
+
+def find_streamepochs_and_routes_by_service(
+        session, stream_epoch, services, level='channel', access='any',
+        minlat=-90., maxlat=90., minlon=-180., maxlon=180., like_escape='/'):
+    """
+    Return routes for a given stream epoch grouped by service. Routes for
+    all services are looked up by means of a single database query.
+
+    :param session: SQLAlchemy session
+    :type session: :py:class:`sqlalchemy.orm.session.Session`
+    :param stream_epoch: StreamEpoch the database query is performed with
+    :type stream_epoch: :py:class:`~eidangservices.utils.sncl.StreamEpoch`
+    :param list services: List of strings specifying the webservices
+    :param str level: Optional `fdsnws-station` *level* parameter; The
+        parameter is only taken into consideration for the :code:`station`
+        service
+    :param str access: Optional access parameter; The parameter is only taken
+        into consideration for the :code:`dataselect` service
+
+    See :py:func:`find_streamepochs_and_routes` for the remaining parameters.
+
+    :return: Dictionary with lists of :py:class:`~eidangservices.utils.Route`
+        objects by service
+    :rtype: dict
+    """
     VALID_ACCESS = ('open', 'closed', 'any')
 
     if access not in VALID_ACCESS:
@@ -129,7 +183,8 @@ def find_streamepochs_and_routes(session, stream_epoch, service,
                           orm.Station.code,
                           orm.Routing.starttime,
                           orm.Routing.endtime,
-                          orm.Endpoint.url).\
+                          orm.Endpoint.url,
+                          orm.Service.name).\
         join(orm.Routing,
              orm.Routing.channel_epoch_ref == orm.ChannelEpoch.id).\
         join(orm.Endpoint,
@@ -147,7 +202,7 @@ def find_streamepochs_and_routes(session, stream_epoch, service,
                (orm.StationEpoch.longitude <= maxlon)).\
         filter(orm.ChannelEpoch.code.like(cha, escape=like_escape)).\
         filter(orm.ChannelEpoch.locationcode.like(loc, escape=like_escape)).\
-        filter(orm.Service.name == service)
+        filter(orm.Service.name.in_(services))
 
     if sql_stream_epoch.starttime:
         # NOTE(damb): compare to None for undefined endtime (i.e. device
@@ -159,11 +214,13 @@ def find_streamepochs_and_routes(session, stream_epoch, service,
         query = query.\
             filter(orm.ChannelEpoch.starttime < sql_stream_epoch.endtime)
 
-    if access != 'any' and service == 'dataselect':
+    if access != 'any' and 'dataselect' in services:
         query = query.\
-            filter(orm.ChannelEpoch.restrictedstatus == access)
+            filter((orm.Service.name != 'dataselect') |
+                   (orm.ChannelEpoch.restrictedstatus == access))
 
-    routes = collections.defaultdict(StreamEpochsHandler)
+    routes = dict((service, collections.defaultdict(StreamEpochsHandler))
+                  for service in services)
 
     for row in query.all():
         # print('Query response: {0!r}'.format(row))
@@ -189,10 +246,11 @@ def find_streamepochs_and_routes(session, stream_epoch, service,
         cha = row[0]
 
         # NOTE(damb): level reduction
-        if level == 'network':
-            sta = loc = cha = '*'
-        elif level == 'station':
-            loc = cha = '*'
+        if len(services) == 1 or row[9] == 'station':
+            if level == 'network':
+                sta = loc = cha = '*'
+            elif level == 'station':
+                loc = cha = '*'
 
         # NOTE(damb): Set endtime to 'max' if undefined (i.e. device currently
         # acquiring data).
@@ -205,7 +263,125 @@ def find_streamepochs_and_routes(session, stream_epoch, service,
                 starttime=starttime,
                 endtime=end)
 
-            routes[row[8]].add(stream_epoch)
+            routes[row[9]][row[8]].add(stream_epoch)
+
+    return dict(
+        (service, [utils.Route(url=url, streams=streams)
+                   for url, streams in _routes.items()])
+        for service, _routes in routes.items())
+
+
+def find_routes(session, stream_epochs, service, level='channel',
+                access='any', minlat=-90., maxlat=90., minlon=-180.,
+                maxlon=180.):
+    """
+    Return the merged and sorted routes for a list of stream epochs. Virtual
+    networks are resolved.
+
+    :param session: SQLAlchemy session
+    :type session: :py:class:`sqlalchemy.orm.session.Session`
+    :param list stream_epochs: List of
+        :py:class:`~eidangservices.utils.sncl.StreamEpoch` objects to be
+        routed
+    :param str service: String specifying the webservice
+
+    See :py:func:`find_streamepochs_and_routes` for the remaining parameters.
+
+    :return: Sorted list of :py:class:`~eidangservices.utils.Route` objects
+    :rtype: list
+    """
+    return find_routes_by_service(
+        session, stream_epochs, [service], level=level, access=access,
+        minlat=minlat, maxlat=maxlat, minlon=minlon, maxlon=maxlon)[service]
+
+
+def find_routes_by_service(session, stream_epochs, services, level='channel',
+                           access='any', minlat=-90., maxlat=90.,
+                           minlon=-180., maxlon=180.):
+    """
+    Return the merged and sorted routes for a list of stream epochs grouped
+    by service. Virtual networks are resolved. Routes for all services are
+    looked up by means of a single database query per stream epoch.
+
+    :param session: SQLAlchemy session
+    :type session: :py:class:`sqlalchemy.orm.session.Session`
+    :param list stream_epochs: List of
+        :py:class:`~eidangservices.utils.sncl.StreamEpoch` objects to be
+        routed
+    :param list services: List of strings specifying the webservices
+
+    See :py:func:`find_streamepochs_and_routes_by_service` for the remaining
+    parameters.
 
-    return [utils.Route(url=url, streams=streams)
-            for url, streams in routes.items()]
+    :return: Dictionary with sorted lists of
+        :py:class:`~eidangservices.utils.Route` objects by service
+    :rtype: dict
+    """
+    stream_epochs = list(stream_epochs)
+
+    # resolve virtual network stream epochs
+    vnet_stream_epochs = []
+    for stream_epoch in stream_epochs:
+        logger.debug('Resolving {0!r} regarding VNET.'.format(stream_epoch))
+        vnet_stream_epochs.extend(resolve_vnetwork(session, stream_epoch))
+
+    logger.debug('Stream epochs from VNETs: {0!r}'.format(vnet_stream_epochs))
+
+    stream_epochs.extend(vnet_stream_epochs)
+
+    # collect results for each stream epoch
+    routes = dict((service, []) for service in services)
+    for stream_epoch in stream_epochs:
+        logger.debug('Processing request for %r' % (stream_epoch,))
+        # query
+        _routes = find_streamepochs_and_routes_by_service(
+            session, stream_epoch, services, level=level, access=access,
+            minlat=minlat, maxlat=maxlat, minlon=minlon, maxlon=maxlon)
+
+        for service, service_routes in _routes.items():
+            # adjust stream epochs regarding time constraints
+            for url, streams in service_routes:
+                streams.modify_with_temporal_constraints(
+                    start=stream_epoch.starttime,
+                    end=stream_epoch.endtime)
+
+            routes[service].extend(service_routes)
+
+    logger.debug('StationLite routes: %s' % routes)
+
+    return dict(
+        (service, _merge_routes(
+            service_routes,
+            level=(level if len(services) == 1 or service == 'station'
+                   else 'channel')))
+        for service, service_routes in routes.items())
+
+
+def _merge_routes(routes, level='channel'):
+    """
+    Merge and sort routes.
+    """
+    # merge stream epochs for each route
+    merged_routes = collections.defaultdict(StreamEpochsHandler)
+    for url, stream_epochs in routes:
+        merged_routes[url].merge(stream_epochs)
+
+    logger.debug('StationLite routes (merged): %r' % merged_routes)
+
+    for url, stream_epochs in merged_routes.items():
+        if level in ('network', 'station'):
+            merged_routes[url] = [StreamEpoch.from_streamepochs(ses)
+                                  for ses in stream_epochs]
+        else:
+            merged_routes[url] = [se for ses in stream_epochs
+                                  for se in ses]
+
+    # sort response
+    routes = [utils.Route(url=url,
+                          streams=sorted(stream_epochs))
+              for url, stream_epochs in merged_routes.items()]
+
+    # sort additionally by url
+    routes.sort()
+
+    return routes
@@ -17,8 +17,9 @@ from eidangservices.stationlite.engine.db import configure_sqlite
 from eidangservices.stationlite.server import create_app
 from eidangservices.stationlite.server.routes.stationlite import \
     StationLiteResource
-from eidangservices.stationlite.server.routes.misc import \
-    StationLiteVersionResource, StationLiteWadlResource
+from eidangservices.stationlite.server.routes.misc import (
+    StationLiteGenerationResource, StationLiteVersionResource,
+    StationLiteWadlResource)
 from eidangservices.utils.app import CustomParser, App, AppError
 from eidangservices.utils.error import Error, ErrorWithTraceback, ExitCodes
 
@@ -138,6 +139,11 @@ class StationLiteWebserviceBase(App):
                          (settings.EIDA_ROUTING_PATH,
                           settings.FDSN_WADL_METHOD_TOKEN))
 
+        # generation method
+        api.add_resource(StationLiteGenerationResource, "%s%s" %
+                         (settings.EIDA_ROUTING_PATH,
+                          settings.EIDA_ROUTING_GENERATION_METHOD_TOKEN))
+
         app = create_app(config_dict=app_config)
         api.init_app(app)
         return app
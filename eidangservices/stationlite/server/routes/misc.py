@@ -11,6 +11,8 @@ from flask_restful import Resource
 
 from eidangservices import settings, utils
 from eidangservices.stationlite import __version__
+from eidangservices.stationlite.engine import dbquery
+from eidangservices.stationlite.server import db
 
 
 class StationLiteVersionResource(Resource):
@@ -45,3 +47,20 @@ class StationLiteWadlResource(Resource):
     def post(self):
         return make_response(self.wadl, 200,
                              {'Content-Type': settings.WADL_MIMETYPE})
+
+
+class StationLiteGenerationResource(Resource):
+    """
+    Generation token of the routing information for StationLite. Clients may
+    use the token in order to invalidate cached routing information.
+    """
+
+    def get(self):
+        return self._generation_response()
+
+    def post(self):
+        return self._generation_response()
+
+    def _generation_response(self):
+        return make_response(dbquery.find_generation(db.session), 200,
+                             {'Content-Type': settings.MIMETYPE_TEXT})
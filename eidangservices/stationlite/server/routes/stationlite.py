@@ -3,7 +3,6 @@
 Implementation of a *StationLite* resource.
 """
 
-import collections
 import logging
 
 from flask import request
@@ -11,17 +10,17 @@ from flask_restful import Resource
 from webargs.flaskparser import use_args
 
 import eidangservices as eidangws
-from eidangservices import settings, utils
+from eidangservices import settings
 from eidangservices.utils import fdsnws
 from eidangservices.utils.httperrors import FDSNHTTPError
 from eidangservices.utils.strict import with_strict_args
-from eidangservices.utils.sncl import StreamEpochsHandler, StreamEpoch
 
 from eidangservices.stationlite import __version__
 from eidangservices.stationlite import misc
 from eidangservices.stationlite.engine import dbquery
 from eidangservices.stationlite.server import db, schema
-from eidangservices.stationlite.server.stream import OutputStream
+from eidangservices.stationlite.server.stream import (
+    OutputStream, MultiServicePostStream)
 
 
 class StationLiteResource(Resource):
@@ -53,14 +52,14 @@ class StationLiteResource(Resource):
         self.logger.debug('StationLiteSchema: %s' % args)
         self.logger.info('StreamEpoch objects: %s' % stream_epochs)
 
-        response = self._process_request(
+        ostream = self._process_request(
             args, stream_epochs,
             netloc_proxy=args['proxynetloc'])
 
-        if not response:
+        if not ostream.routes:
             self._handle_nodata(args)
 
-        return misc.get_response(response, settings.MIMETYPE_TEXT)
+        return misc.get_response(ostream.render(), ostream.MIMETYPE)
 
     @fdsnws.use_fdsnws_args(schema.StationLiteSchema(), locations=('form',))
     @fdsnws.use_fdsnws_kwargs(
@@ -80,14 +79,14 @@ class StationLiteResource(Resource):
         self.logger.debug('StationLiteSchema: %s' % args)
         self.logger.info('StreamEpoch objects: %s' % stream_epochs)
 
-        response = self._process_request(
+        ostream = self._process_request(
             args, stream_epochs,
             netloc_proxy=args['proxynetloc'])
 
-        if not response:
+        if not ostream.routes:
             self._handle_nodata(args)
 
-        return misc.get_response(response, settings.MIMETYPE_TEXT)
+        return misc.get_response(ostream.render(), ostream.MIMETYPE)
 
     def _handle_nodata(self, args):
         raise FDSNHTTPError.create(
@@ -97,64 +96,26 @@ class StationLiteResource(Resource):
 
     def _process_request(
             self, args, stream_epochs, netloc_proxy=None):
-        # resolve virtual network stream epochs
-        vnet_stream_epochs = []
-        for stream_epoch in stream_epochs:
-            self.logger.debug(
-                'Resolving {0!r} regarding VNET.'.format(stream_epoch))
-            vnet_stream_epochs.extend(
-                dbquery.resolve_vnetwork(db.session, stream_epoch))
-
-        self.logger.debug('Stream epochs from VNETs: '
-                          '{0!r}'.format(vnet_stream_epochs))
-
-        stream_epochs.extend(vnet_stream_epochs)
-
-        # collect results for each stream epoch
-        routes = []
-        for stream_epoch in stream_epochs:
-            self.logger.debug('Processing request for %r' % (stream_epoch,))
-            # query
-            _routes = dbquery.find_streamepochs_and_routes(
-                db.session, stream_epoch, args['service'],
+        services = schema.split_services(args['service'])
+        if len(services) > 1:
+            routes = dbquery.find_routes_by_service(
+                db.session, stream_epochs, services,
                 level=args['level'], access=args['access'],
                 minlat=args['minlatitude'],
                 maxlat=args['maxlatitude'],
                 minlon=args['minlongitude'],
                 maxlon=args['maxlongitude'])
 
-            # adjust stream epochs regarding time constraints
-            for url, streams in _routes:
-                streams.modify_with_temporal_constraints(
-                    start=stream_epoch.starttime,
-                    end=stream_epoch.endtime)
+            return MultiServicePostStream(
+                routes=routes, netloc_proxy=netloc_proxy)
 
-            routes.extend(_routes)
+        routes = dbquery.find_routes(
+            db.session, stream_epochs, args['service'],
+            level=args['level'], access=args['access'],
+            minlat=args['minlatitude'],
+            maxlat=args['maxlatitude'],
+            minlon=args['minlongitude'],
+            maxlon=args['maxlongitude'])
 
-        self.logger.debug('StationLite routes: %s' % routes)
-        # merge stream epochs for each route
-        merged_routes = collections.defaultdict(StreamEpochsHandler)
-        for url, stream_epochs in routes:
-            merged_routes[url].merge(stream_epochs)
-
-        self.logger.debug('StationLite routes (merged): %r' % merged_routes)
-
-        for url, stream_epochs in merged_routes.items():
-            if args['level'] in ('network', 'station'):
-                merged_routes[url] = [StreamEpoch.from_streamepochs(ses)
-                                      for ses in stream_epochs]
-            else:
-                merged_routes[url] = [se for ses in stream_epochs
-                                      for se in ses]
-
-        # sort response
-        routes = [utils.Route(url=url,
-                              streams=sorted(stream_epochs))
-                  for url, stream_epochs in merged_routes.items()]
-
-        # sort additionally by url
-        routes.sort()
-
-        ostream = OutputStream.create(
+        return OutputStream.create(
             args['format'], routes=routes, netloc_proxy=netloc_proxy)
-        return str(ostream)
@@ -12,6 +12,35 @@ from eidangservices.utils.schema import (FDSNWSBool, Latitude, Longitude,
                                          NoData)
 
 
+SERVICES = ('dataselect', 'station', 'wfcatalog')
+SERVICE_SEPARATOR = ','
+
+
+def split_services(value):
+    """
+    Split a (comma-separated) ``service`` parameter value.
+
+    :param str value: Value to be split
+    :rtype: list
+    """
+    return value.split(SERVICE_SEPARATOR)
+
+
+def validate_service(value):
+    """
+    Validate a (comma-separated) ``service`` parameter value.
+    """
+    services = split_services(value)
+    for service in services:
+        if service not in SERVICES:
+            raise ValidationError(
+                'Invalid service: {!r} (choose from: {}).'.format(
+                    service, ', '.join(SERVICES)))
+
+    if len(set(services)) != len(services):
+        raise ValidationError('Duplicate service: {!r}.'.format(value))
+
+
 # ----------------------------------------------------------------------------
 class StationLiteSchema(Schema):
     """
@@ -25,10 +54,11 @@ class StationLiteSchema(Schema):
         # missing='xml'
         missing='post',
         # validate=validate.OneOf(['xml', 'json', 'get', 'post'])
-        validate=validate.OneOf(['post', 'get']))
+        validate=validate.OneOf(['post', 'get', 'binary']))
+    # NOTE: multiple services may be specified as a comma-separated list
     service = fields.Str(
         missing='dataselect',
-        validate=validate.OneOf(['dataselect', 'station', 'wfcatalog']))
+        validate=validate_service)
 
     nodata = NoData()
     alternative = FDSNWSBool(missing='false')
@@ -109,17 +139,26 @@ class StationLiteSchema(Schema):
 
     @validates_schema
     def validate_level(self, data, **kwargs):
-        if (data['level'] != 'channel' and data['service'] != 'station'):
+        if (data['level'] != 'channel' and
+                'station' not in split_services(data['service'])):
             raise ValidationError(
                 "Bad Request: Invalid 'level' value {!r} for service "
                 "{!r}.".format(data['level'], data['service']))
 
     @validates_schema
     def validate_access(self, data, **kwargs):
-        if (data['access'] != 'any' and data['service'] != 'dataselect'):
+        if (data['access'] != 'any' and
+                'dataselect' not in split_services(data['service'])):
             raise ValidationError(
                 "Bad Request: Invalid 'access' value {!r} for service "
                 "{!r}".format(data['access'], data['service']))
 
+    @validates_schema
+    def validate_multiple_services(self, data, **kwargs):
+        if (len(split_services(data['service'])) > 1 and
+                data['format'] != 'post'):
+            raise ValidationError(
+                "Bad Request: Multiple services require 'format=post'.")
+
     class Meta:
         strict = True
@@ -3,10 +3,15 @@
 StationLite output format facilities.
 """
 
+import datetime
+
 from urllib.parse import urlsplit, urlunsplit
 
 import eidangservices as eidangws
 
+from eidangservices import settings, utils
+from eidangservices.utils import binroute
+
 
 class OutputStream:
     """
@@ -15,6 +20,8 @@ class OutputStream:
     :param list routes: List of :py:class:`eidangservices.utils.Route` objects
     :param str netloc_proxy: Network location of a proxy
     """
+    MIMETYPE = settings.MIMETYPE_TEXT
+
     def __init__(self, routes=[], **kwargs):
         self.routes = routes
 
@@ -26,6 +33,8 @@ class OutputStream:
             return PostStream(**kwargs)
         elif format == 'get':
             return GetStream(**kwargs)
+        elif format == 'binary':
+            return BinaryStream(**kwargs)
         else:
             raise KeyError('Invalid output format chosen.')
 
@@ -37,6 +46,14 @@ class OutputStream:
         parsed_url['netloc'] = self._netloc_proxy
         return urlunsplit(parsed_url.values())
 
+    def render(self):
+        """
+        Render the output stream.
+
+        :rtype: str or bytes
+        """
+        return str(self)
+
     def __str__(self):
         raise NotImplementedError
 
@@ -66,6 +83,45 @@ class PostStream(OutputStream):
         return '\n'.join(lines)
 
 
+class MultiServicePostStream(OutputStream):
+    """
+    StationLite output stream for `format=post` if routes for multiple
+    services are requested. The routes of each service are preceded by a
+    ``service=<name>`` section header line, e.g.
+
+    .. code::
+
+        service=station
+        http://eida.ethz.ch/fdsnws/station/1/query
+        CH DAVOX -- HHZ 2004-02-20T00:00:00
+
+        service=dataselect
+        http://eida.ethz.ch/fdsnws/dataselect/1/query
+        CH DAVOX -- HHZ 2004-02-20T00:00:00
+
+    :param dict routes: Dictionary with lists of
+        :py:class:`eidangservices.utils.Route` objects by service. Services
+        without routes are omitted.
+    """
+    SECTION_HEADER = 'service={}'
+
+    def __init__(self, routes={}, **kwargs):
+        super().__init__(
+            routes=dict((service, service_routes)
+                        for service, service_routes in routes.items()
+                        if service_routes),
+            **kwargs)
+
+    def __str__(self):
+        sections = []
+        for service, routes in self.routes.items():
+            sections.append(self.SECTION_HEADER.format(service))
+            sections.append(str(PostStream(
+                routes=routes, netloc_proxy=self._netloc_proxy)))
+
+        return '\n'.join(sections)
+
+
 class GetStream(OutputStream):
     """
     StationLite output stream for `format=post`.
@@ -89,3 +145,40 @@ class GetStream(OutputStream):
                          for se in stream_epoch_lst)
 
         return ''.join(lines)
+
+
+class BinaryStream(OutputStream):
+    """
+    StationLite output stream for `format=binary` (see
+    :py:mod:`eidangservices.utils.binroute`).
+
+    Stream epochs are encoded with the same semantics as for `format=post`
+    i.e. empty location codes are encoded as ``--`` and endtimes equal to
+    :py:obj:`datetime.datetime.max` are encoded as open endtimes.
+    """
+    MIMETYPE = settings.MIMETYPE_OCTET_STREAM
+
+    @staticmethod
+    def _normalize(stream_epoch):
+        if stream_epoch.endtime == datetime.datetime.max:
+            stream_epoch = stream_epoch._replace(endtime=None)
+        if stream_epoch.location == '':
+            stream_epoch = stream_epoch._replace(
+                stream=stream_epoch.stream._replace(location='--'))
+        return stream_epoch
+
+    def render(self):
+        routes = []
+        for url, stream_epoch_lst in self.routes:
+            # add url netloc prefix
+            if self._netloc_proxy:
+                url = self.prefix_url(url)
+
+            routes.append(utils.Route(
+                url=url,
+                streams=[self._normalize(se) for se in stream_epoch_lst]))
+
+        return binroute.encode(routes)
+
+    def __bytes__(self):
+        return self.render()
@@ -133,6 +133,21 @@ class StationLiteSchemaTestCase(unittest.TestCase):
         with self.assertRaises(ValidationError):
             s.load({'service': 'wfcatalog', 'access': 'open'})
 
+    def test_multiple_services(self):
+        s = self.create_schema()
+
+        self.assertEqual(
+            s.load({'service': 'station,dataselect', 'level': 'station',
+                    'access': 'open'})['service'], 'station,dataselect')
+        with self.assertRaises(ValidationError):
+            s.load({'service': 'station,invalid'})
+        with self.assertRaises(ValidationError):
+            s.load({'service': 'station,station'})
+        with self.assertRaises(ValidationError):
+            s.load({'service': 'station,dataselect', 'format': 'get'})
+        with self.assertRaises(ValidationError):
+            s.load({'service': 'dataselect,wfcatalog', 'level': 'station'})
+
 
 # -----------------------------------------------------------------------------
 if __name__ == '__main__':
@@ -8,35 +8,21 @@ import collections
 import datetime
 import logging
 import os
-import re
 
 import marshmallow as ma
 
 from flask import make_response
 
 from eidangservices import settings
+from eidangservices.utils import dtparse
 
-dateutil_available = False
-try:
-    from dateutil import parser
-    dateutil_available = True
-except ImportError:
-    dateutil_available = False
+dateutil_available = dtparse.dateutil_parser is not None
 
 
 # module level logger
 logger = logging.getLogger('eidangservices.utils')
 
 
-# from marshmallow (originally from Django)
-_iso8601_re = re.compile(
-    r'(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})'
-    r'[T ](?P<hour>\d{1,2}):(?P<minute>\d{1,2})'
-    r'(?::(?P<second>\d{1,2})(?:\.(?P<microsecond>\d{1,6})\d{0,6})?)?'
-    r'(?P<tzinfo>Z|(?![+-]\d{2}(?::?\d{2})?))?$'
-)
-
-
 # -----------------------------------------------------------------------------
 def realpath(p):
     return os.path.realpath(os.path.expanduser(p))
@@ -85,7 +71,8 @@ def from_fdsnws_datetime(datestring, use_dateutil=True):
 
     See: http://www.fdsn.org/webservices/FDSN-WS-Specifications-1.1.pdf
     """
-    IGNORE_TZ = True
+    if use_dateutil:
+        return parse_fdsnws_datetime(datestring)
 
     if len(datestring) == 10:
         # only YYYY-mm-dd is defined
@@ -93,15 +80,23 @@ def from_fdsnws_datetime(datestring, use_dateutil=True):
                                          datetime.time())
     else:
         # from marshmallow
-        if not _iso8601_re.match(datestring):
+        if not dtparse.iso8601_re.match(datestring):
             raise ValueError('Not a valid ISO8601-formatted string.')
-        # Use dateutil's parser if possible
-        if dateutil_available and use_dateutil:
-            return parser.parse(datestring, ignoretz=IGNORE_TZ)
-        else:
-            # Strip off microseconds and timezone info.
-            return datetime.datetime.strptime(datestring[:19],
-                                              '%Y-%m-%dT%H:%M:%S')
+        # Strip off microseconds and timezone info.
+        return datetime.datetime.strptime(datestring[:19],
+                                          '%Y-%m-%dT%H:%M:%S')
+
+
+def parse_fdsnws_datetime(datestring):
+    """
+    Parse a FDSNWS datetime string. Common datetime shapes are parsed by
+    means of fast paths, results are memoised (see
+    :py:mod:`eidangservices.utils.dtparse`).
+
+    :param str datestring: String to be parsed
+    :rtype: :py:class:`datetime.datetime`
+    """
+    return dtparse.parse(datestring)
 
 
 def fdsnws_isoformat(dt, localtime=False, *args, **kwargs):
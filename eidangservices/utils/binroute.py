@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Compact binary routing format facilities.
+
+The format is a length-prefixed, columnar layout. All integers are encoded
+little-endian.
+
+.. code::
+
+    header:        magic (4 bytes, b'EIDR') | version (uint8)
+    string table:  count (uint32) | count * (length (uint16) | UTF-8 bytes)
+    routes:        count (uint32) | count * route
+
+    route:         url (uint32, string index) | n (uint32, number of epochs)
+                   network codes (n * uint32, string indices)
+                   station codes (n * uint32, string indices)
+                   location codes (n * uint32, string indices)
+                   channel codes (n * uint32, string indices)
+                   starttimes (n * int64)
+                   endtimes (n * int64)
+
+Datetimes are encoded as microseconds since 1970-01-01T00:00:00. Open
+endtimes are encoded by means of :py:data:`OPEN_ENDTIME`.
+"""
+
+import datetime
+import struct
+
+from eidangservices import utils
+from eidangservices.utils.error import Error
+from eidangservices.utils.sncl import Stream, StreamEpoch
+
+
+MAGIC = b'EIDR'
+VERSION = 1
+
+OPEN_ENDTIME = -2 ** 63
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_HEADER = struct.Struct('<4sB')
+_UINT16 = struct.Struct('<H')
+_UINT32 = struct.Struct('<I')
+_ROUTE = struct.Struct('<II')
+
+
+class BinaryRoutingFormatError(Error):
+    """Invalid binary routing data ({})."""
+
+
+def _to_int(dt):
+    delta = dt - _EPOCH
+    return ((delta.days * 86400 + delta.seconds) * 1000000 +
+            delta.microseconds)
+
+
+def encode(routes):
+    """
+    Encode routes.
+
+    :param list routes: List of :py:class:`eidangservices.utils.Route`
+        objects with :py:class:`~eidangservices.utils.sncl.StreamEpoch`
+        objects as streams
+    :rtype: bytes
+    """
+    strings = {}
+
+    def index(s):
+        try:
+            return strings[s]
+        except KeyError:
+            idx = strings[s] = len(strings)
+            return idx
+
+    body = [_UINT32.pack(len(routes))]
+    for url, stream_epochs in routes:
+        codes = ([], [], [], [])
+        times = ([], [])
+        for se in stream_epochs:
+            for col, code in zip(codes, se.stream):
+                col.append(index(code))
+            times[0].append(_to_int(se.starttime))
+            times[1].append(OPEN_ENDTIME if se.endtime is None
+                            else _to_int(se.endtime))
+
+        n = len(stream_epochs)
+        body.append(_ROUTE.pack(index(url), n))
+        body.append(struct.pack(
+            '<{}I'.format(4 * n), *(i for col in codes for i in col)))
+        body.append(struct.pack(
+            '<{}q'.format(2 * n), *(t for col in times for t in col)))
+
+    table = [_UINT32.pack(len(strings))]
+    for s in strings:
+        b = s.encode('utf-8')
+        table.append(_UINT16.pack(len(b)))
+        table.append(b)
+
+    return b''.join([_HEADER.pack(MAGIC, VERSION)] + table + body)
+
+
+def decode(data):
+    """
+    Decode routes. Both streams and datetimes are interned.
+
+    :param bytes data: Data to be decoded
+    :returns: List of :py:class:`eidangservices.utils.Route` objects
+    :rtype: list
+    :raises BinaryRoutingFormatError: If ``data`` is invalid
+    """
+    try:
+        return _decode(memoryview(data))
+    except (struct.error, IndexError, UnicodeDecodeError) as err:
+        raise BinaryRoutingFormatError(err)
+
+
+def _decode(data):
+    magic, version = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise BinaryRoutingFormatError(
+            'magic={!r}, version={}'.format(magic, version))
+    offset = _HEADER.size
+
+    num_strings, = _UINT32.unpack_from(data, offset)
+    offset += _UINT32.size
+    strings = []
+    for _ in range(num_strings):
+        length, = _UINT16.unpack_from(data, offset)
+        offset += _UINT16.size
+        strings.append(str(data[offset:offset + length], 'utf-8'))
+        offset += length
+
+    datetimes = {OPEN_ENDTIME: None}
+
+    def to_datetime(t):
+        try:
+            return datetimes[t]
+        except KeyError:
+            dt = datetimes[t] = _EPOCH + datetime.timedelta(microseconds=t)
+            return dt
+
+    streams = {}
+    routes = []
+
+    num_routes, = _UINT32.unpack_from(data, offset)
+    offset += _UINT32.size
+    for _ in range(num_routes):
+        url, n = _ROUTE.unpack_from(data, offset)
+        offset += _ROUTE.size
+
+        codes = struct.unpack_from('<{}I'.format(4 * n), data, offset)
+        offset += 16 * n
+        times = struct.unpack_from('<{}q'.format(2 * n), data, offset)
+        offset += 16 * n
+
+        stream_epochs = []
+        for key, start, end in zip(
+                zip(codes[:n], codes[n:2 * n], codes[2 * n:3 * n],
+                    codes[3 * n:]),
+                times[:n], times[n:]):
+            try:
+                stream = streams[key]
+            except KeyError:
+                stream = streams[key] = Stream._make(
+                    strings[idx] for idx in key)
+
+            stream_epochs.append(StreamEpoch(
+                stream, to_datetime(start), to_datetime(end)))
+
+        routes.append(utils.Route(url=strings[url], streams=stream_epochs))
+
+    if offset != len(data):
+        raise BinaryRoutingFormatError(
+            '{} trailing byte(s)'.format(len(data) - offset))
+
+    return routes
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+FDSNWS datetime parsing facilities.
+
+Datetime strings are parsed by means of hand-written fast paths for the
+shapes commonly used with FDSNWS i.e.
+
+.. code::
+
+    YYYY-mm-dd
+    YYYY-mm-ddTHH:MM:SS
+    YYYY-mm-ddTHH:MM:SS.f (up to six fractional digits)
+
+optionally followed by a :code:`Z` (timezone information is ignored). Parsing
+of any other shape falls back to :code:`dateutil`. Since datetime strings are
+highly redundant (e.g. within POST request files or routing service
+responses) parsing results are memoised by means of a bounded cache.
+
+Usage:
+
+.. code::
+
+    dt = parse('2018-01-01T00:00:00')
+
+See: http://www.fdsn.org/webservices/FDSN-WS-Specifications-1.1.pdf
+"""
+
+import datetime
+import functools
+import re
+
+from eidangservices import settings
+
+try:
+    from dateutil import parser as dateutil_parser
+except ImportError:
+    dateutil_parser = None
+
+
+# from marshmallow (originally from Django)
+iso8601_re = re.compile(
+    r'(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})'
+    r'[T ](?P<hour>\d{1,2}):(?P<minute>\d{1,2})'
+    r'(?::(?P<second>\d{1,2})(?:\.(?P<microsecond>\d{1,6})\d{0,6})?)?'
+    r'(?P<tzinfo>Z|(?![+-]\d{2}(?::?\d{2})?))?$'
+)
+
+
+def parse_fast(datestring):
+    """
+    Parse ``datestring`` by means of the fast paths.
+
+    :param str datestring: String to be parsed
+    :returns: Datetime or :code:`None` if the shape of ``datestring`` is not
+        supported by the fast paths
+    :rtype: :py:class:`datetime.datetime` or None
+    :raises ValueError: If ``datestring`` is of a supported shape but
+        specifies an invalid datetime (e.g. :code:`2018-13-01`)
+    """
+    n = len(datestring)
+    if n < 10 or datestring[4] != '-' or datestring[7] != '-':
+        return None
+
+    if n == 10:
+        if not (datestring[:4] + datestring[5:7] +
+                datestring[8:]).isdigit():
+            return None
+
+        return datetime.datetime(int(datestring[:4]), int(datestring[5:7]),
+                                 int(datestring[8:]))
+
+    if datestring[-1] == 'Z':
+        n -= 1
+
+    if (n < 19 or datestring[10] not in ('T', ' ') or
+            datestring[13] != ':' or datestring[16] != ':'):
+        return None
+
+    if n == 19:
+        fraction = ''
+    elif 21 <= n <= 26 and datestring[19] == '.':
+        fraction = datestring[20:n]
+    else:
+        return None
+
+    if not (datestring[:4] + datestring[5:7] + datestring[8:10] +
+            datestring[11:13] + datestring[14:16] + datestring[17:19] +
+            fraction).isdigit():
+        return None
+
+    return datetime.datetime(
+        int(datestring[:4]), int(datestring[5:7]), int(datestring[8:10]),
+        int(datestring[11:13]), int(datestring[14:16]),
+        int(datestring[17:19]), int(fraction.ljust(6, '0')) if fraction else 0)
+
+
+def parse_fallback(datestring):
+    """
+    Parse ``datestring`` by means of :code:`dateutil`. If :code:`dateutil` is
+    not available, both fractional seconds and timezone information are
+    stripped.
+
+    :param str datestring: String to be parsed
+    :rtype: :py:class:`datetime.datetime`
+    :raises ValueError: If ``datestring`` is not a valid FDSNWS datetime
+    """
+    if len(datestring) == 10:
+        # only YYYY-mm-dd is defined (and handled by the fast path)
+        raise ValueError('Not a valid ISO8601-formatted date string.')
+
+    if not iso8601_re.match(datestring):
+        raise ValueError('Not a valid ISO8601-formatted string.')
+
+    if dateutil_parser is not None:
+        return dateutil_parser.parse(datestring, ignoretz=True)
+
+    return datetime.datetime.strptime(datestring[:19], '%Y-%m-%dT%H:%M:%S')
+
+
+@functools.lru_cache(maxsize=settings.FDSNWS_DATETIME_CACHE_SIZE)
+def parse(datestring):
+    """
+    Parse a FDSNWS datetime string. Results are memoised.
+
+    :param str datestring: String to be parsed
+    :rtype: :py:class:`datetime.datetime`
+    :raises ValueError: If ``datestring`` is not a valid FDSNWS datetime
+    """
+    dt = parse_fast(datestring)
+    if dt is None:
+        dt = parse_fallback(datestring)
+    return dt
@@ -8,14 +8,14 @@ import itertools
 import sys
 import traceback
 
-from collections import namedtuple
-
 import webargs
 
 from webargs.flaskparser import FlaskParser
 from webargs.flaskparser import parser as flaskparser
 
 from eidangservices import settings
+from eidangservices.utils.postfile import (
+    Postfile, PostfileError, read_postfile)
 from eidangservices.utils.strict import flask_keywordparser
 from eidangservices.utils.httperrors import FDSNHTTPError
 
@@ -101,46 +101,19 @@ class FDSNWSParserMixin:
         """
         Parse a FDSNWS formatted POST request file.
 
-        :param str postfile: Postfile content
+        :param postfile: Postfile content or parsed POST request file,
+            respectively
+        :type postfile: str or
+            :py:class:`~eidangservices.utils.postfile.Postfile`
 
-        :returns: Dictionary with parsed parameters.
+        :returns: Dictionary with parsed parameters. Stream epochs are
+            deduplicated.
         :rtype: dict
         """
-        _StreamEpoch = namedtuple(
-            '_StreamEpoch', ['net', 'sta', 'loc', 'cha', 'start', 'end'])
-
-        retval = {}
-        stream_epochs = []
-        for line in postfile.split('\n'):
-            check_param = line.split(
-                settings.FDSNWS_QUERY_VALUE_SEPARATOR_CHAR)
-            if (len(check_param) == 2 and not
-                    all(not v.strip() for v in check_param)):
-
-                # add query params
-                retval[check_param[0].strip()] = check_param[1].strip()
-                # self.logger.debug('Query parameter: %s' % check_param)
-            elif len(check_param) == 1:
-                # parse StreamEpoch
-                stream_epoch = line.split()
-                if len(stream_epoch) == 6:
-                    stream_epoch = _StreamEpoch(
-                        net=stream_epoch[0],
-                        sta=stream_epoch[1],
-                        loc=stream_epoch[2],
-                        cha=stream_epoch[3],
-                        start=stream_epoch[4],
-                        end=stream_epoch[5])
-                    stream_epochs.append(stream_epoch)
-            else:
-                # self.logger.warn("Ignoring illegal POST line: %s" % line)
-                continue
+        if isinstance(postfile, str):
+            postfile = Postfile.parse(postfile.split('\n'))
 
-        # remove duplicates
-        stream_epochs = list(set(stream_epochs))
-        retval['stream_epochs'] = [se._asdict() for se in stream_epochs]
-
-        return retval
+        return postfile.asdict()
 
 
 class FDSNWSFlaskParser(FDSNWSParserMixin, FlaskParser):
@@ -171,35 +144,38 @@ class FDSNWSFlaskParser(FDSNWSParserMixin, FlaskParser):
         See also:
         http://www.fdsn.org/webservices/FDSN-WS-Specifications-1.1.pdf
         """
+        postfile = self._read_postfile(req)
+        # NOTE: The POST request file is read and parsed only once per
+        # request. Stream epochs are exclusively created if requested.
+        if name != 'stream_epochs':
+            return webargs.core.get_value(postfile.params, name, field)
+
         return webargs.core.get_value(
-            self._parse_postfile(self._get_data(req)), name, field)
+            self._parse_postfile(postfile), name, field)
 
-    def _get_data(self, req, as_text=True,
-                  max_content_length=settings.MAX_POST_CONTENT_LENGTH):
+    def _read_postfile(self, req,
+                       max_content_length=settings.MAX_POST_CONTENT_LENGTH):
         """
-        Savely reads the buffered incoming data from the client.
+        Savely reads the POST request file from the client. The request body
+        is streamed and parsed line by line (see
+        :py:func:`eidangservices.utils.postfile.read_postfile`).
 
-        :param req: Request the raw data is read from
+        :param req: Request the POST request file is read from
         :type req: :py:class:`flask.Request`
-        :param bool as_text: If set to :code:`True` the return value will be a
-            decoded unicode string.
         :param int max_content_length: Max bytes accepted
 
-        :returns: Byte string or rather unicode string, respectively. Depending
-            on the :code:`as_text` parameter.
+        :rtype: :py:class:`~eidangservices.utils.postfile.Postfile`
         """
-        if req.content_length > max_content_length:
-            err = webargs.WebargsError(
-                "Request too large: {} bytes > {} bytes ".format(
-                    req.content_length, max_content_length))
+        try:
+            return read_postfile(req, max_content_length=max_content_length)
+        except PostfileError as err:
+            err = webargs.WebargsError(str(err))
 
             if self.error_callback:
                 self.error_callback(err, req)
             else:
                 self.handle_error(err, req)
 
-        return req.get_data(cache=True, as_text=as_text)
-
 
 fdsnws_parser = FDSNWSFlaskParser()
 use_fdsnws_args = fdsnws_parser.use_args
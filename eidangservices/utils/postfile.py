@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Facilities for FDSNWS formatted POST request files.
+
+POST request files are read from the request's input stream line by line and
+parsed incrementally i.e. the request body is never buffered as a whole.
+Stream epoch lines are deduplicated while reading. Hence, memory scales with
+the number of unique stream epochs rather than the size of the request body.
+
+A parsed POST request file is cached with the request such that all parsers
+(i.e. both the :py:mod:`webargs` based parsers and the keyword parser) share
+a single pass over the request body.
+"""
+
+from eidangservices import settings
+from eidangservices.utils.error import Error
+
+
+ENVIRON_KEY = 'eidangservices.postfile'
+
+STREAM_EPOCH_KEYS = ('net', 'sta', 'loc', 'cha', 'start', 'end')
+
+
+class PostfileError(Error):
+    """Base POST request file error ({})."""
+
+
+class PostfileTooLarge(PostfileError):
+    """Request too large: {} bytes > {} bytes"""
+
+
+class Postfile:
+    """
+    Incremental parser for FDSNWS formatted POST request files.
+
+    Usage:
+
+    .. code::
+
+        postfile = Postfile()
+        for line in fd:
+            postfile.feed(line)
+
+        query_params = postfile.params
+        stream_epochs = postfile.stream_epochs
+
+    :param str charset: Charset used for decoding :py:class:`bytes` lines
+    """
+
+    def __init__(self, charset='utf-8'):
+        self.charset = charset
+
+        self.params = {}
+        self.empty_param_line = False
+
+        self._keys = {}
+        # NOTE: a dict provides an ordered set of unique stream epoch tuples
+        self._stream_epochs = {}
+        self._strings = {}
+
+    @classmethod
+    def parse(cls, lines, **kwargs):
+        """
+        Parse a POST request file.
+
+        :param lines: Iterable of lines (:py:class:`bytes` or
+            :py:class:`str`)
+        :rtype: :py:class:`Postfile`
+        """
+        postfile = cls(**kwargs)
+        for line in lines:
+            postfile.feed(line)
+        return postfile
+
+    def feed(self, line):
+        """
+        Parse a single line.
+
+        Lines with a single :code:`=` character are parsed as query
+        parameters. Lines consisting of six whitespace-separated values are
+        parsed as stream epochs. Otherwise, lines are ignored.
+
+        :param line: Line to be parsed
+        :type line: str or bytes
+        """
+        if isinstance(line, bytes):
+            line = line.decode(self.charset, 'replace')
+        if line.endswith('\n'):
+            line = line[:-1]
+
+        check_param = line.split(settings.FDSNWS_QUERY_VALUE_SEPARATOR_CHAR)
+        if len(check_param) == 2:
+            if check_param[0] == check_param[1] == '':
+                self.empty_param_line = True
+                return
+
+            self._keys[check_param[0]] = None
+            if not all(not v.strip() for v in check_param):
+                self.params[check_param[0].strip()] = check_param[1].strip()
+        elif len(check_param) == 1:
+            stream_epoch = line.split()
+            if len(stream_epoch) == len(STREAM_EPOCH_KEYS):
+                intern = self._strings.setdefault
+                self._stream_epochs[
+                    tuple(intern(v, v) for v in stream_epoch)] = None
+
+    @property
+    def keys(self):
+        """
+        Raw query parameter keys (in order of first occurrence).
+
+        :rtype: tuple
+        """
+        return tuple(self._keys)
+
+    @property
+    def stream_epochs(self):
+        """
+        Unique stream epochs (in order of first occurrence).
+
+        :returns: List of dictionaries with the keys :code:`net`,
+            :code:`sta`, :code:`loc`, :code:`cha`, :code:`start` and
+            :code:`end`
+        :rtype: list
+        """
+        return [dict(zip(STREAM_EPOCH_KEYS, stream_epoch))
+                for stream_epoch in self._stream_epochs]
+
+    def asdict(self):
+        """
+        Return both query parameters and the stream epochs (key:
+        :code:`stream_epochs`).
+
+        :rtype: dict
+        """
+        retval = dict(self.params)
+        retval['stream_epochs'] = self.stream_epochs
+        return retval
+
+
+def read_postfile(req, max_content_length=settings.MAX_POST_CONTENT_LENGTH):
+    """
+    Read and parse the POST request file of a request. The request's input
+    stream is consumed line by line. The result is cached with the request.
+
+    :param req: Request the POST request file is read from
+    :type req: :py:class:`flask.Request`
+    :param int max_content_length: Max bytes accepted
+    :rtype: :py:class:`Postfile`
+    :raises PostfileTooLarge: If the request body exceeds
+        ``max_content_length``
+    """
+    try:
+        return req.environ[ENVIRON_KEY]
+    except KeyError:
+        pass
+
+    if (req.content_length is not None and
+            req.content_length > max_content_length):
+        raise PostfileTooLarge(req.content_length, max_content_length)
+
+    postfile = Postfile()
+    size = 0
+    stream = req.stream
+    # NOTE: the request's content length is not necessarily known in advance
+    for line in iter(lambda: stream.readline(max_content_length + 1), b''):
+        size += len(line)
+        if size > max_content_length:
+            raise PostfileTooLarge(size, max_content_length)
+
+        postfile.feed(line)
+
+    req.environ[ENVIRON_KEY] = postfile
+    return postfile
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+EIDA routing service (*StationLite*) client facilities.
+
+Usage:
+
+.. code::
+
+    routing_tables = route_by_service(
+        'http://localhost/eidaws/routing/1/query', stream_epochs,
+        ['station', 'dataselect'])
+
+    station_routing_table = routing_tables['station']
+"""
+
+import functools
+
+import requests
+
+from eidangservices import settings
+from eidangservices.utils import binroute, logger, parse_fdsnws_datetime
+from eidangservices.utils.request import binary_request
+from eidangservices.utils.schema import StreamEpochSchema
+from eidangservices.utils.sncl import Stream, StreamEpoch
+
+
+SERVICE_SEPARATOR = ','
+SECTION_HEADER_PREFIX = 'service='
+
+
+class RoutingParser:
+    """
+    Parser for the StationLite routing service's ``format=post`` output.
+
+    The parser streams over the lines of the raw response. Since routing
+    responses are highly redundant, streams (i.e. network, station, location
+    and channel codes) are interned while parsed datetimes are memoised by
+    means of :py:func:`eidangservices.utils.dtparse.parse`. Open endtimes are
+    not substituted.
+
+    Usage:
+
+    .. code::
+
+        with binary_request(req) as fd:
+            routing_table = RoutingParser().parse(fd)
+    """
+
+    def __init__(self):
+        self._streams = {}
+
+    @classmethod
+    def create(cls, format='post'):
+        """
+        Factory method creating a parser for the routing service's output
+        ``format``.
+        """
+        if format == 'post':
+            return cls()
+        elif format == 'binary':
+            return BinaryRoutingParser()
+        else:
+            raise KeyError('Invalid routing format: {!r}'.format(format))
+
+    def parse(self, lines):
+        """
+        Parse a routing service response.
+
+        :param lines: Iterable of response lines (:py:class:`bytes` or
+            :py:class:`str`) e.g. a file-like object
+        :returns: Routing table
+        :rtype: dict
+        :raises ValueError: If a line is malformed
+        """
+        return self.parse_by_service(lines).get(None, {})
+
+    def parse_by_service(self, lines):
+        """
+        Parse a routing service response with routes for multiple services
+        (i.e. sections preceded by ``service=<name>`` header lines). Routes
+        not preceded by a section header are stored with the key
+        :code:`None`.
+
+        :param lines: Iterable of response lines (:py:class:`bytes` or
+            :py:class:`str`) e.g. a file-like object
+        :returns: Dictionary with routing tables by service
+        :rtype: dict
+        :raises ValueError: If a line is malformed
+        """
+        routing_tables = {}
+        routing_table = {}
+        service = None
+        url = None
+        stream_epochs = []
+
+        for line in lines:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            line = line.strip()
+
+            if not line or line.startswith(SECTION_HEADER_PREFIX):
+                # set up the routing table
+                if url and stream_epochs:
+                    routing_table[url] = stream_epochs
+
+                url = None
+                stream_epochs = []
+
+                if line:
+                    if routing_table:
+                        routing_tables[service] = routing_table
+                    service = line[len(SECTION_HEADER_PREFIX):]
+                    routing_table = routing_tables.get(service, {})
+            elif url is None:
+                url = line
+            else:
+                stream_epochs.append(self._parse_stream_epoch(line))
+
+        if url and stream_epochs:
+            routing_table[url] = stream_epochs
+        if routing_table:
+            routing_tables[service] = routing_table
+
+        return routing_tables
+
+    def _parse_stream_epoch(self, line):
+        args = line.split(' ')
+        if len(args) == 6:
+            end = parse_fdsnws_datetime(args[5])
+        elif len(args) == 5:
+            end = None
+        else:
+            raise ValueError('Invalid routing line: {!r}'.format(line))
+
+        key = tuple(args[:4])
+        try:
+            stream = self._streams[key]
+        except KeyError:
+            stream = self._streams[key] = Stream._make(key)
+
+        return StreamEpoch(stream, parse_fdsnws_datetime(args[4]), end)
+
+
+class BinaryRoutingParser:
+    """
+    Parser for the StationLite routing service's ``format=binary`` output
+    (see :py:mod:`eidangservices.utils.binroute`).
+    """
+
+    def parse(self, fd):
+        """
+        Parse a routing service response.
+
+        :param fd: File-like object
+        :returns: Routing table
+        :rtype: dict
+        :raises binroute.BinaryRoutingFormatError: If the response is invalid
+        """
+        return dict(binroute.decode(fd.read()))
+
+
+# -----------------------------------------------------------------------------
+def _serialize(stream_epoch):
+    # NOTE: open endtimes are omitted
+    return ' '.join(v for v in StreamEpochSchema().dump(stream_epoch).values()
+                    if v is not None)
+
+
+def route_by_service(url, stream_epochs, services, query_params={},
+                     timeout=settings.EIDA_FEDERATOR_ENDPOINT_TIMEOUT,
+                     logger=logger):
+    """
+    Route ``stream_epochs`` for multiple services by means of a single
+    routing service request.
+
+    :param str url: Routing service query URL
+    :param list stream_epochs: List of
+        :py:class:`~eidangservices.utils.sncl.StreamEpoch` objects to be
+        routed
+    :param list services: List of services (e.g. :code:`['station',
+        'dataselect']`)
+    :param dict query_params: Additional routing query parameters
+    :param float timeout: Timeout in seconds
+    :param logger: Logger instance to be used for logging
+
+    :returns: Dictionary with routing tables by service. Services without
+        routes map to empty routing tables.
+    :rtype: dict
+    :raises eidangservices.utils.request.RequestsError: If the request
+        failed (including
+        :py:class:`~eidangservices.utils.request.NoContent`)
+    :raises ValueError: If the response is malformed
+    """
+    params = dict(query_params)
+    params['service'] = SERVICE_SEPARATOR.join(services)
+    params['format'] = 'post'
+
+    data = '{}\n{}'.format(
+        '\n'.join('{}={}'.format(p, v) for p, v in params.items()),
+        '\n'.join(_serialize(se) for se in stream_epochs))
+
+    req = functools.partial(requests.post, url, data=data)
+    with binary_request(req, timeout=timeout, logger=logger) as fd:
+        routing_tables = RoutingParser().parse_by_service(fd)
+
+    return dict((service, routing_tables.get(service, {}))
+                for service in services)
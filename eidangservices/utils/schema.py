@@ -19,6 +19,7 @@ validate_latitude = validate.Range(min=-90., max=90)
 validate_longitude = validate.Range(min=-180., max=180.)
 validate_radius = validate.Range(min=0., max=180.)
 validate_net_sta_cha = validate.Regexp(r'[A-Za-z0-9_*?]*$')
+validate_location = validate.Regexp(r'[A-Z0-9_*?]*$|--|\s\s')
 not_empty = validate.NoneOf([None, ''])
 
 
@@ -84,7 +85,7 @@ class FDSNWSDateTime(fields.DateTime):
     DESERIALIZATION_FUNCS = fields.DateTime.DESERIALIZATION_FUNCS.copy()
 
     SERIALIZATION_FUNCS['fdsnws'] = utils.fdsnws_isoformat
-    DESERIALIZATION_FUNCS['fdsnws'] = utils.from_fdsnws_datetime
+    DESERIALIZATION_FUNCS['fdsnws'] = utils.parse_fdsnws_datetime
 
 
 # -----------------------------------------------------------------------------
@@ -104,8 +105,7 @@ class StreamEpochSchema(Schema):
     station = fields.Str(missing='*', validate=validate_net_sta_cha)
     sta = fields.Str(load_only=True)
 
-    location = fields.Str(missing='*',
-                          validate=validate.Regexp(r'[A-Z0-9_*?]*$|--|\s\s'))
+    location = fields.Str(missing='*', validate=validate_location)
     loc = fields.Str(load_only=True)
 
     channel = fields.Str(missing='*', validate=validate_net_sta_cha)
@@ -219,6 +219,118 @@ class StreamEpochSchema(Schema):
         ordered = True
 
 
+class BulkStreamEpochLoader:
+    """
+    Bulk loader for stream epochs parsed from FDSNWS **POST** request files
+    (see :py:meth:`eidangservices.utils.fdsnws.FDSNWSParserMixin.\
+_parse_postfile`).
+
+    The loader applies the rules of :py:class:`StreamEpochSchema` (with a
+    **POST** request context) in a single pass i.e. the wildcard patterns are
+    validated, ``--`` location codes are replaced and temporal constraints
+    are checked. Since POST request files are highly redundant, streams are
+    interned (datetimes are memoised by
+    :py:func:`eidangservices.utils.dtparse.parse`). The loader does not
+    provide error messages; if loading fails, use
+    :py:class:`StreamEpochSchema` for error reporting.
+    """
+    KEYS = frozenset(('net', 'sta', 'loc', 'cha', 'start', 'end'))
+
+    def __init__(self):
+        self._streams = {}
+
+    def load(self, stream_epochs):
+        """
+        Load stream epochs.
+
+        :param list stream_epochs: List of dictionaries with the keys
+            :code:`net`, :code:`sta`, :code:`loc`, :code:`cha`, :code:`start`
+            and :code:`end`; the stream related keys are optional
+        :returns: List of :py:class:`eidangservices.utils.sncl.StreamEpoch`
+            objects
+        :rtype: list
+        :raises ValueError: If a stream epoch is invalid or not supported by
+            the loader
+        """
+        now = datetime.datetime.utcnow()
+
+        retval = []
+        for stream_epoch in stream_epochs:
+            if (not isinstance(stream_epoch, dict) or
+                    not stream_epoch.keys() <= self.KEYS):
+                raise ValueError(
+                    'Unsupported stream epoch: {!r}'.format(stream_epoch))
+
+            starttime = self._load_datetime(stream_epoch.get('start'))
+            endtime = self._load_datetime(stream_epoch.get('end'))
+            if starttime > now:
+                raise ValueError('starttime in future')
+            elif starttime >= endtime:
+                raise ValueError('endtime must be greater than starttime')
+
+            retval.append(sncl.StreamEpoch(
+                self._load_stream(stream_epoch.get('net', '*'),
+                                  stream_epoch.get('sta', '*'),
+                                  stream_epoch.get('loc', '*'),
+                                  stream_epoch.get('cha', '*')),
+                starttime, endtime))
+
+        return retval
+
+    def _load_stream(self, *key):
+        try:
+            return self._streams[key]
+        except KeyError:
+            pass
+
+        net, sta, loc, cha = key
+        if not (isinstance(net, str) and isinstance(sta, str) and
+                isinstance(loc, str) and isinstance(cha, str)):
+            raise ValueError('Invalid stream: {!r}'.format(key))
+
+        match = validate_net_sta_cha.regex.match
+        if not (match(net) and match(sta) and match(cha) and
+                validate_location.regex.match(loc)):
+            raise ValueError('Invalid stream: {!r}'.format(key))
+
+        # NOTE: see sncl.StreamEpoch.from_sncl()
+        stream = self._streams[key] = sncl.Stream(
+            network=net or '*', station=sta or '*',
+            location='' if loc == '--' else loc, channel=cha or '*')
+        return stream
+
+    def _load_datetime(self, datestring):
+        if not datestring or not isinstance(datestring, str):
+            raise ValueError('Invalid datetime: {!r}'.format(datestring))
+
+        try:
+            return utils.parse_fdsnws_datetime(datestring)
+        except (TypeError, AttributeError, OverflowError) as err:
+            raise ValueError(err)
+
+
+class StreamEpochList(fields.List):
+    """
+    List of stream epochs. If loaded with a **POST** request context, stream
+    epochs are loaded by means of :py:class:`BulkStreamEpochLoader`. Only if
+    bulk loading fails, loading falls back to
+    :py:class:`StreamEpochSchema` (e.g. for the sake of error reporting).
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(fields.Nested('StreamEpochSchema'), **kwargs)
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        req = self.context.get('request')
+        if req is not None and req.method == 'POST':
+            try:
+                return BulkStreamEpochLoader().load(value)
+            except (ValueError, TypeError):
+                pass
+
+        return super()._deserialize(value, attr, data, **kwargs)
+
+
 class ManyStreamEpochSchema(Schema):
     """
     A schema class intended to provide a :code:`many=True` replacement for
@@ -226,7 +338,7 @@ class ManyStreamEpochSchema(Schema):
     treat :py:class:`eidangservices.utils.sncl.StreamEpoch` objects like JSON
     bulk type arguments.
     """
-    stream_epochs = fields.List(fields.Nested('StreamEpochSchema'))
+    stream_epochs = StreamEpochList()
 
     @validates_schema
     def validate_schema(self, data, **kwargs):
@@ -3,19 +3,19 @@
 SNCL related facilities.
 """
 
+import bisect
 import contextlib
 import datetime
 import functools
+import itertools
 
+from array import array
 from collections import namedtuple, OrderedDict
 
-from intervaltree import IntervalTree
-
 import eidangservices as eidangws
 
 from eidangservices import settings, utils
 
-Epochs = IntervalTree
 
 # ----------------------------------------------------------------------------
 @contextlib.contextmanager
@@ -231,7 +231,7 @@ class StreamEpoch(namedtuple('StreamEpoch',
         args = line.strip().split(' ')
         end = None
         if len(args) == 6:
-            end = utils.from_fdsnws_datetime(args[5])
+            end = utils.parse_fdsnws_datetime(args[5])
         elif len(args) == 5:
             end = default_endtime
 
@@ -239,7 +239,7 @@ class StreamEpoch(namedtuple('StreamEpoch',
                                  station=args[1],
                                  location=args[2],
                                  channel=args[3]),
-                   starttime=utils.from_fdsnws_datetime(args[4]),
+                   starttime=utils.parse_fdsnws_datetime(args[4]),
                    endtime=end)
 
     @classmethod
@@ -322,16 +322,18 @@ class StreamEpoch(namedtuple('StreamEpoch',
         if num < 2:
             return [self]
         end = self.endtime or default_endtime
-        t = Epochs.from_tuples([(self.starttime, end)])
+        if self.starttime >= end:
+            raise ValueError('Null epoch: {!r}'.format((self.starttime, end)))
 
-        for n in range(1, num):
-            t.slice(self.starttime +
-                    datetime.timedelta(
-                        seconds=((end - self.starttime).total_seconds() / num *
-                                 n)))
+        boundaries = sorted(set(
+            t for t in (self.starttime + datetime.timedelta(
+                seconds=((end - self.starttime).total_seconds() / num * n))
+                for n in range(1, num))
+            if self.starttime < t < end))
+        boundaries = [self.starttime] + boundaries + [end]
 
-        return [type(self)(stream=self.stream,
-                           starttime=i.begin, endtime=i.end) for i in t]
+        return [type(self)(stream=self.stream, starttime=begin, endtime=end)
+                for begin, end in zip(boundaries[:-1], boundaries[1:])]
 
     def _asdict(self, short_keys=False):
         """
@@ -391,6 +393,189 @@ class StreamEpoch(namedtuple('StreamEpoch',
         return ' '.join(str(v) for v in stream_epoch.values())
 
 
+Epoch = namedtuple('Epoch', ['begin', 'end'])
+"""
+Container for epochs.
+
+:param datetime.datetime begin: Epoch begin
+:param datetime.datetime end: Epoch end
+"""
+
+
+class EpochSet:
+    """
+    Compact set of epochs. Epochs are half-open intervals i.e. :code:`[begin,
+    end)`.
+
+    Epochs are stored by means of sorted parallel arrays of integer
+    timestamps (microseconds since 1970-01-01T00:00:00). The arrays are kept
+    normalized i.e. epochs are merged even if they are only end-to-end
+    adjacent.
+
+    .. note::
+
+        Open epochs are not supported. Use
+        :py:obj:`datetime.datetime.max` instead (see :py:func:`none_as_max`).
+    """
+
+    __slots__ = ('_begins', '_ends')
+
+    _EPOCH = datetime.datetime(1970, 1, 1)
+    _MICROSECOND = datetime.timedelta(microseconds=1)
+
+    def __init__(self, epochs=()):
+        """
+        :param epochs: Iterable of (begin, end) tuples, with begin and end of
+            type :py:class:`datetime.datetime`. Epochs may overlap.
+        :raises ValueError: If an epoch is null (i.e. :code:`begin >= end`)
+        :raises TypeError: If an epoch's boundaries are not of type
+            :py:class:`datetime.datetime`
+        """
+        self._begins = array('q')
+        self._ends = array('q')
+        self._extend(sorted(self._to_ints(epochs)))
+
+    @classmethod
+    def from_tuples(cls, epochs):
+        """
+        Create a :py:class:`EpochSet` from a list of (begin, end) tuples.
+        """
+        return cls(epochs)
+
+    def begin(self):
+        """
+        Return the begin of the first epoch; :code:`None` if the set is
+        empty.
+        """
+        if not self._begins:
+            return None
+        return self._to_datetime(self._begins[0])
+
+    def end(self):
+        """
+        Return the end of the last epoch; :code:`None` if the set is empty.
+        """
+        if not self._ends:
+            return None
+        return self._to_datetime(self._ends[-1])
+
+    def union(self, other):
+        """
+        Return the union of the set and ``other``.
+
+        :param other: :py:class:`EpochSet` or iterable of (begin, end) tuples
+        :rtype: :py:class:`EpochSet`
+        """
+        if not isinstance(other, EpochSet):
+            other = type(self)(other)
+
+        retval = type(self)()
+        retval._extend(sorted(itertools.chain(
+            zip(self._begins, self._ends), zip(other._begins, other._ends))))
+        return retval
+
+    def intersection(self, begin, end):
+        """
+        Return the intersection of the set with the epoch :code:`[begin,
+        end)` i.e. epochs are truncated.
+
+        :param datetime.datetime begin: Begin of the epoch
+        :param datetime.datetime end: End of the epoch
+        :rtype: :py:class:`EpochSet`
+        """
+        retval = type(self)()
+        if not self._begins:
+            return retval
+
+        begin, end = self._to_int(begin), self._to_int(end)
+        lo, hi = self._search(begin, end)
+        for i in range(lo, hi):
+            retval._begins.append(max(self._begins[i], begin))
+            retval._ends.append(min(self._ends[i], end))
+
+        return retval
+
+    def overlap(self, begin, end):
+        """
+        Return the epochs overlapping the epoch :code:`[begin, end)`. Epochs
+        are not truncated.
+
+        :param datetime.datetime begin: Begin of the epoch
+        :param datetime.datetime end: End of the epoch
+        :returns: Sorted list of :py:class:`Epoch` objects
+        :rtype: list
+        """
+        if not self._begins:
+            return []
+
+        lo, hi = self._search(self._to_int(begin), self._to_int(end))
+        return [Epoch(self._to_datetime(self._begins[i]),
+                      self._to_datetime(self._ends[i]))
+                for i in range(lo, hi)]
+
+    def _search(self, begin, end):
+        # return the index range of epochs overlapping [begin, end)
+        if begin >= end:
+            return 0, 0
+        return (bisect.bisect_right(self._ends, begin),
+                bisect.bisect_left(self._begins, end))
+
+    def _extend(self, epochs):
+        # append sorted (begin, end) integer tuples; merges epochs even if
+        # they are only end-to-end adjacent
+        begins, ends = self._begins, self._ends
+        for begin, end in epochs:
+            if ends and begin <= ends[-1]:
+                if end > ends[-1]:
+                    ends[-1] = end
+            else:
+                begins.append(begin)
+                ends.append(end)
+
+    @classmethod
+    def _to_ints(cls, epochs):
+        for epoch in epochs:
+            begin, end = cls._to_int(epoch[0]), cls._to_int(epoch[1])
+            if begin >= end:
+                raise ValueError(
+                    'Null epoch: {!r}'.format((epoch[0], epoch[1])))
+            yield begin, end
+
+    @classmethod
+    def _to_int(cls, dt):
+        return (dt - cls._EPOCH) // cls._MICROSECOND
+
+    @classmethod
+    def _to_datetime(cls, t):
+        return cls._EPOCH + datetime.timedelta(microseconds=t)
+
+    def __iter__(self):
+        """
+        Iterator protocol by means of a generator.
+
+        The generator emerges sorted :py:class:`Epoch` objects.
+        """
+        for begin, end in zip(self._begins, self._ends):
+            yield Epoch(self._to_datetime(begin), self._to_datetime(end))
+
+    def __len__(self):
+        return len(self._begins)
+
+    def __eq__(self, other):
+        if not isinstance(other, EpochSet):
+            return NotImplemented
+        return self._begins == other._begins and self._ends == other._ends
+
+    def __or__(self, other):
+        return self.union(other)
+
+    def __repr__(self):
+        return 'EpochSet(%r)' % list(self)
+
+
+Epochs = EpochSet
+
+
 @functools.total_ordering
 class StreamEpochs:
     """
@@ -398,9 +583,9 @@ class StreamEpochs:
     epochs. In an abstract sense it is a container for :py:class:`StreamEpoch`
     objects.
 
-    Uses `IntervalTree <https://github.com/chaimleib/intervaltree>`_.
+    Epochs are stored by means of a :py:class:`EpochSet`.
 
-    .. note:: Intervals within the tree are automatically merged.
+    .. note:: Epochs are automatically merged.
     """
 
     def __init__(self, network='*', station='*', location='*', channel='*',
@@ -412,7 +597,8 @@ class StreamEpochs:
         :param str channel: Channel code
         :param list epochs: Epochs is a list of (t1, t2) tuples, with t1 and t2
             of type datetime.datetime. It can contain overlaps. The intervals
-            are merged within the constructor.
+            are merged within the constructor. Alternatively, a
+            :py:class:`EpochSet` may be passed.
         """
 
         self._stream = Stream(network=network,
@@ -420,13 +606,15 @@ class StreamEpochs:
                               location=location,
                               channel=channel)
 
-        try:
-            self.epochs = Epochs.from_tuples(epochs)
-        except TypeError:
-            self.epochs = Epochs()
-
-        # intervals are merged even if they are only end-to-end adjacent
-        self.epochs.merge_overlaps(strict=False)
+        if isinstance(epochs, EpochSet):
+            # NOTE: epoch sets are never modified in-place i.e. they may be
+            # shared
+            self.epochs = epochs
+        else:
+            try:
+                self.epochs = Epochs.from_tuples(epochs)
+            except TypeError:
+                self.epochs = Epochs()
 
     @classmethod
     def from_stream_epoch(cls, stream_epoch):
@@ -466,12 +654,7 @@ class StreamEpochs:
 
         :param list epochs: List of (t1, t2) tuples
         """
-
-        for iv in epochs:
-            self.epochs.addi(iv[0], iv[1])
-
-        # intervals are merged even if they are only end-to-end adjacent
-        self.epochs.merge_overlaps(strict=False)
+        self.epochs = self.epochs.union(epochs)
 
     def fdsnws_to_sql_wildcards(self, like_multiple='%', like_single='_',
                                 like_escape='/'):
@@ -524,11 +707,7 @@ class StreamEpochs:
         if _end is None:
             _end = self.epochs.end()
 
-        # slice at new boundaries
-        self.epochs.slice(_start)
-        self.epochs.slice(_end)
-        # search and assign the overlap
-        self.epochs = Epochs(sorted(self.epochs.overlap(_start, _end)))
+        self.epochs = self.epochs.intersection(_start, _end)
 
     @property
     def network(self):
@@ -548,14 +727,10 @@ class StreamEpochs:
 
     @property
     def starttime(self):
-        if not self.epochs.begin():
-            return None
         return self.epochs.begin()
 
     @property
     def endtime(self):
-        if not self.epochs.end():
-            return None
         return self.epochs.end()
 
     @property
@@ -639,23 +814,19 @@ class StreamEpochsHandler:
         #           =
         #    ---..----..----
         for stream_id, epochs in self.d.items():
-            se = StreamEpochs.from_stream(
-                Stream(**self.__stream_id_to_dict(stream_id)),
-                epochs=epochs)
-            se.modify_with_temporal_constraints(start, end)
-
-            self.d[se.id()] = se.epochs
+            self.d[stream_id] = epochs.intersection(
+                epochs.begin() if start is None else start,
+                epochs.end() if end is None else end)
 
     def add(self, other):
         """
-        Add ``other`` to :py:class:`StreamEpochsHandler` without merging
-        overlaps.
+        Add ``other`` to :py:class:`StreamEpochsHandler`.
 
         :param other: Object to be added.
         :type other: :py:class:`StreamEpochs` or :py:class:`StreamEpoch`
         """
         try:
-            # merge epoch interval trees (union)
+            # merge epochs (union)
             self.d[other.id()] |= other.epochs
         except KeyError:
             self.d[other.id()] = other.epochs
@@ -670,10 +841,6 @@ class StreamEpochsHandler:
         for other in others:
             self.add(other)
 
-            # tree for key may be overlapping; intervals are merged even if they
-            # are only end-to-end adjacent
-            self.d[other.id()].merge_overlaps(strict=False)
-
     @property
     def streams(self):
         return list(self)
@@ -12,6 +12,8 @@ from marshmallow import Schema, exceptions
 
 from eidangservices import settings
 from eidangservices.utils.error import Error
+from eidangservices.utils.postfile import (
+    Postfile, PostfileError, read_postfile)
 
 
 class KeywordParserError(Error):
@@ -64,25 +66,21 @@ class KeywordParser:
         """
         Parse all argument keys from a POST request file.
 
-        :param str postfile: Postfile content
+        :param postfile: Postfile content or parsed POST request file,
+            respectively
+        :type postfile: str or
+            :py:class:`~eidangservices.utils.postfile.Postfile`
 
         :returns: Tuple with parsed keys.
         :rtype: tuple
         """
-        argmap = {}
+        if isinstance(postfile, str):
+            postfile = Postfile.parse(postfile.split('\n'))
 
-        for line in postfile.split('\n'):
-            _line = line.split(
-                settings.FDSNWS_QUERY_VALUE_SEPARATOR_CHAR)
-            if len(_line) != 2:
-                continue
+        if postfile.empty_param_line:
+            raise ValidationError('RTFM :)')
 
-            if all(w == '' for w in _line):
-                raise ValidationError('RTFM :)')
-
-            argmap[_line[0]] = _line[1]
-
-        return tuple(argmap.keys())
+        return postfile.keys
 
     def parse_querystring(self, req):
         """
@@ -100,7 +98,7 @@ class KeywordParser:
         :type req: :py:class:`flask.Request`
         """
         try:
-            parsed_list = self._parse_postfile(self._get_data(req))
+            parsed_list = self._parse_postfile(self._read_postfile(req))
         except ValidationError as err:
             if self.error_callback:
                 self.error_callback(err, req)
@@ -183,32 +181,29 @@ class KeywordParser:
                                  schemas=schemas,
                                  locations=locations)
 
-    def _get_data(self, req, as_text=True,
-                  max_content_length=settings.MAX_POST_CONTENT_LENGTH):
+    def _read_postfile(self, req,
+                       max_content_length=settings.MAX_POST_CONTENT_LENGTH):
         """
-        Savely reads the buffered incoming data from the client.
+        Savely reads the POST request file from the client. The request body
+        is streamed and parsed line by line (see
+        :py:func:`eidangservices.utils.postfile.read_postfile`).
 
-        :param req: Request the raw data is read from
+        :param req: Request the POST request file is read from
         :type req: :py:class:`flask.Request`
-        :param bool as_text: If set to :code:`True` the return value will be a
-            decoded unicode string.
         :param int max_content_length: Max bytes accepted
 
-        :returns: Byte string or rather unicode string, respectively. Depending
-            on the :code:`as_text` parameter.
+        :rtype: :py:class:`~eidangservices.utils.postfile.Postfile`
         """
-        if req.content_length > max_content_length:
-            err = ValidationError(
-                'Request too large: {} bytes > {} bytes '.format(
-                    req.content_length, max_content_length))
+        try:
+            return read_postfile(req, max_content_length=max_content_length)
+        except PostfileError as err:
+            err = ValidationError(err)
 
             if self.error_callback:
                 self.error_callback(err, req)
             else:
                 self.handle_error(err, req)
 
-        return req.get_data(cache=True, as_text=as_text)
-
     def handle_error(self, error, req):
         """
         Called if an error occurs while parsing strict args.
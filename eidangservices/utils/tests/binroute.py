@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+EIDA NG webservices binroute module test facilities.
+"""
+
+import datetime
+import unittest
+
+from eidangservices import utils
+from eidangservices.utils import binroute
+from eidangservices.utils.sncl import Stream, StreamEpoch
+
+
+# -----------------------------------------------------------------------------
+class BinrouteTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.routes = [
+            utils.Route(
+                url='http://eida.ethz.ch/fdsnws/dataselect/1/query',
+                streams=[
+                    StreamEpoch(Stream(network='CH', station='DAVOX',
+                                       location='--', channel='HHZ'),
+                                datetime.datetime(2018, 1, 1)),
+                    StreamEpoch(Stream(network='CH', station='BALST',
+                                       location='--', channel='HHZ'),
+                                datetime.datetime(1969, 12, 31, 23, 59, 59,
+                                                  999999),
+                                datetime.datetime(2018, 1, 2, 0, 0, 0, 5))]),
+            utils.Route(
+                url='http://eida.gfz-potsdam.de/fdsnws/dataselect/1/query',
+                streams=[
+                    StreamEpoch(Stream(network='GE', station='APE',
+                                       location='', channel='BHZ'),
+                                datetime.datetime(2018, 1, 1),
+                                datetime.datetime(2018, 1, 2))]),
+            utils.Route(
+                url='http://eida.bgr.de/fdsnws/dataselect/1/query',
+                streams=[])]
+
+    def test_encode_decode(self):
+        data = binroute.encode(self.routes)
+
+        self.assertTrue(data.startswith(binroute.MAGIC))
+        routes = binroute.decode(data)
+        self.assertEqual(routes, self.routes)
+        # streams are interned
+        self.assertIs(routes[0].streams[0].starttime,
+                      routes[1].streams[0].starttime)
+
+    def test_decode_empty(self):
+        self.assertEqual(binroute.decode(binroute.encode([])), [])
+
+    def test_decode_invalid(self):
+        data = binroute.encode(self.routes)
+
+        for invalid in (b'', b'EIDR\x02' + data[5:], data[:-1], data + b'\0'):
+            with self.assertRaises(binroute.BinaryRoutingFormatError):
+                binroute.decode(invalid)
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+EIDA NG webservices FDSNWS datetime parsing test facilities.
+"""
+
+import datetime
+import os
+import timeit
+import unittest
+
+from dateutil import parser
+
+from eidangservices import utils
+from eidangservices.utils import dtparse
+
+
+class DatetimeParseTestCase(unittest.TestCase):
+
+    DATESTRINGS = (
+        '2018-01-01',
+        '2018-01-01T00:00:00',
+        '2018-01-01 01:02:03',
+        '2018-01-01T01:02:03.5',
+        '2018-01-01T01:02:03.05',
+        '2018-01-01T01:02:03.123456',
+        '2018-01-01T01:02:03Z',
+        '2018-01-01T01:02:03.123Z',
+        '9999-12-31T23:59:59.999999', )
+
+    def setUp(self):
+        dtparse.parse.cache_clear()
+
+    def test_parse_fast(self):
+        for datestring in self.DATESTRINGS:
+            with self.subTest(datestring=datestring):
+                self.assertEqual(dtparse.parse_fast(datestring),
+                                 parser.parse(datestring, ignoretz=True))
+
+    def test_parse_fast_unsupported(self):
+        for datestring in ('', '2018', '2018-1-01', '2018-01-01T01:02',
+                           '2018-01-01T01:02:03.', '2018-01-01T1:02:03',
+                           '2018-01-01T01:02:03.1234567',
+                           '2018-01-01T01:02:03+01:00', '2018/01/01',
+                           '2018-01-01T01:02:+3'):
+            with self.subTest(datestring=datestring):
+                self.assertIsNone(dtparse.parse_fast(datestring))
+
+    def test_parse_fast_invalid(self):
+        for datestring in ('2018-13-01', '2018-01-01T24:00:00',
+                           '2018-02-30T00:00:00'):
+            with self.subTest(datestring=datestring):
+                with self.assertRaises(ValueError):
+                    dtparse.parse_fast(datestring)
+
+    def test_parse(self):
+        for datestring in self.DATESTRINGS + (
+                '2018-01-01T01:02', '2018-01-01T1:2:3',
+                '2018-01-01T01:02:03.1234567'):
+            with self.subTest(datestring=datestring):
+                self.assertEqual(dtparse.parse(datestring),
+                                 parser.parse(datestring, ignoretz=True))
+                self.assertEqual(utils.from_fdsnws_datetime(datestring),
+                                 dtparse.parse(datestring))
+
+        self.assertEqual(dtparse.parse('2018-01-01T00:00:00'),
+                         datetime.datetime(2018, 1, 1))
+
+    def test_parse_invalid(self):
+        for datestring in ('', '2018', '2018-1-1', '2018-13-01',
+                           '2018-01-01T25:00:00', '2018-01-01T01:02:03+01:00',
+                           'foo'):
+            with self.subTest(datestring=datestring):
+                with self.assertRaises(ValueError):
+                    dtparse.parse(datestring)
+
+        with self.assertRaises(TypeError):
+            dtparse.parse(None)
+
+    def test_parse_cache(self):
+        dt = dtparse.parse('2018-01-01T00:00:00')
+
+        self.assertIs(dtparse.parse('2018-01-01T00:00:00'), dt)
+        self.assertEqual(dtparse.parse.cache_info().hits, 1)
+        self.assertLessEqual(dtparse.parse.cache_info().maxsize,
+                             dtparse.settings.FDSNWS_DATETIME_CACHE_SIZE)
+
+    def test_from_fdsnws_datetime_without_dateutil(self):
+        self.assertEqual(
+            utils.from_fdsnws_datetime('2018-01-01T01:02:03.5',
+                                       use_dateutil=False),
+            datetime.datetime(2018, 1, 1, 1, 2, 3))
+
+
+@unittest.skipUnless(os.environ.get('EIDA_BENCHMARK'),
+                     'Set EIDA_BENCHMARK in order to run benchmarks.')
+class DatetimeParseBenchmark(unittest.TestCase):
+
+    NUM_DATESTRINGS = 50000
+
+    def test_benchmark(self):
+        start = datetime.datetime(2000, 1, 1)
+        datestrings = [
+            (start + datetime.timedelta(seconds=i * 3607)).isoformat()
+            for i in range(self.NUM_DATESTRINGS)]
+
+        def parse_reference():
+            for datestring in datestrings:
+                parser.parse(datestring, ignoretz=True)
+
+        def parse_fast():
+            for datestring in datestrings:
+                dtparse.parse_fast(datestring)
+
+        def parse_cached():
+            for datestring in datestrings:
+                dtparse.parse(datestring)
+
+        # repeated datestrings (e.g. POST request files)
+        repeated = datestrings[:100] * (self.NUM_DATESTRINGS // 100)
+
+        def parse_repeated():
+            for datestring in repeated:
+                dtparse.parse(datestring)
+
+        t_reference = min(timeit.repeat(parse_reference, number=1, repeat=3))
+        t_fast = min(timeit.repeat(parse_fast, number=1, repeat=3))
+        t_cached = min(timeit.repeat(parse_cached, number=1, repeat=3))
+        t_repeated = min(timeit.repeat(parse_repeated, number=1, repeat=3))
+
+        print('\nParsing {} datetime strings: dateutil={:.3f}s, '
+              'fast path={:.3f}s (speedup: {:.1f}x), cached={:.3f}s, '
+              'repeated={:.3f}s (speedup: {:.1f}x)'.format(
+                  self.NUM_DATESTRINGS, t_reference, t_fast,
+                  t_reference / t_fast, t_cached, t_repeated,
+                  t_reference / t_repeated))
+        self.assertLess(t_fast, t_reference)
+        self.assertLess(t_repeated, t_reference)
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,7 @@ EIDA NG webservices utility test facilities.
 """
 
 import datetime
+import io
 import unittest
 
 from unittest import mock
@@ -327,7 +328,8 @@ class FDSNWSFlaskParserTestCase(unittest.TestCase):
         test_str = b"f=value\nNL HGN ?? * 2013-10-10 2013-10-11"
         mock_request.method = 'POST'
         mock_request.content_length = len(test_str)
-        mock_request.get_data.return_value = test_str.decode('utf-8')
+        mock_request.stream = io.BytesIO(test_str)
+        mock_request.environ = {}
 
         reference_sncls = [sncl.StreamEpoch.from_sncl(
             network='NL',
@@ -351,7 +353,8 @@ class FDSNWSFlaskParserTestCase(unittest.TestCase):
                     b"GR BFO * * 2017-01-01 2017-01-31")
         mock_request.method = 'POST'
         mock_request.content_length = len(test_str)
-        mock_request.get_data.return_value = test_str.decode('utf-8')
+        mock_request.stream = io.BytesIO(test_str)
+        mock_request.environ = {}
 
         reference_sncls = [sncl.StreamEpoch.from_sncl(
             network='NL',
@@ -384,7 +387,8 @@ class FDSNWSFlaskParserTestCase(unittest.TestCase):
         test_str = b""
         mock_request.method = 'POST'
         mock_request.content_length = len(test_str)
-        mock_request.get_data.return_value = test_str.decode('utf-8')
+        mock_request.stream = io.BytesIO(test_str)
+        mock_request.environ = {}
 
         with self.assertRaises(HTTPException):
             fdsnws.fdsnws_parser.parse(schema.ManyStreamEpochSchema(
@@ -397,7 +401,8 @@ class FDSNWSFlaskParserTestCase(unittest.TestCase):
         test_str = b"f=value\n"
         mock_request.method = 'POST'
         mock_request.content_length = len(test_str)
-        mock_request.get_data.return_value = test_str.decode('utf-8')
+        mock_request.stream = io.BytesIO(test_str)
+        mock_request.environ = {}
 
         test_args = fdsnws.fdsnws_parser.parse(self.TestSchema(), mock_request,
                                                locations=('form',))
@@ -413,7 +418,8 @@ class FDSNWSFlaskParserTestCase(unittest.TestCase):
         test_str = b"f=value\nNL HGN * 2013-10-10 2013-10-11"
         mock_request.method = 'POST'
         mock_request.content_length = len(test_str)
-        mock_request.get_data.return_value = test_str.decode('utf-8')
+        mock_request.stream = io.BytesIO(test_str)
+        mock_request.environ = {}
 
         test_args = fdsnws.fdsnws_parser.parse(self.TestSchema(), mock_request,
                                                locations=('form',))
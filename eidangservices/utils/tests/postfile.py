@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+EIDA NG webservices POST request file test facilities.
+"""
+
+import io
+import unittest
+
+from unittest import mock
+
+from eidangservices.utils.postfile import (
+    ENVIRON_KEY, Postfile, PostfileTooLarge, read_postfile)
+
+
+class PostfileTestCase(unittest.TestCase):
+
+    def test_parse(self):
+        postfile = Postfile.parse([
+            b'format=post\n',
+            b' level = channel \n',
+            b'CH DAVOX -- HHZ 2018-01-01 2018-01-02\n',
+            b'\n',
+            b'CH * -- HH? 2018-01-01 2018-01-02\n',
+            b'CH DAVOX -- HHZ 2018-01-01 2018-01-02'])
+
+        self.assertEqual(postfile.params,
+                         {'format': 'post', 'level': 'channel'})
+        self.assertEqual(postfile.keys, ('format', ' level '))
+        self.assertFalse(postfile.empty_param_line)
+        self.assertEqual(
+            postfile.stream_epochs,
+            [{'net': 'CH', 'sta': 'DAVOX', 'loc': '--', 'cha': 'HHZ',
+              'start': '2018-01-01', 'end': '2018-01-02'},
+             {'net': 'CH', 'sta': '*', 'loc': '--', 'cha': 'HH?',
+              'start': '2018-01-01', 'end': '2018-01-02'}])
+        self.assertEqual(postfile.asdict()['stream_epochs'],
+                         postfile.stream_epochs)
+
+    def test_parse_empty_param_line(self):
+        postfile = Postfile.parse(['=', 'f=value'])
+        self.assertTrue(postfile.empty_param_line)
+        self.assertEqual(postfile.params, {'f': 'value'})
+
+        postfile = Postfile.parse([' = '])
+        self.assertFalse(postfile.empty_param_line)
+        self.assertEqual(postfile.params, {})
+        self.assertEqual(postfile.keys, (' ', ))
+
+
+class ReadPostfileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.data = b'f=value\nCH DAVOX -- HHZ 2018-01-01 2018-01-02\n'
+
+    @mock.patch('flask.Request')
+    def test_read_postfile(self, mock_request):
+        mock_request.content_length = len(self.data)
+        mock_request.stream = io.BytesIO(self.data)
+        mock_request.environ = {}
+
+        postfile = read_postfile(mock_request)
+        self.assertEqual(postfile.params, {'f': 'value'})
+        self.assertEqual(len(postfile.stream_epochs), 1)
+        self.assertIs(mock_request.environ[ENVIRON_KEY], postfile)
+        # the result is cached i.e. the stream is not read again
+        self.assertIs(read_postfile(mock_request), postfile)
+
+    @mock.patch('flask.Request')
+    def test_read_postfile_too_large(self, mock_request):
+        mock_request.content_length = len(self.data)
+        mock_request.stream = io.BytesIO(self.data)
+        mock_request.environ = {}
+
+        with self.assertRaises(PostfileTooLarge):
+            read_postfile(mock_request, max_content_length=10)
+
+        # unknown content length
+        mock_request.content_length = None
+        with self.assertRaises(PostfileTooLarge):
+            read_postfile(mock_request, max_content_length=10)
+        self.assertNotIn(ENVIRON_KEY, mock_request.environ)
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
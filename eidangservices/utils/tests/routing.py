@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Routing client related test facilities.
+"""
+
+import datetime
+import io
+import os
+import timeit
+import unittest
+
+from unittest import mock
+
+from eidangservices import utils
+from eidangservices.utils import binroute
+from eidangservices.utils.request import NoContent
+from eidangservices.utils.routing import (
+    BinaryRoutingParser, RoutingParser, route_by_service)
+from eidangservices.utils.sncl import Stream, StreamEpoch
+
+
+def _parse_routing_response(fd):
+    """
+    Reference implementation parsing a routing service response by means of
+    :py:meth:`StreamEpoch.from_snclline`.
+    """
+    routing_table = {}
+    urlline = None
+    stream_epochs = []
+    while True:
+        line = fd.readline()
+
+        if not urlline:
+            urlline = line.strip()
+        elif not line.strip():
+            if stream_epochs:
+                routing_table[urlline] = stream_epochs
+
+            urlline = None
+            stream_epochs = []
+
+            if not line:
+                break
+        else:
+            stream_epochs.append(StreamEpoch.from_snclline(line))
+
+    return routing_table
+
+
+def _create_routing_response(num_urls=2, num_lines=10):
+    lines = []
+    for i in range(num_urls):
+        lines.append('http://eida{}.example.com/fdsnws/station/1/query'.format(
+            i))
+        for j in range(num_lines):
+            lines.append(
+                'CH STA{} -- HH{} 2018-01-01T00:00:00 {}'.format(
+                    j // 3, 'ZNE'[j % 3],
+                    '2018-01-02T00:00:00.5' if j % 2 else '').strip())
+        lines.append('')
+
+    return '\n'.join(lines).encode('utf-8')
+
+
+class RoutingParserTestCase(unittest.TestCase):
+
+    def test_parse(self):
+        response = _create_routing_response()
+
+        routing_table = RoutingParser().parse(io.BytesIO(response))
+        self.assertEqual(
+            routing_table,
+            {url.decode('utf-8'): stream_epochs for url, stream_epochs in
+             _parse_routing_response(io.BytesIO(response)).items()})
+        self.assertEqual(len(routing_table), 2)
+
+        stream_epochs = routing_table[
+            'http://eida0.example.com/fdsnws/station/1/query']
+        self.assertEqual(stream_epochs[0], StreamEpoch(
+            Stream(network='CH', station='STA0', location='--',
+                   channel='HHZ'),
+            datetime.datetime(2018, 1, 1)))
+        self.assertEqual(stream_epochs[1].endtime,
+                         datetime.datetime(2018, 1, 2, 0, 0, 0, 500000))
+        # streams are interned
+        self.assertIs(stream_epochs[0].stream, routing_table[
+            'http://eida1.example.com/fdsnws/station/1/query'][0].stream)
+
+    def test_parse_without_trailing_newline(self):
+        response = b'http://eida.example.com/fdsnws/station/1/query\n' \
+            b'CH DAVOX -- HHZ 2018-01-01T00:00:00'
+
+        self.assertEqual(len(RoutingParser().parse(io.BytesIO(response))), 1)
+
+    def test_create(self):
+        self.assertIsInstance(RoutingParser.create('post'), RoutingParser)
+        self.assertIsInstance(RoutingParser.create('binary'),
+                              BinaryRoutingParser)
+        with self.assertRaises(KeyError):
+            RoutingParser.create('xml')
+
+    def test_parse_binary(self):
+        routing_table = RoutingParser().parse(
+            io.BytesIO(_create_routing_response()))
+
+        self.assertEqual(
+            BinaryRoutingParser().parse(io.BytesIO(binroute.encode(
+                [utils.Route(url, streams)
+                 for url, streams in routing_table.items()]))),
+            routing_table)
+
+    def test_parse_by_service(self):
+        response = _create_routing_response()
+        routing_table = RoutingParser().parse(io.BytesIO(response))
+
+        routing_tables = RoutingParser().parse_by_service(io.BytesIO(
+            b'service=station\n' + response + b'\nservice=dataselect\n' +
+            response))
+        self.assertEqual(routing_tables, {'station': routing_table,
+                                          'dataselect': routing_table})
+        self.assertEqual(
+            RoutingParser().parse_by_service(io.BytesIO(response)),
+            {None: routing_table})
+
+    def test_parse_invalid(self):
+        response = b'http://eida.example.com/fdsnws/station/1/query\n' \
+            b'CH DAVOX HHZ\n\n'
+
+        with self.assertRaises(ValueError):
+            RoutingParser().parse(io.BytesIO(response))
+
+
+class RouteByServiceTestCase(unittest.TestCase):
+
+    URL = 'http://localhost/eidaws/routing/1/query'
+
+    def setUp(self):
+        self.stream_epochs = [
+            StreamEpoch(Stream(network='CH', station='DAVOX', location='*',
+                               channel='HH?'),
+                        datetime.datetime(2018, 1, 1))]
+
+    @staticmethod
+    def _mock_response(mock_post, status_code=200, content=b''):
+        response = mock_post.return_value.__enter__.return_value
+        response.status_code = status_code
+        response.content = content
+
+    @mock.patch('requests.post')
+    def test_route_by_service(self, mock_post):
+        self._mock_response(
+            mock_post,
+            content=(b'service=station\n'
+                     b'http://eida.ethz.ch/fdsnws/station/1/query\n'
+                     b'CH DAVOX -- HHZ 2018-01-01T00:00:00\n'))
+
+        routing_tables = route_by_service(
+            self.URL, self.stream_epochs, ['station', 'dataselect'],
+            query_params={'level': 'station'})
+        self.assertEqual(routing_tables, {
+            'station': {
+                'http://eida.ethz.ch/fdsnws/station/1/query': [
+                    StreamEpoch(Stream(network='CH', station='DAVOX',
+                                       location='--', channel='HHZ'),
+                                datetime.datetime(2018, 1, 1))]},
+            'dataselect': {}})
+
+        args, kwargs = mock_post.call_args
+        self.assertEqual(args, (self.URL,))
+        self.assertEqual(
+            kwargs['data'].split('\n'),
+            ['level=station', 'service=station,dataselect', 'format=post',
+             'CH DAVOX * HH? 2018-01-01T00:00:00'])
+
+    @mock.patch('requests.post')
+    def test_route_by_service_nodata(self, mock_post):
+        self._mock_response(mock_post, status_code=204)
+
+        with self.assertRaises(NoContent):
+            route_by_service(self.URL, self.stream_epochs,
+                             ['station', 'dataselect'])
+
+
+@unittest.skipUnless(os.environ.get('EIDA_BENCHMARK'),
+                     'Set EIDA_BENCHMARK in order to run benchmarks.')
+class RoutingParserBenchmark(unittest.TestCase):
+
+    NUM_URLS = 10
+    NUM_LINES = 5000
+
+    def test_benchmark(self):
+        response = _create_routing_response(num_urls=self.NUM_URLS,
+                                            num_lines=self.NUM_LINES)
+
+        t_reference = min(timeit.repeat(
+            lambda: _parse_routing_response(io.BytesIO(response)),
+            number=1, repeat=3))
+        t_parser = min(timeit.repeat(
+            lambda: RoutingParser().parse(io.BytesIO(response)),
+            number=1, repeat=3))
+
+        print('\nParsing {} routed stream epochs: reference={:.3f}s, '
+              'RoutingParser={:.3f}s (speedup: {:.1f}x)'.format(
+                  self.NUM_URLS * self.NUM_LINES, t_reference, t_parser,
+                  t_reference / t_parser))
+        self.assertLess(t_parser, t_reference)
+
+        data = binroute.encode([utils.Route(url, streams) for url, streams in
+                                RoutingParser().parse(
+                                    io.BytesIO(response)).items()])
+        t_binary = min(timeit.repeat(
+            lambda: BinaryRoutingParser().parse(io.BytesIO(data)),
+            number=1, repeat=3))
+
+        print('Parsing {} routed stream epochs (binary): '
+              'BinaryRoutingParser={:.3f}s (speedup: {:.1f}x); size: '
+              'text={} bytes, binary={} bytes'.format(
+                  self.NUM_URLS * self.NUM_LINES, t_binary,
+                  t_reference / t_binary, len(response), len(data)))
+        self.assertLess(t_binary, t_parser)
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,8 @@ Field and schema related test facilities.
 """
 
 import datetime
+import os
+import timeit
 import unittest
 
 from unittest import mock
@@ -601,6 +603,110 @@ class ManyStreamEpochSchemaTestCase(unittest.TestCase):
         with self.assertRaises(ma.ValidationError):
             s.load(test_dataset)
 
+    @mock.patch('flask.Request')
+    def test_post_invalid_sncl(self, mock_request):
+        # request.method == 'POST'
+        mock_request.method = 'POST'
+        s = schema.ManyStreamEpochSchema(context={'request': mock_request})
+
+        test_dataset = {'stream_epochs': [
+                        {'net': 'CH', 'sta': 'DAVOX', 'loc': '*', 'cha': '*',
+                         'start': '2017-01-01', 'end': '2017-01-31'},
+                        {'net': 'GR', 'sta': 'BF!', 'loc': '*', 'cha': '*',
+                         'start': '2017-01-01', 'end': '2017-01-31'}
+                        ]}
+        with self.assertRaises(ma.ValidationError) as cm:
+            s.load(test_dataset)
+
+        # errors are reported by means of the StreamEpochSchema
+        self.assertIn('station', cm.exception.messages['stream_epochs'][1])
+
+
+def _create_post_stream_epochs(num=10):
+    return [{'net': 'CH', 'sta': 'STA{}'.format(i // 3),
+             'loc': '--' if i % 2 else '*', 'cha': 'HH' + 'ZNE'[i % 3],
+             'start': '2017-01-01T00:00:00',
+             'end': '2017-01-02T00:00:00.5' if i % 2 else '2017-01-31'}
+            for i in range(num)]
+
+
+class BulkStreamEpochLoaderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.schema = schema.StreamEpochSchema(
+            context={'request': mock.Mock(method='POST')})
+
+    def test_load(self):
+        stream_epochs = _create_post_stream_epochs()
+
+        result = schema.BulkStreamEpochLoader().load(stream_epochs)
+        self.assertEqual(result, [self.schema.load(dict(se))
+                                  for se in stream_epochs])
+        self.assertEqual(result[1].location, '')
+        # streams are interned
+        result = schema.BulkStreamEpochLoader().load(stream_epochs * 2)
+        self.assertIs(result[0].stream, result[len(stream_epochs)].stream)
+
+    def test_load_invalid(self):
+        valid = {'net': 'CH', 'sta': 'DAVOX', 'loc': '*', 'cha': '*',
+                 'start': '2017-01-01', 'end': '2017-01-02'}
+        future = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+        for invalid in ({'sta': 'DAV!X'}, {'loc': 'xx'}, {'cha': 'HH+'},
+                        {'start': ''}, {'start': '2017-13-01'},
+                        {'start': '2017-01-03'},
+                        {'start': future.isoformat(),
+                         'end': (future + datetime.timedelta(1)).isoformat()}):
+            stream_epoch = dict(valid, **invalid)
+            with self.assertRaises(ValueError):
+                schema.BulkStreamEpochLoader().load([stream_epoch])
+            with self.assertRaises(ma.ValidationError):
+                self.schema.load(stream_epoch)
+
+        stream_epoch = dict(valid)
+        del stream_epoch['end']
+        with self.assertRaises(ValueError):
+            schema.BulkStreamEpochLoader().load([stream_epoch])
+
+    def test_fallback(self):
+        # long keys are not supported by the bulk loader
+        stream_epochs = [{'network': 'CH', 'station': 'DAVOX',
+                          'start': '2017-01-01', 'end': '2017-01-02'}]
+        with self.assertRaises(ValueError):
+            schema.BulkStreamEpochLoader().load(stream_epochs)
+
+        s = schema.ManyStreamEpochSchema(
+            context={'request': mock.Mock(method='POST')})
+        self.assertEqual(
+            s.load({'stream_epochs': stream_epochs})['stream_epochs'],
+            [self.schema.load(dict(stream_epochs[0]))])
+
+
+@unittest.skipUnless(os.environ.get('EIDA_BENCHMARK'),
+                     'Set EIDA_BENCHMARK in order to run benchmarks.')
+class BulkStreamEpochLoaderBenchmark(unittest.TestCase):
+
+    NUM = 10000
+
+    def test_benchmark(self):
+        stream_epochs = _create_post_stream_epochs(num=self.NUM)
+        req = mock.Mock(method='POST')
+
+        t_schema = min(timeit.repeat(
+            lambda: schema.StreamEpochSchema(
+                many=True, context={'request': req}).load(
+                    [dict(se) for se in stream_epochs]),
+            number=1, repeat=3))
+        t_bulk = min(timeit.repeat(
+            lambda: schema.ManyStreamEpochSchema(
+                context={'request': req}).load(
+                    {'stream_epochs': stream_epochs}),
+            number=1, repeat=3))
+
+        print('\nLoading {} stream epochs: StreamEpochSchema={:.3f}s, '
+              'BulkStreamEpochLoader={:.3f}s (speedup: {:.1f}x)'.format(
+                  self.NUM, t_schema, t_bulk, t_schema / t_bulk))
+        self.assertLess(t_bulk, t_schema)
+
 
 # -----------------------------------------------------------------------------
 if __name__ == '__main__':
@@ -3,12 +3,25 @@
 EIDA NG webservices sncl module test facilities.
 """
 
+import collections
 import datetime
+import os
+import random
+import timeit
 import unittest
 
+from intervaltree import IntervalTree
+
 from eidangservices.utils import sncl
 
 
+_START = datetime.datetime(2018, 1, 1)
+
+
+def _to_tuples(intervals):
+    return [(iv.begin, iv.end) for iv in sorted(intervals)]
+
+
 # -----------------------------------------------------------------------------
 class StreamEpochsHandlerTestCase(unittest.TestCase):
 
@@ -149,6 +162,169 @@ class StreamEpochTestCase(unittest.TestCase):
                          reference_result)
 
 
+class EpochSetTestCase(unittest.TestCase):
+    """
+    Property based tests of :py:class:`sncl.EpochSet` verified against
+    :py:class:`intervaltree.IntervalTree`.
+    """
+
+    NUM_RUNS = 200
+
+    def setUp(self):
+        self.rnd = random.Random(42)
+
+    def _random_epochs(self, max_num=10):
+        # days i.e. epochs are likely to overlap or to be adjacent
+        retval = []
+        for _ in range(self.rnd.randint(0, max_num)):
+            begin = self.rnd.randint(0, 50)
+            retval.append((_START + datetime.timedelta(days=begin),
+                           _START + datetime.timedelta(
+                               days=begin + self.rnd.randint(1, 10),
+                               microseconds=self.rnd.choice([0, 1]))))
+        return retval
+
+    def test_from_tuples(self):
+        for _ in range(self.NUM_RUNS):
+            epochs = self._random_epochs()
+
+            reference = IntervalTree.from_tuples(epochs)
+            reference.merge_overlaps(strict=False)
+
+            epoch_set = sncl.EpochSet.from_tuples(epochs)
+            self.assertEqual(list(epoch_set), _to_tuples(reference))
+            self.assertEqual(len(epoch_set), len(reference))
+            self.assertEqual(epoch_set.begin(), reference.begin() or None)
+            self.assertEqual(epoch_set.end(), reference.end() or None)
+
+    def test_union(self):
+        for _ in range(self.NUM_RUNS):
+            epochs, others = self._random_epochs(), self._random_epochs()
+
+            reference = IntervalTree.from_tuples(epochs)
+            reference |= IntervalTree.from_tuples(others)
+            reference.merge_overlaps(strict=False)
+
+            epoch_set = sncl.EpochSet(epochs)
+            self.assertEqual(list(epoch_set | sncl.EpochSet(others)),
+                             _to_tuples(reference))
+            self.assertEqual(list(epoch_set.union(others)),
+                             _to_tuples(reference))
+            # not modified in-place
+            self.assertEqual(epoch_set, sncl.EpochSet(epochs))
+
+    def test_intersection_and_overlap(self):
+        for _ in range(self.NUM_RUNS):
+            epochs = self._random_epochs()
+            begin, end = sorted(
+                _START + datetime.timedelta(
+                    hours=self.rnd.randint(0, 24 * 60)) for _ in range(2))
+
+            reference = IntervalTree.from_tuples(epochs)
+            reference.merge_overlaps(strict=False)
+            epoch_set = sncl.EpochSet(epochs)
+
+            self.assertEqual(epoch_set.overlap(begin, end),
+                             sorted(_to_tuples(reference.overlap(begin, end))))
+
+            reference.slice(begin)
+            reference.slice(end)
+            self.assertEqual(list(epoch_set.intersection(begin, end)),
+                             _to_tuples(reference.overlap(begin, end)))
+
+    def test_null_epoch(self):
+        with self.assertRaises(ValueError):
+            sncl.EpochSet([(_START, _START)])
+        with self.assertRaises(TypeError):
+            sncl.EpochSet([(_START, None)])
+
+    def test_stream_epochs(self):
+        for _ in range(self.NUM_RUNS):
+            epochs = self._random_epochs()
+            start = self.rnd.choice(
+                [None, _START + datetime.timedelta(days=10)])
+            end = self.rnd.choice(
+                [None, _START + datetime.timedelta(days=40)])
+
+            reference = IntervalTree.from_tuples(epochs)
+            reference.merge_overlaps(strict=False)
+            _start = reference.begin() if start is None else start
+            _end = reference.end() if end is None else end
+            reference.slice(_start)
+            reference.slice(_end)
+
+            stream_epochs = sncl.StreamEpochs(
+                network='GR', station='BFO', location='', channel='LHZ',
+                epochs=epochs)
+            stream_epochs.modify_with_temporal_constraints(start, end)
+
+            self.assertEqual(
+                [(se.starttime, se.endtime) for se in stream_epochs],
+                _to_tuples(reference.overlap(_start, _end)))
+
+    def test_stream_epochs_handler(self):
+        for _ in range(self.NUM_RUNS):
+            streams = [sncl.Stream(network='GR', station=station,
+                                   location='', channel='LHZ')
+                       for station in ('BFO', 'WET')]
+            stream_epochs = [
+                sncl.StreamEpoch(self.rnd.choice(streams), begin, end)
+                for begin, end in self._random_epochs(max_num=20)]
+
+            reference = collections.defaultdict(IntervalTree)
+            for se in stream_epochs:
+                reference[se.id()].addi(se.starttime, se.endtime)
+                reference[se.id()].merge_overlaps(strict=False)
+
+            handler = sncl.StreamEpochsHandler(stream_epochs)
+            self.assertEqual(
+                dict((ses.id(), [(se.starttime, se.endtime) for se in ses])
+                     for ses in handler),
+                dict((stream_id, _to_tuples(tree))
+                     for stream_id, tree in reference.items()))
+
+
+@unittest.skipUnless(os.environ.get('EIDA_BENCHMARK'),
+                     'Set EIDA_BENCHMARK in order to run benchmarks.')
+class StreamEpochsHandlerBenchmark(unittest.TestCase):
+
+    NUM_STREAMS = 2000
+    NUM_EPOCHS = 10
+
+    def test_benchmark(self):
+        stream_epochs = [
+            sncl.StreamEpoch(
+                sncl.Stream(network='GR', station='STA{}'.format(i),
+                            location='', channel='LHZ'),
+                _START + datetime.timedelta(days=j * 3),
+                _START + datetime.timedelta(days=j * 3 + 4))
+            for i in range(self.NUM_STREAMS) for j in range(self.NUM_EPOCHS)]
+
+        def merge_reference():
+            trees = {}
+            for se in stream_epochs:
+                tree = IntervalTree.from_tuples([(se.starttime, se.endtime)])
+                try:
+                    trees[se.id()] |= tree
+                except KeyError:
+                    trees[se.id()] = tree
+                trees[se.id()].merge_overlaps(strict=False)
+            return [list(tree) for tree in trees.values()]
+
+        def merge():
+            return [list(ses) for ses in
+                    sncl.StreamEpochsHandler(stream_epochs)]
+
+        t_reference = min(timeit.repeat(merge_reference, number=1, repeat=3))
+        t_epoch_set = min(timeit.repeat(merge, number=1, repeat=3))
+
+        print('\nMerging {} stream epochs: IntervalTree={:.3f}s, '
+              'EpochSet={:.3f}s (speedup: {:.1f}x)'.format(
+                  len(stream_epochs), t_reference, t_epoch_set,
+                  t_reference / t_epoch_set))
+        self.assertLess(t_epoch_set, t_reference)
+
+
 # -----------------------------------------------------------------------------
 if __name__ == '__main__':
     unittest.main()
@@ -3,6 +3,7 @@
 EIDA NG webservices strict module test facilities.
 """
 
+import io
 import unittest
 
 from unittest import mock
@@ -125,7 +126,8 @@ class KeywordParserTestCase(unittest.TestCase):
     ):
         test_str = b"f=val\nNL HGN ?? * 2013-10-10 2013-10-11"
         mock_request.method = 'POST'
-        mock_request.get_data.return_value = test_str.decode('utf-8')
+        mock_request.stream = io.BytesIO(test_str)
+        mock_request.environ = {}
         mock_request.content_length = len(test_str)
 
         mock_request_factory.return_value = mock_request
@@ -148,7 +150,8 @@ class KeywordParserTestCase(unittest.TestCase):
     ):
         test_str = b"f=val\nb=val\nNL HGN ?? * 2013-10-10 2013-10-11"
         mock_request.method = 'POST'
-        mock_request.get_data.return_value = test_str.decode('utf-8')
+        mock_request.stream = io.BytesIO(test_str)
+        mock_request.environ = {}
         mock_request.content_length = len(test_str)
 
         mock_request_factory.return_value = mock_request
@@ -172,7 +175,8 @@ class KeywordParserTestCase(unittest.TestCase):
     ):
         test_str = b"NL HGN ?? * 2013-10-10 2013-10-11"
         mock_request.method = 'POST'
-        mock_request.get_data.return_value = test_str.decode('utf-8')
+        mock_request.stream = io.BytesIO(test_str)
+        mock_request.environ = {}
         mock_request.content_length = len(test_str)
 
         mock_request_factory.return_value = mock_request
@@ -195,7 +199,8 @@ class KeywordParserTestCase(unittest.TestCase):
     ):
         test_str = b""
         mock_request.method = 'POST'
-        mock_request.get_data.return_value = test_str.decode('utf-8')
+        mock_request.stream = io.BytesIO(test_str)
+        mock_request.environ = {}
         mock_request.content_length = len(test_str)
 
         mock_request_factory.return_value = mock_request
@@ -218,7 +223,8 @@ class KeywordParserTestCase(unittest.TestCase):
     ):
         test_str = b"="
         mock_request.method = 'POST'
-        mock_request.get_data.return_value = test_str.decode('utf-8')
+        mock_request.stream = io.BytesIO(test_str)
+        mock_request.environ = {}
         mock_request.content_length = len(test_str)
 
         mock_request_factory.return_value = mock_request
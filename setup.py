@@ -28,6 +28,8 @@ _version = max(_version_federator, _version_stationlite)
 _entry_points_federator = {
     'console_scripts': [
         'eida-federator-test = eidangservices.federator.server.app:main_test',
+        ('eida-federator-cache-warmer = '
+         'eidangservices.federator.server.warmer:main'),
     ]}
 _entry_points_stationlite = {
     'console_scripts': [